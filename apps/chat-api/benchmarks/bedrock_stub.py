@@ -0,0 +1,45 @@
+"""
+Stub HTTP local que imita el endpoint InvokeModel de bedrock-runtime.
+
+Sirve para medir el throughput del cliente boto3 sin salir a AWS:
+apuntar ``BEDROCK_ENDPOINT_URL`` a ``http://127.0.0.1:<port>``.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, como el endpoint real
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        time.sleep(self.server.latency)
+        body = json.dumps({
+            "content": [{"type": "text", "text": "Stub answer from the local Bedrock endpoint."}],
+            "usage": {"input_tokens": 42, "output_tokens": 9}
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with self.server.lock:
+            self.server.requests += 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub(latency: float = 0.05, port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """Arranca el stub en un hilo y devuelve (server, endpoint_url)"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), _StubHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.lock = threading.Lock()
+    server.requests = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
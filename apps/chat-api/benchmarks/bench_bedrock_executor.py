@@ -0,0 +1,63 @@
+"""
+Throughput de BedrockService contra un stub local de bedrock-runtime.
+
+Compara distintos tamaños del pool dedicado (workers == max_pool_connections)
+con la misma concurrencia de peticiones.
+
+    python benchmarks/bench_bedrock_executor.py --requests 400 --concurrency 64
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bedrock_stub import start_stub  # noqa: E402
+from src.core.config import settings  # noqa: E402
+from src.models.llm import LLMRequest  # noqa: E402
+from src.services.bedrock_service import BedrockService  # noqa: E402
+
+
+async def run_load(service: BedrockService, total: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            await service.generate_text(LLMRequest(prompt=f"Question {i}", temperature=0.0))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.05, help="latencia simulada del stub (s)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[4, 16, 64])
+    args = parser.parse_args()
+
+    server, endpoint = start_stub(latency=args.latency)
+    settings.bedrock_endpoint_url = endpoint
+    settings.aws_access_key_id = settings.aws_access_key_id or "stub"
+    settings.aws_secret_access_key = settings.aws_secret_access_key or "stub"
+
+    print(f"stub={endpoint} latency={args.latency * 1000:.0f}ms "
+          f"requests={args.requests} concurrency={args.concurrency}")
+    for workers in args.workers:
+        settings.bedrock_max_workers = workers
+        service = BedrockService()
+        elapsed = asyncio.run(run_load(service, args.requests, args.concurrency))
+        stats = service.executor.stats()
+        print(f"workers={workers:>3}  {args.requests / elapsed:8.1f} req/s  "
+              f"avg_wait={stats['avg_wait_ms']:7.1f}ms  p95_wait={stats['p95_wait_ms']:7.1f}ms  "
+              f"avg_run={stats['avg_run_ms']:6.1f}ms")
+        service.executor.shutdown()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Ratios de todas las empresas: pasada vectorizada frente a un bucle por empresa.
+
+Genera estados sinteticos (empresas x periodos x partidas, con huecos),
+calcula la tabla completa con ``compute_ratios`` y con un bucle Python que
+recorre empresa por empresa y periodo por periodo, y comprueba que ambos
+resultados coinciden.
+
+    python benchmarks/bench_financial_ratios.py --companies 5000 --periods 20
+"""
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.financial_ratios import LINE_ITEMS, RATIOS, StatementStore, compute_ratios  # noqa: E402
+
+
+def synthetic_store(companies: int, periods: int, missing: float, seed: int) -> StatementStore:
+    rng = np.random.default_rng(seed)
+    data = rng.uniform(1e6, 1e11, size=(companies, periods, len(LINE_ITEMS)))
+    data[rng.random(data.shape) < missing] = np.nan
+    return StatementStore([f"C{i:05d}" for i in range(companies)], [str(2000 + p) for p in range(periods)], data)
+
+
+def _div(a, b):
+    if a is None or b is None or math.isnan(a) or math.isnan(b) or b == 0:
+        return math.nan
+    return a / b
+
+
+def loop_ratios(store: StatementStore) -> np.ndarray:
+    """Lo que haria el codigo sin vectorizar: un dict de partidas por empresa y periodo"""
+    out = np.full((len(store), len(store.periods), len(RATIOS)), np.nan)
+    for c in range(len(store)):
+        previous = None
+        for p in range(len(store.periods)):
+            s = dict(zip(LINE_ITEMS, store.data[c, p].tolist()))
+            gross = s["gross_profit"] if not math.isnan(s["gross_profit"]) else s["revenue"] - s["cost_of_revenue"]
+            inventory = 0.0 if math.isnan(s["inventory"]) else s["inventory"]
+            fcf = s["operating_cash_flow"] - abs(s["capital_expenditure"])
+            r = {
+                "gross_margin": _div(gross, s["revenue"]),
+                "operating_margin": _div(s["operating_income"], s["revenue"]),
+                "net_margin": _div(s["net_income"], s["revenue"]),
+                "current_ratio": _div(s["current_assets"], s["current_liabilities"]),
+                "quick_ratio": _div(s["current_assets"] - inventory, s["current_liabilities"]),
+                "cash_ratio": _div(s["cash"], s["current_liabilities"]),
+                "debt_to_equity": _div(s["total_debt"], s["total_equity"]),
+                "liabilities_to_assets": _div(s["total_liabilities"], s["total_assets"]),
+                "interest_coverage": _div(s["operating_income"], abs(s["interest_expense"])),
+                "roe": _div(s["net_income"], s["total_equity"]),
+                "roa": _div(s["net_income"], s["total_assets"]),
+                "free_cash_flow": fcf,
+                "fcf_margin": _div(fcf, s["revenue"]),
+            }
+            if previous is not None:
+                ps, pr = previous
+                r["revenue_growth"] = _div(s["revenue"] - ps["revenue"], abs(ps["revenue"]))
+                r["net_income_growth"] = _div(s["net_income"] - ps["net_income"], abs(ps["net_income"]))
+                r["operating_margin_change"] = r["operating_margin"] - pr["operating_margin"]
+                r["net_margin_change"] = r["net_margin"] - pr["net_margin"]
+            out[c, p] = [r.get(name, math.nan) for name in RATIOS]
+            previous = (s, r)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--companies", type=int, default=5000)
+    parser.add_argument("--periods", type=int, default=20)
+    parser.add_argument("--missing", type=float, default=0.05, help="fraccion de partidas sin dato")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    store = synthetic_store(args.companies, args.periods, args.missing, seed=0)
+    print(f"{args.companies} companies x {args.periods} periods x {len(LINE_ITEMS)} items -> {len(RATIOS)} ratios")
+
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        vectorized = compute_ratios(store)
+        timings.append(time.perf_counter() - started)
+    vectorized_s = min(timings)
+
+    started = time.perf_counter()
+    looped = loop_ratios(store)
+    loop_s = time.perf_counter() - started
+
+    np.testing.assert_allclose(vectorized, looped, rtol=1e-9, equal_nan=True)
+    print(f"{'method':<22}{'ms':>10}")
+    print(f"{'vectorized':<22}{vectorized_s * 1000:>10.1f}")
+    print(f"{'per-company loop':<22}{loop_s * 1000:>10.1f}")
+    print(f"speedup x{loop_s / vectorized_s:.0f} (results identical)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Coste de la instrumentacion: peticiones con y sin ``MetricsMiddleware``.
+
+Llama a una app ASGI minima (un endpoint JSON que mide tres etapas) en
+proceso, sin red, con y sin el middleware de metricas, y compara el tiempo
+por peticion. Tambien mide ``stage()`` suelto y el coste de un scrape de
+``/metrics``. Con ``TRACING_EXPORTER`` configurado incluye los spans.
+Termina con error si ``stage()`` cuesta mas de ``--max-stage-us``.
+
+    python benchmarks/bench_metrics.py --requests 20000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from fastapi import FastAPI
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.metrics import MetricsMiddleware, registry, stage  # noqa: E402
+
+
+def build_app(instrumented: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: str):
+        with stage("admission"), stage("context_build"), stage("response_parse"):
+            pass
+        return {"id": item_id}
+
+    if instrumented:
+        app.add_middleware(MetricsMiddleware)
+    return app
+
+
+async def run(app, requests: int) -> float:
+    """Segundos por peticion llamando a la app ASGI directamente"""
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    def scope(i):
+        return {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+                "scheme": "http", "path": f"/items/{i % 100}", "raw_path": b"", "root_path": "",
+                "query_string": b"", "headers": [], "server": ("bench", 80), "client": ("bench", 1)}
+
+    for i in range(200):
+        await app(scope(i), receive, send)
+    started = time.perf_counter()
+    for i in range(requests):
+        await app(scope(i), receive, send)
+    return (time.perf_counter() - started) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-stage-us", type=float, default=20.0, help="Limit for stage() alone (no tracing)")
+    args = parser.parse_args()
+
+    plain = build_app(False)
+    instrumented = build_app(True)
+    plain_s = min(asyncio.run(run(plain, args.requests)) for _ in range(args.repeat))
+    instrumented_s = min(asyncio.run(run(instrumented, args.requests)) for _ in range(args.repeat))
+
+    started = time.perf_counter()
+    for _ in range(100000):
+        with stage("bench"):
+            pass
+    stage_s = (time.perf_counter() - started) / 100000
+
+    started = time.perf_counter()
+    for _ in range(100):
+        text = registry.render()
+    render_s = (time.perf_counter() - started) / 100
+
+    print(f"{'case':<28}{'us':>10}")
+    print(f"{'request, no metrics':<28}{plain_s * 1e6:>10.1f}")
+    print(f"{'request, with metrics':<28}{instrumented_s * 1e6:>10.1f}")
+    print(f"{'  overhead per request':<28}{(instrumented_s - plain_s) * 1e6:>10.1f}")
+    print(f"{'stage() alone':<28}{stage_s * 1e6:>10.2f}")
+    print(f"{'/metrics render':<28}{render_s * 1e6:>10.1f}  ({len(text.splitlines())} lines)")
+    if stage_s * 1e6 > args.max_stage_us:
+        raise SystemExit(f"stage() costs {stage_s * 1e6:.2f}us, above the {args.max_stage_us}us limit")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Recall@k y QPS de la busqueda exacta frente a IVF sobre vectores en memmap.
+
+Genera un corpus sintetico agrupado (mezcla de gaussianas normalizada, para
+que se parezca a embeddings reales), lo escribe con IndexWriter en float16 y
+mide ambas busquedas con las mismas consultas.
+
+    python benchmarks/bench_retrieval.py --sizes 100000 1000000 --nprobe 8 16 32
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.retrieval.retriever import load_retriever  # noqa: E402
+from src.retrieval.store import IndexWriter  # noqa: E402
+
+
+def synthetic_corpus(writer: IndexWriter, size: int, dim: int, clusters: int, noise: float, seed: int,
+                     batch: int = 50000):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    for start in range(0, size, batch):
+        count = min(batch, size - start)
+        vectors = centers[rng.integers(0, clusters, count)] + noise * rng.normal(size=(count, dim)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        writer.add(vectors, [{"id": str(start + i), "text": ""} for i in range(count)])
+
+
+def measure(search, queries, k):
+    results = []
+    started = time.perf_counter()
+    for query in queries:
+        results.append(search(query, k)[0])
+    return results, len(queries) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=2000)
+    parser.add_argument("--noise", type=float, default=1.0, help="dispersion dentro de cada cluster")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[8, 16, 32])
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            directory = os.path.join(tmp, "index")
+            started = time.perf_counter()
+            writer = IndexWriter(directory, dim=args.dim)
+            synthetic_corpus(writer, size, args.dim, args.clusters, args.noise, seed=size)
+            writer.close(ivf_nlist=0)
+            write_s = time.perf_counter() - started
+
+            started = time.perf_counter()
+            writer = IndexWriter(directory, dim=args.dim)
+            synthetic_corpus(writer, size, args.dim, args.clusters, args.noise, seed=size)
+            writer.close(ivf_nlist=None, ivf_min_vectors=0)
+            ivf_s = time.perf_counter() - started - write_s
+
+            retriever = load_retriever(directory)
+            ivf = retriever.index
+            rng = np.random.default_rng(0)
+            rows = rng.integers(0, size, args.queries)
+            queries = np.asarray(ivf.vectors[np.sort(rows)], dtype=np.float32)
+            queries += 0.05 * rng.normal(size=queries.shape).astype(np.float32)
+
+            exact, exact_qps = measure(ivf._flat.search, queries, args.k)
+            print(f"n={size:>9,} dim={args.dim} float16  write={write_s:.1f}s  ivf_build={max(ivf_s, 0):.1f}s "
+                  f"nlist={ivf.nlist}")
+            print(f"  exact          {exact_qps:9.1f} qps   recall@{args.k}=1.000")
+            for nprobe in args.nprobe:
+                approx, qps = measure(lambda q, k: ivf.search(q, k, nprobe=nprobe), queries, args.k)
+                recall = np.mean([len(set(a) & set(e)) / args.k for a, e in zip(approx, exact)])
+                print(f"  ivf nprobe={nprobe:<3} {qps:9.1f} qps   recall@{args.k}={recall:.3f}")
+            retriever.store.close()
+
+
+if __name__ == "__main__":
+    main()
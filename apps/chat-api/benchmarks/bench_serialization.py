@@ -0,0 +1,98 @@
+"""
+CPU por respuesta: ruta de serializacion anterior frente a la rapida.
+
+Anterior: decodificar el body de Bedrock a ``str`` + ``json.loads``,
+construir ``LLMResponse`` validando, revalidar contra ``response_model``
+(``serialize_response`` de FastAPI, con ``jsonable_encoder``) y codificar
+con ``json.dumps``. Rapida: ``orjson.loads`` sobre los bytes,
+``model_construct``, ``model_dump`` y ``orjson.dumps`` (ORJSONResponse).
+
+    python benchmarks/bench_serialization.py --tokens 300 4000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import orjson
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.llm import LLMResponse  # noqa: E402
+
+
+WORDS = "Revenue grew 12% year over year while gross margin expanded to 46.2% on a richer mix".split()
+
+
+def bedrock_body(tokens: int) -> bytes:
+    """Body de invoke_model de Claude con una respuesta de ~``tokens`` palabras"""
+    text = " ".join(WORDS[i % len(WORDS)] for i in range(tokens))
+    return json.dumps({
+        "id": "msg_bench", "type": "message", "role": "assistant",
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "usage": {"input_tokens": 1800, "output_tokens": tokens}
+    }).encode("utf-8")
+
+
+def usage(body, retrieval):
+    return {
+        "input_tokens": body["usage"]["input_tokens"],
+        "output_tokens": body["usage"]["output_tokens"],
+        "total_tokens": body["usage"]["input_tokens"] + body["usage"]["output_tokens"],
+        "retrieval": retrieval
+    }
+
+
+RETRIEVAL = {"chunks": 5, "prompt_tokens": 310, "context_tokens": 1450, "budget_tokens": 2690,
+             "pieces": 6, "duplicates": 1, "dropped": 0, "max_tokens": 768}
+FIELD = create_model_field(name="Response_generate", type_=LLMResponse, mode="serialization")
+
+
+async def old_path(raw: bytes) -> bytes:
+    body = json.loads(raw.decode("utf-8"))
+    response = LLMResponse(text=body["content"][0]["text"], model_id="m", usage=usage(body, RETRIEVAL))
+    content = await serialize_response(field=FIELD, response_content=response)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+async def fast_path(raw: bytes) -> bytes:
+    body = orjson.loads(raw)
+    response = LLMResponse.model_construct(text=body["content"][0]["text"], model_id="m", usage=usage(body, RETRIEVAL))
+    return orjson.dumps(response.model_dump(), option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+async def measure(path, raw: bytes, iterations: int) -> float:
+    for _ in range(100):
+        await path(raw)
+    started = time.process_time()
+    for _ in range(iterations):
+        await path(raw)
+    return (time.process_time() - started) / iterations
+
+
+async def main_async(args):
+    print(f"{'tokens':>8}{'bytes':>10}{'old us':>10}{'fast us':>10}{'saved us':>10}{'speedup':>9}")
+    for tokens in args.tokens:
+        raw = bedrock_body(tokens)
+        assert orjson.loads(await old_path(raw)) == orjson.loads(await fast_path(raw))
+        old = await measure(old_path, raw, args.iterations)
+        fast = await measure(fast_path, raw, args.iterations)
+        print(f"{tokens:>8}{len(raw):>10}{old * 1e6:>10.1f}{fast * 1e6:>10.1f}{(old - fast) * 1e6:>10.1f}"
+              f"{old / fast:>8.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, nargs="+", default=[300, 4000])
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Tiempo de arranque: import de la app, lifespan y primera peticion servida.
+
+Cada repeticion es un proceso nuevo (import en frio). Mide por modo:
+import de ``src.main``, arranque del lifespan (incluido el warm-up) y la
+primera peticion a ``/api/v1/health`` y ``/api/v1/generate`` llamando a la
+app ASGI en proceso. Tambien mide lo que cuesta crear ``BedrockService``
+(import de boto3 + cliente), que el modo dummy ya no paga.
+
+    python benchmarks/bench_startup.py --repeat 5
+    python benchmarks/bench_startup.py --mode bedrock --endpoint-url http://127.0.0.1:8088
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+
+CHILD = r'''
+import asyncio, json, sys, time
+started = time.perf_counter()
+import src.main
+imported = time.perf_counter()
+
+async def call(app, method, path, body=b""):
+    sent = []
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+    async def send(message):
+        sent.append(message)
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+             "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+             "headers": [(b"content-type", b"application/json")], "server": ("bench", 80), "client": ("bench", 1)}
+    await app(scope, receive, send)
+    return sent[0]["status"]
+
+async def main():
+    app = src.main.app
+    timings = {"import_ms": (imported - started) * 1000}
+    messages = asyncio.Queue()
+    await messages.put({"type": "lifespan.startup"})
+    ready = asyncio.Event()
+    async def receive():
+        return await messages.get()
+    async def send(message):
+        if message["type"] == "lifespan.startup.complete":
+            ready.set()
+    t = time.perf_counter()
+    lifespan = asyncio.ensure_future(app({"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}}, receive, send))
+    await ready.wait()
+    timings["lifespan_ms"] = (time.perf_counter() - t) * 1000
+    t = time.perf_counter()
+    timings["health_status"] = await call(app, "GET", "/api/v1/health")
+    timings["first_health_ms"] = (time.perf_counter() - t) * 1000
+    t = time.perf_counter()
+    timings["generate_status"] = await call(app, "POST", "/api/v1/generate", json.dumps({"prompt": "Hello"}).encode())
+    timings["first_generate_ms"] = (time.perf_counter() - t) * 1000
+    timings["to_first_request_ms"] = (time.perf_counter() - started) * 1000
+    timings["boto3_loaded"] = "boto3" in sys.modules
+    await messages.put({"type": "lifespan.shutdown"})
+    await lifespan
+    print(json.dumps(timings))
+
+asyncio.run(main())
+'''
+
+SERVICE_CHILD = r'''
+import json, time
+started = time.perf_counter()
+from src.services.bedrock_service import BedrockService
+imported = time.perf_counter()
+BedrockService()
+print(json.dumps({"import_ms": (imported - started) * 1000, "client_ms": (time.perf_counter() - imported) * 1000}))
+'''
+
+
+def run_child(code: str, env: dict) -> dict:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, "-c", code], cwd=root, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise SystemExit(result.stderr)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["dummy", "bedrock"], default="dummy")
+    parser.add_argument("--endpoint-url", default="", help="BEDROCK_ENDPOINT_URL (p.ej. benchmarks/bedrock_stub.py)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    env = {**os.environ, "LLM_MODE": args.mode, "DUMMY_TTFT_MEDIAN_MS": "1", "DUMMY_TOKENS_PER_SECOND": "100000"}
+    if args.endpoint_url:
+        env["BEDROCK_ENDPOINT_URL"] = args.endpoint_url
+    runs = [run_child(CHILD, env) for _ in range(args.repeat)]
+    service = [run_child(SERVICE_CHILD, env) for _ in range(args.repeat)]
+
+    print(f"mode={args.mode}, {args.repeat} cold starts (median ms); boto3 loaded: {runs[0]['boto3_loaded']}; "
+          f"status health={runs[0]['health_status']} generate={runs[0]['generate_status']}")
+    for key in ("import_ms", "lifespan_ms", "first_health_ms", "first_generate_ms", "to_first_request_ms"):
+        print(f"{key:<24}{statistics.median(r[key] for r in runs):>10.1f}")
+    print(f"{'BedrockService import':<24}{statistics.median(r['import_ms'] for r in service):>10.1f}")
+    print(f"{'BedrockService client':<24}{statistics.median(r['client_ms'] for r in service):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
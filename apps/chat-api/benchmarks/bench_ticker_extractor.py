@@ -0,0 +1,101 @@
+"""
+Prompts por segundo del automata de tickers frente a una regex por simbolo.
+
+Genera un diccionario sintetico (~5.000 simbolos con su nombre de empresa),
+compila el automata, lo guarda y lo vuelve a cargar, y mide ambos metodos
+sobre los mismos prompts. El objetivo es >= 10.000 prompts/s.
+
+    python benchmarks/bench_ticker_extractor.py --symbols 5000 --prompts 10000
+"""
+import argparse
+import os
+import random
+import re
+import string
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.ticker_extractor import TickerExtractor  # noqa: E402
+
+
+WORDS = (
+    "what is the outlook for revenue growth margins guidance this quarter compared with last year "
+    "should i buy or sell given valuation risk dividend debt cash flow earnings report"
+).split()
+SUFFIXES = ["Inc. - Common Stock", "Corporation - Common Stock", "Holdings, Inc. - Class A Common Stock"]
+
+
+def synthetic_symbols(count: int, rng: random.Random):
+    symbols = set()
+    while len(symbols) < count:
+        symbols.add("".join(rng.choices(string.ascii_uppercase, k=rng.randint(2, 5))))
+    entries = []
+    for symbol in sorted(symbols):
+        name = " ".join(
+            "".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9))).capitalize()
+            for _ in range(rng.randint(1, 3))
+        )
+        entries.append((symbol, f"{name} {rng.choice(SUFFIXES)}", []))
+    return entries
+
+
+def synthetic_prompts(entries, count: int, rng: random.Random):
+    prompts = []
+    for _ in range(count):
+        words = rng.choices(WORDS, k=rng.randint(15, 35))
+        for _ in range(rng.randint(0, 2)):
+            symbol, name, _ = rng.choice(entries)
+            words.insert(rng.randrange(len(words)), symbol if rng.random() < 0.6 else name.split(" - ")[0])
+        prompts.append(" ".join(words).capitalize() + "?")
+    return prompts
+
+
+def throughput(extract, prompts):
+    started = time.perf_counter()
+    for prompt in prompts:
+        extract(prompt)
+    return len(prompts) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", type=int, default=5000)
+    parser.add_argument("--prompts", type=int, default=10000)
+    parser.add_argument("--naive-prompts", type=int, default=200, help="la regex por simbolo es lenta")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    entries = synthetic_symbols(args.symbols, rng)
+    prompts = synthetic_prompts(entries, args.prompts, rng)
+    print(f"{len(entries)} symbols, {len(prompts)} prompts, "
+          f"{sum(map(len, prompts)) / len(prompts):.0f} chars/prompt")
+
+    started = time.perf_counter()
+    extractor = TickerExtractor.build(entries)
+    build_s = time.perf_counter() - started
+    with tempfile.TemporaryDirectory() as tmp:
+        extractor.save(tmp)
+        started = time.perf_counter()
+        loaded = TickerExtractor.load(tmp)
+        load_s = time.perf_counter() - started
+        print(f"build {build_s * 1000:.0f} ms, load {load_s * 1000:.1f} ms, {loaded.stats()}")
+
+        automaton_qps = throughput(loaded.extract, prompts)
+
+    patterns = [re.compile(rf"(?<![\w$])\$?{re.escape(symbol)}\b") for symbol, _, _ in entries]
+
+    def naive(prompt):
+        return {pattern.pattern for pattern in patterns if pattern.search(prompt)}
+
+    naive_qps = throughput(naive, prompts[:args.naive_prompts])
+    print(f"{'method':<22}{'prompts/s':>12}")
+    print(f"{'automaton':<22}{automaton_qps:>12.0f}")
+    print(f"{'regex per symbol':<22}{naive_qps:>12.0f}")
+    print(f"speedup x{automaton_qps / naive_qps:.0f}")
+
+
+if __name__ == "__main__":
+    main()
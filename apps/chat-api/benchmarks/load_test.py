@@ -0,0 +1,413 @@
+"""
+Prueba de carga de extremo a extremo para /generate y /chat.
+
+Ataca la app FastAPI en el mismo proceso (llamando directamente a la app
+ASGI, sin red) o un servidor ya arrancado (``--url``). El backend es el que
+configure el entorno: por defecto ``LLM_MODE=dummy`` con la simulacion de
+Bedrock (variables ``DUMMY_*``: latencias, throttling, cuotas, semilla).
+
+Modelos de llegada:
+- cerrado (``--model closed``): N clientes que envian la siguiente peticion
+  al recibir la respuesta; el nivel de cada etapa es N.
+- abierto (``--model open``): llegadas de Poisson a R peticiones/s, sin
+  esperar respuestas; el nivel de cada etapa es R.
+
+    python benchmarks/load_test.py --model closed --stages 10:4 20:16 10:32
+    python benchmarks/load_test.py --model open --stages 30:50 --mix generate=1,chat_stream=1 --output run.json
+    DUMMY_SEED=1 DUMMY_THROTTLE_RATE=0.02 python benchmarks/load_test.py --url http://127.0.0.1:8000
+
+El informe JSON (``--output``) incluye p50/p95/p99 de latencia y TTFT,
+throughput y tasa de errores, global, por operacion y por etapa.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+OPERATIONS = {
+    # operacion -> (ruta, streaming)
+    "generate": ("/api/v1/generate", False),
+    "generate_stream": ("/api/v1/generate/stream", True),
+    "chat": ("/api/v1/chat", False),
+    "chat_stream": ("/api/v1/chat/stream", True),
+}
+
+TICKERS = ["AAPL", "MSFT", "NVDA", "GOOGL", "AMZN", "META", "TSLA", "AVGO", "COST", "NFLX"]
+QUESTIONS = [
+    "What is the outlook for {t} revenue growth next quarter?",
+    "Is {t} overvalued at its current P/E ratio?",
+    "Compare the gross margin of {t} with its peers.",
+    "How exposed is {t} to interest rate changes?",
+    "Summarize the latest earnings report of {t}.",
+    "Should a conservative investor hold {t} for dividends?",
+]
+FOLLOW_UPS = ["Why?", "And compared with last year?", "What are the main risks?", "Can you explain that simply?"]
+
+# Error a mitad de stream (las respuestas son SSE: no se envia Accept NDJSON)
+STREAM_ERROR = b"event: error"
+
+
+class Result(NamedTuple):
+    operation: str
+    stage: int
+    started: float
+    latency: float
+    ttft: Optional[float]
+    status: int
+    error: Optional[str]
+
+
+class Stage(NamedTuple):
+    duration: float
+    level: float
+
+
+def parse_stages(values: List[str]) -> List[Stage]:
+    """``duracion:nivel`` en segundos y clientes (cerrado) o peticiones/s (abierto)"""
+    stages = []
+    for value in values:
+        duration, level = value.split(":")
+        stages.append(Stage(float(duration), float(level)))
+    return stages
+
+
+def parse_mix(value: str) -> Tuple[List[str], List[float]]:
+    operations, weights = [], []
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in OPERATIONS:
+            raise SystemExit(f"Unknown operation '{name}'; choose from {', '.join(OPERATIONS)}")
+        operations.append(name)
+        weights.append(float(weight or 1))
+    return operations, weights
+
+
+class Workload:
+    """Genera las peticiones: mezcla de operaciones, prompts y conversaciones"""
+
+    def __init__(self, mix: str, seed: int, chat_turns: int, sessions: int, bypass_cache: bool):
+        self.operations, self.weights = parse_mix(mix)
+        self.rng = random.Random(seed)
+        self.chat_turns = chat_turns
+        self.sessions = sessions
+        self.session_ids: List[str] = []  # emitidos por el servidor antes de empezar
+        self.bypass_cache = bypass_cache
+
+    def _question(self) -> str:
+        return self.rng.choice(QUESTIONS).format(t=self.rng.choice(TICKERS))
+
+    def next(self) -> Tuple[str, Dict[str, Any]]:
+        operation = self.rng.choices(self.operations, self.weights)[0]
+        if operation.startswith("generate"):
+            return operation, {"prompt": self._question(), "bypass_cache": self.bypass_cache}
+        if self.sessions:
+            # Historial en el servidor: solo se envia el turno nuevo
+            return operation, {"session_id": self.rng.choice(self.session_ids), "messages": [
+                {"role": "user", "content": self.rng.choice(FOLLOW_UPS + [self._question()])}
+            ]}
+        messages = [{"role": "user", "content": self._question()}]
+        for _ in range(self.rng.randrange(self.chat_turns)):
+            messages.append({"role": "assistant", "content": "The outlook depends on several factors."})
+            messages.append({"role": "user", "content": self.rng.choice(FOLLOW_UPS)})
+        return operation, {"messages": messages}
+
+
+class AsgiClient:
+    """
+    Llama a la app ASGI directamente. Se evita el transporte ASGI de httpx
+    porque acumula el cuerpo entero y no permite medir el TTFT.
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+        self._lifespan: Optional[asyncio.Task] = None
+        self._lifespan_events: Optional[asyncio.Queue] = None
+
+    async def start(self) -> None:
+        events: asyncio.Queue = asyncio.Queue()
+        started = asyncio.get_running_loop().create_future()
+        await events.put({"type": "lifespan.startup"})
+
+        async def send(message):
+            if message["type"].startswith("lifespan.startup") and not started.done():
+                started.set_result(message["type"])
+
+        self._lifespan_events = events
+        self._lifespan = asyncio.create_task(self.app({"type": "lifespan", "asgi": {"version": "3.0"}},
+                                                      events.get, send))
+        await started
+
+    async def close(self) -> None:
+        if self._lifespan is not None:
+            await self._lifespan_events.put({"type": "lifespan.shutdown"})
+            await asyncio.wait([self._lifespan], timeout=5)
+
+    async def create_session(self) -> str:
+        from src.services.llm_service_factory import session_store
+        return session_store.issue_id()
+
+    async def post(self, path: str, payload: Dict[str, Any]) -> Tuple[int, Optional[float], bool]:
+        body = json.dumps(payload).encode()
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+            "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+            "client": ("127.0.0.1", 50000), "server": ("127.0.0.1", 8000),
+        }
+        started = time.perf_counter()
+        sent = False
+        status = 0
+        first_byte: Optional[float] = None
+        stream_error = False
+
+        async def receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await asyncio.Event().wait()  # sin desconexion del cliente
+
+        async def send(message):
+            nonlocal status, first_byte, stream_error
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body" and message.get("body"):
+                if first_byte is None:
+                    first_byte = time.perf_counter() - started
+                stream_error = stream_error or STREAM_ERROR in message["body"]
+
+        await self.app(scope, receive, send)
+        return status, first_byte, stream_error
+
+
+class HttpClient:
+    """Contra un servidor arrancado (mide el primer fragmento del cuerpo)"""
+
+    def __init__(self, url: str, timeout: float):
+        import httpx
+        self.client = httpx.AsyncClient(base_url=url, timeout=timeout,
+                                        limits=httpx.Limits(max_connections=None, max_keepalive_connections=None))
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+    async def create_session(self) -> str:
+        response = await self.client.post("/api/v1/sessions")
+        response.raise_for_status()
+        return response.json()["session_id"]
+
+    async def post(self, path: str, payload: Dict[str, Any]) -> Tuple[int, Optional[float], bool]:
+        started = time.perf_counter()
+        first_byte = None
+        stream_error = False
+        async with self.client.stream("POST", path, json=payload) as response:
+            async for chunk in response.aiter_raw():
+                if chunk and first_byte is None:
+                    first_byte = time.perf_counter() - started
+                stream_error = stream_error or STREAM_ERROR in chunk
+        return response.status_code, first_byte, stream_error
+
+
+async def one_request(client: Any, workload: Workload, stage: int, results: List[Result], timeout: float) -> None:
+    operation, payload = workload.next()
+    path, streaming = OPERATIONS[operation]
+    started = time.perf_counter()
+    status, first_byte, error = 0, None, None
+    try:
+        status, first_byte, stream_error = await asyncio.wait_for(client.post(path, payload), timeout)
+        if status >= 400:
+            error = f"HTTP {status}"
+        elif streaming and stream_error:
+            error = "stream error"
+    except asyncio.TimeoutError:
+        error = "timeout"
+    except Exception as e:
+        error = type(e).__name__
+    latency = time.perf_counter() - started
+    results.append(Result(operation, stage, started, latency, first_byte if streaming else None, status, error))
+
+
+async def run_closed(client, workload, stages: List[Stage], timeout: float, think_time: float) -> List[Result]:
+    results: List[Result] = []
+    for index, stage in enumerate(stages):
+        deadline = time.perf_counter() + stage.duration
+
+        async def user():
+            while time.perf_counter() < deadline:
+                await one_request(client, workload, index, results, timeout)
+                if think_time:
+                    await asyncio.sleep(workload.rng.expovariate(1 / think_time))
+
+        await asyncio.gather(*(user() for _ in range(int(stage.level))))
+    return results
+
+
+async def run_open(client, workload, stages: List[Stage], timeout: float, max_outstanding: int) -> Tuple[List[Result], int]:
+    results: List[Result] = []
+    pending = set()
+    dropped = 0
+    for index, stage in enumerate(stages):
+        deadline = time.perf_counter() + stage.duration
+        next_arrival = time.perf_counter()
+        while True:
+            next_arrival += workload.rng.expovariate(stage.level) if stage.level > 0 else stage.duration
+            if next_arrival >= deadline:
+                break
+            await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+            if len(pending) >= max_outstanding:
+                dropped += 1  # el generador no da abasto: se cuenta, no se encola
+                continue
+            task = asyncio.create_task(one_request(client, workload, index, results, timeout))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        await asyncio.sleep(max(0.0, deadline - time.perf_counter()))
+    if pending:
+        await asyncio.wait(pending)
+    return results, dropped
+
+
+def _percentiles(values: List[float]) -> Optional[Dict[str, float]]:
+    if not values:
+        return None
+    ms = np.asarray(values) * 1000
+    return {
+        "p50": round(float(np.percentile(ms, 50)), 2),
+        "p95": round(float(np.percentile(ms, 95)), 2),
+        "p99": round(float(np.percentile(ms, 99)), 2),
+        "max": round(float(ms.max()), 2),
+        "mean": round(float(ms.mean()), 2)
+    }
+
+
+def summarize(results: List[Result], elapsed: float) -> Dict[str, Any]:
+    ok = [r for r in results if r.error is None]
+    statuses: Dict[str, int] = {}
+    errors: Dict[str, int] = {}
+    for r in results:
+        statuses[str(r.status)] = statuses.get(str(r.status), 0) + 1
+        if r.error is not None:
+            errors[r.error] = errors.get(r.error, 0) + 1
+    return {
+        "requests": len(results),
+        "ok": len(ok),
+        "errors": errors,
+        "error_rate": round(1 - len(ok) / len(results), 4) if results else 0.0,
+        "throughput_rps": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        "status_codes": statuses,
+        "latency_ms": _percentiles([r.latency for r in ok]),
+        "ttft_ms": _percentiles([r.ttft for r in ok if r.ttft is not None])
+    }
+
+
+def build_report(results: List[Result], stages: List[Stage], elapsed: float, config: Dict[str, Any],
+                 dropped: int) -> Dict[str, Any]:
+    report = {
+        "config": config,
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+        "elapsed_s": round(elapsed, 2),
+        "dropped_arrivals": dropped,
+        "overall": summarize(results, elapsed),
+        "operations": {
+            op: summarize([r for r in results if r.operation == op], elapsed)
+            for op in sorted({r.operation for r in results})
+        },
+        "stages": []
+    }
+    for index, stage in enumerate(stages):
+        report["stages"].append({
+            "duration_s": stage.duration,
+            "level": stage.level,
+            **summarize([r for r in results if r.stage == index], stage.duration)
+        })
+    return report
+
+
+def _load_app(llm_mode: str):
+    # La configuracion se lee al importar: el modo tiene que estar antes
+    os.environ.setdefault("LLM_MODE", llm_mode)
+    from src.main import app
+    return app
+
+
+async def run(args) -> Dict[str, Any]:
+    stages = parse_stages(args.stages)
+    workload = Workload(args.mix, args.seed, args.chat_turns, args.sessions, args.bypass_cache)
+    client = HttpClient(args.url, args.timeout) if args.url else AsgiClient(_load_app(args.llm_mode))
+    await client.start()
+    workload.session_ids = [await client.create_session() for _ in range(args.sessions)]
+    started = time.perf_counter()
+    dropped = 0
+    try:
+        if args.model == "closed":
+            results = await run_closed(client, workload, stages, args.timeout, args.think_time)
+        else:
+            results, dropped = await run_open(client, workload, stages, args.timeout, args.max_outstanding)
+    finally:
+        await client.close()
+    elapsed = time.perf_counter() - started
+    config = {
+        "target": args.url or "in-process",
+        "llm_mode": os.environ.get("LLM_MODE") if not args.url else None,
+        "model": args.model,
+        "stages": [list(stage) for stage in stages],
+        "mix": args.mix,
+        "seed": args.seed,
+        "chat_turns": args.chat_turns,
+        "sessions": args.sessions,
+        "bypass_cache": args.bypass_cache
+    }
+    return build_report(results, stages, elapsed, config, dropped)
+
+
+def print_summary(report: Dict[str, Any]) -> None:
+    print(f"{'scope':<18}{'req':>7}{'rps':>9}{'err%':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'ttft p50':>10}")
+    rows = [("overall", report["overall"])] + list(report["operations"].items())
+    rows += [(f"stage {i} ({s['level']:g})", s) for i, s in enumerate(report["stages"])]
+    for name, s in rows:
+        latency = s["latency_ms"] or {}
+        ttft = s["ttft_ms"] or {}
+        print(f"{name:<18}{s['requests']:>7}{s['throughput_rps']:>9.1f}{s['error_rate'] * 100:>7.1f}"
+              f"{latency.get('p50', 0):>9.0f}{latency.get('p95', 0):>9.0f}{latency.get('p99', 0):>9.0f}"
+              f"{ttft.get('p50', 0):>10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None, help="servidor arrancado; por defecto la app en el mismo proceso")
+    parser.add_argument("--llm-mode", default="dummy", help="LLM_MODE de la app en proceso (si no esta en el entorno)")
+    parser.add_argument("--model", choices=["closed", "open"], default="closed")
+    parser.add_argument("--stages", nargs="+", default=["10:8"], help="duracion_s:nivel (clientes o peticiones/s)")
+    parser.add_argument("--mix", default="generate=3,generate_stream=3,chat=2,chat_stream=2")
+    parser.add_argument("--chat-turns", type=int, default=4, help="turnos previos maximos enviados en /chat")
+    parser.add_argument("--sessions", type=int, default=0, help="sesiones del servidor (0 = historial completo)")
+    parser.add_argument("--bypass-cache", action="store_true", help="evita los caches de respuesta en /generate")
+    parser.add_argument("--think-time", type=float, default=0.0, help="pausa media entre peticiones (cerrado)")
+    parser.add_argument("--max-outstanding", type=int, default=10000, help="peticiones en vuelo maximas (abierto)")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="fichero JSON del informe")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_summary(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,44 @@
 """
 Server startup script
+
+    python run_server.py           # desarrollo: un proceso con reload en 127.0.0.1
+    python run_server.py --prod    # produccion: N workers, uvloop/httptools, drenado al parar
+
+Cada worker es un proceso con su propio estado en memoria:
+
+- Sesiones: con mas de un worker hace falta ``SESSION_DATABASE_URL`` y el
+  tier caliente se desactiva (``SESSION_MAX_HOT=0``); sin base de datos
+  ``--prod`` se niega a arrancar mas de un worker.
+- ``admission_max_concurrency``, las cuotas del dummy, los circuit breakers
+  y la salud del router son por worker (los limites efectivos se
+  multiplican por el numero de workers).
+- ``/metrics`` responde con los contadores del worker que atiende el
+  scrape: Prometheus vera "resets" entre workers. Para agregar hace falta
+  un worker (o multiprocess mode de prometheus_client).
 """
-import uvicorn
+import argparse
+import importlib.util
+import logging
 import os
+import secrets
 import sys
 
+import uvicorn
+
 # Add the current directory to Python path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-if __name__ == "__main__":
+from src.core.config import settings  # noqa: E402
+
+
+logger = logging.getLogger("run_server")
+
+
+def _available(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def run_dev() -> None:
     uvicorn.run(
         "src.main:app",
         host="127.0.0.1",
@@ -16,3 +46,80 @@ if __name__ == "__main__":
         reload=True,
         reload_dirs=["."]
     )
+
+
+def _check_workers(workers: int) -> None:
+    """Estado por proceso que rompe el reparto entre varios workers"""
+    if workers <= 1:
+        return
+    if settings.session_store_enabled:
+        if not settings.session_database_url:
+            raise SystemExit(
+                f"Refusing to start {workers} workers: sessions are in-process memory only, so consecutive "
+                "turns would land on different workers. Set SESSION_DATABASE_URL, SESSION_STORE_ENABLED=false "
+                "or --workers 1."
+            )
+        # Un LRU por worker serviria historiales sin los turnos de otros workers
+        os.environ["SESSION_MAX_HOT"] = "0"
+        if not settings.session_secret:
+            # Todos los workers deben validar los session_id que emite cualquiera
+            os.environ["SESSION_SECRET"] = secrets.token_urlsafe(32)
+            logger.warning("SESSION_SECRET not set: session ids will not survive a restart")
+        logger.warning("Multiple workers: session hot tier disabled, every turn is read from the database")
+    logger.warning(
+        f"Multiple workers: admission limits, dummy quotas, circuit breakers and /metrics counters "
+        f"are per worker (x{workers})"
+    )
+
+
+def run_prod(args: argparse.Namespace) -> None:
+    """
+    Varios workers (procesos) detras del mismo socket. Con SIGTERM uvicorn
+    deja de aceptar conexiones y espera hasta ``graceful_timeout`` a que
+    terminen las peticiones en curso (incluidos los streams) antes de
+    ejecutar el shutdown del lifespan.
+    """
+    workers = args.workers or settings.server_workers or os.cpu_count() or 1
+    _check_workers(workers)
+    # Los workers heredan el entorno: todos usan el mismo almacen compartido
+    shared_dir = args.shared_store_dir or settings.shared_store_dir or f"/dev/shm/chat-api-{args.port}"
+    os.environ["SHARED_STORE_DIR"] = shared_dir
+
+    loop = "uvloop" if _available("uvloop") else "asyncio"
+    http = "httptools" if _available("httptools") else "h11"
+    logger.warning(f"Starting {workers} workers on {args.host}:{args.port} (loop={loop}, http={http}, shared={shared_dir})")
+    uvicorn.run(
+        "src.main:app",
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        loop=loop,
+        http=http,
+        backlog=settings.server_backlog,
+        timeout_keep_alive=settings.server_keepalive_timeout,
+        timeout_graceful_shutdown=settings.server_graceful_timeout,
+        proxy_headers=True,
+        server_header=False,
+        access_log=args.access_log
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prod", action="store_true", help="modo produccion (multi-worker, sin reload)")
+    parser.add_argument("--host", default=settings.api_host)
+    parser.add_argument("--port", type=int, default=settings.api_port)
+    parser.add_argument("--workers", type=int, default=0, help="0 = SERVER_WORKERS o un worker por CPU")
+    parser.add_argument("--shared-store-dir", default="", help="por defecto /dev/shm/chat-api-<port>")
+    parser.add_argument("--access-log", action="store_true")
+    args = parser.parse_args()
+
+    if args.prod:
+        logging.basicConfig(level=logging.INFO)
+        run_prod(args)
+    else:
+        run_dev()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,48 +1,237 @@
 """
 Rutas actualizadas con factory service
 """
-from fastapi import APIRouter, HTTPException
-from typing import Dict, Any
+import time
+import orjson
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from typing import AsyncIterator, Dict, Any, Optional
 
-from ..models.llm import LLMRequest, LLMResponse, ChatRequest, ChatResponse
-from ..services.llm_service_factory import get_llm_service
+from ..models.llm import BatchGenerateRequest, LLMRequest, LLMResponse, ChatRequest, ChatResponse
+from ..services.admission import AdmissionRejected, AdmissionSlot, Priority, admission_controller, parse_priority
+from ..services.batch_runner import batch_runner
+from ..services.circuit_breaker import OPEN
+from ..services.llm_service_factory import circuit_breakers, get_llm_service, get_service_stats, session_store
 from ..core.config import settings
+from ..core.metrics import stage
 
 router = APIRouter()
 
 
 @router.get("/health")
-async def health_check() -> Dict[str, str]:
-    """Health check endpoint"""
+async def health_check() -> Dict[str, Any]:
+    """Health check endpoint (``degraded`` si algun circuito de modelo esta abierto)"""
+    circuits = circuit_breakers.states() if circuit_breakers is not None else {}
     return {
-        "status": "healthy", 
+        "status": "degraded" if OPEN in circuits.values() else "healthy",
         "service": "chat-api",
-        "mode": settings.llm_mode
+        "mode": settings.llm_mode,
+        "circuits": circuits
     }
 
 
+@router.get("/stats")
+async def service_stats() -> Dict[str, Any]:
+    """Estadisticas internas (colas, pools) para dimensionar capacidad"""
+    return get_service_stats()
+
+
 @router.post("/generate", response_model=LLMResponse)
-async def generate_text(request: LLMRequest) -> LLMResponse:
+async def generate_text(request: LLMRequest, http_request: Request) -> LLMResponse:
     """Generar texto usando LLM"""
+    slot = await _admit(http_request, Priority.DEFAULT)
     try:
         service = get_llm_service()
         response = await service.generate_text(request)
-        return response
+        # El middleware de metricas mide desde aqui la serializacion
+        http_request.state.handler_done = time.perf_counter()
+        return _json_response(response)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating text: {str(e)}")
+    finally:
+        slot.release()
 
 
 @router.post("/chat", response_model=ChatResponse)
-async def chat_conversation(request: ChatRequest) -> ChatResponse:
+async def chat_conversation(request: ChatRequest, http_request: Request) -> ChatResponse:
     """Mantener conversación con LLM"""
+    _check_session(request.session_id)
+    slot = await _admit(http_request, Priority.INTERACTIVE)
     try:
         service = get_llm_service()
         response = await service.chat(request)
-        return response
+        # El middleware de metricas mide desde aqui la serializacion
+        http_request.state.handler_done = time.perf_counter()
+        return _json_response(response)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error in chat: {str(e)}")
+    finally:
+        slot.release()
+
+
+@router.post("/generate/stream")
+async def generate_text_stream(request: LLMRequest, http_request: Request) -> StreamingResponse:
+    """Generar texto usando LLM, emitiendo tokens como SSE o NDJSON"""
+    slot = await _admit(http_request, Priority.DEFAULT)
+    try:
+        service = get_llm_service()
+        return await _stream_response(service.generate_text_stream(request), http_request, slot)
+    except Exception as e:
+        slot.release()
+        raise HTTPException(status_code=500, detail=f"Error generating text: {str(e)}")
+
+
+@router.post("/chat/stream")
+async def chat_conversation_stream(request: ChatRequest, http_request: Request) -> StreamingResponse:
+    """Mantener conversación con LLM, emitiendo tokens como SSE o NDJSON"""
+    _check_session(request.session_id)
+    slot = await _admit(http_request, Priority.INTERACTIVE)
+    try:
+        service = get_llm_service()
+        return await _stream_response(service.chat_stream(request), http_request, slot)
     except Exception as e:
+        slot.release()
         raise HTTPException(status_code=500, detail=f"Error in chat: {str(e)}")
 
 
+@router.post("/generate/batch")
+async def generate_batch(request: BatchGenerateRequest) -> StreamingResponse:
+    """
+    Ejecuta un lote de generaciones en paralelo (prioridad BULK) y emite
+    cada resultado como una linea NDJSON en cuanto termina; la ultima linea
+    es el resumen con el uso agregado.
+    """
+    items, tickers = request.expand()
+    if len(items) > settings.batch_max_items:
+        raise HTTPException(status_code=400, detail=f"Batch too large: {len(items)} items (max {settings.batch_max_items})")
+    events = batch_runner.run(
+        get_llm_service(),
+        items,
+        tickers,
+        max_concurrency=request.max_concurrency,
+        deadline=request.deadline_seconds
+    )
+    
+    async def body() -> AsyncIterator[bytes]:
+        async for event in events:
+            yield _format_event(event, ndjson=True)
+    
+    return StreamingResponse(body(), media_type="application/x-ndjson", headers={"Cache-Control": "no-cache"})
+
+
+def _json_response(response: Any) -> ORJSONResponse:
+    """
+    Devuelve una respuesta ya construida por el servicio sin que FastAPI la
+    vuelva a validar contra ``response_model`` (que sigue documentando el
+    esquema): ``model_dump`` + orjson. Las respuestas de respaldo llevan
+    ``X-Degraded``.
+    """
+    degraded = response.usage.get("degraded") if response.usage else None
+    headers = {"X-Degraded": degraded["fallback"]} if degraded else None
+    return ORJSONResponse(response.model_dump(), headers=headers)
+
+
+async def _admit(http_request: Request, default: Priority) -> AdmissionSlot:
+    """
+    Reserva una plaza en el control de admision.
+    
+    La prioridad la fija el endpoint (``/chat`` es interactivo); el cliente
+    solo puede bajarla con la cabecera ``X-Priority: bulk``. Si no hay
+    capacidad se responde 429 con ``Retry-After``.
+    """
+    priority = parse_priority(http_request.headers.get("x-priority"), default)
+    try:
+        with stage("admission"):
+            return await admission_controller.acquire(priority)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+
+async def _stream_response(events: AsyncIterator[Dict[str, Any]], http_request: Request,
+                           slot: AdmissionSlot) -> StreamingResponse:
+    """
+    Envuelve los eventos del servicio en una respuesta streaming.
+    
+    El primer evento se espera antes de responder para que los errores
+    tempranos (cliente no inicializado, credenciales, etc.) sigan devolviendo
+    un 500 normal. Los errores a mitad de stream se emiten como evento ``error``.
+    Por defecto se usa SSE; con ``Accept: application/x-ndjson`` se envia NDJSON.
+    La plaza de admision se mantiene hasta que termina el stream.
+    """
+    ndjson = "application/x-ndjson" in http_request.headers.get("accept", "")
+    first_event = await events.__anext__()
+    
+    async def body() -> AsyncIterator[bytes]:
+        try:
+            yield _format_event(first_event, ndjson)
+            async for event in events:
+                yield _format_event(event, ndjson)
+        except Exception as e:
+            yield _format_event({"event": "error", "data": {"detail": str(e)}}, ndjson)
+        finally:
+            slot.release()
+    
+    media_type = "application/x-ndjson" if ndjson else "text/event-stream"
+    return StreamingResponse(
+        body(),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache"},
+        # Por si el cliente se desconecta antes de que empiece el body
+        background=BackgroundTask(slot.release)
+    )
+
+
+def _format_event(event: Dict[str, Any], ndjson: bool) -> bytes:
+    """Serializa un evento como linea NDJSON o como bloque SSE"""
+    if ndjson:
+        return orjson.dumps({"event": event["event"], **event["data"]},
+                            option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_SERIALIZE_NUMPY)
+    data = orjson.dumps(event["data"], option=orjson.OPT_SERIALIZE_NUMPY)
+    return b"event: " + event["event"].encode() + b"\ndata: " + data + b"\n\n"
+
+
+def _check_session(session_id: Optional[str]) -> None:
+    """
+    Solo se aceptan ids emitidos por ``POST /sessions``: el id es la
+    credencial de la sesion, uno inventado no da acceso a otra conversacion.
+    """
+    if session_id is not None and session_store is not None and not session_store.is_issued(session_id):
+        raise HTTPException(status_code=404, detail="Unknown session_id; create one with POST /sessions")
+
+
+@router.post("/sessions")
+async def create_session() -> Dict[str, str]:
+    """Crea una sesion de chat; el id devuelto da acceso a su historial"""
+    if session_store is None:
+        raise HTTPException(status_code=404, detail="Session store disabled")
+    return {"session_id": session_store.issue_id()}
+
+
+@router.get("/sessions/{session_id}")
+async def get_session(session_id: str) -> Dict[str, Any]:
+    """Historial guardado de una sesion de chat"""
+    if session_store is None:
+        raise HTTPException(status_code=404, detail="Session store disabled")
+    _check_session(session_id)
+    messages = await session_store.load(session_id)
+    return {"session_id": session_id, "messages": [m.model_dump() for m in messages]}
+
+
+@router.delete("/sessions/{session_id}")
+async def delete_session(session_id: str) -> Dict[str, str]:
+    """Borra el historial de una sesion de chat"""
+    if session_store is None:
+        raise HTTPException(status_code=404, detail="Session store disabled")
+    _check_session(session_id)
+    await session_store.delete(session_id)
+    return {"message": f"Session {session_id} deleted"}
+
+
 @router.get("/models")
 async def list_models() -> Dict[str, Any]:
     """Lista modelos disponibles"""
@@ -0,0 +1,346 @@
+"""
+Metricas Prometheus del servicio (formato de texto 0.0.4 en ``/metrics``)
+
+Registro propio y minimo en lugar de ``prometheus_client``: solo counters,
+gauges e histogramas con etiquetas, que es lo que se expone. Las series
+hijas se cachean por etiquetas, asi que registrar una observacion es una
+busqueda en un dict y unas sumas. Se actualizan desde el event loop; los
+valores que viven en otros hilos (cola del executor) se leen con gauges de
+callback al hacer el scrape.
+"""
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .config import settings
+from .tracing import tracer
+
+
+# Latencias de etapas y peticiones: de 1 ms a 60 s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Base comun: nombre, ayuda, etiquetas y series hijas cacheadas"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def _new_child(self) -> Any:
+        raise NotImplementedError
+
+    def labels(self, *values: Any) -> Any:
+        """Serie para esos valores de etiqueta (creada la primera vez)"""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            child = self._children[key] = self._new_child()
+        return child
+
+    def samples(self) -> Iterator[Tuple[str, str, float]]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return lines
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._children[()].inc(amount)
+
+    def samples(self) -> Iterator[Tuple[str, str, float]]:
+        for key, child in self._children.items():
+            yield "", _format_labels(self.labelnames, key), child.value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._children[()].dec(amount)
+
+    def set(self, value: float) -> None:
+        self._children[()].set(value)
+
+
+class CallbackGauge(_Metric):
+    """Gauge cuyo valor se calcula al hacer el scrape (``{labels: valor}``)"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], Dict[Tuple[str, ...], float]],
+                 labelnames: Sequence[str] = ()):
+        self.callback = callback
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> None:
+        return None
+
+    def samples(self) -> Iterator[Tuple[str, str, float]]:
+        for key, value in self.callback().items():
+            yield "", _format_labels(self.labelnames, key), value
+
+
+class _HistogramValue:
+    __slots__ = ("upper_bounds", "counts", "sum")
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.upper_bounds, value)] += 1
+        self.sum += value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._children[()].observe(value)
+
+    def samples(self) -> Iterator[Tuple[str, str, float]]:
+        for key, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield "_bucket", _format_labels(self.labelnames, key, le), cumulative
+            yield "_sum", _format_labels(self.labelnames, key), child.sum
+            yield "_count", _format_labels(self.labelnames, key), cumulative
+
+
+class MetricsRegistry:
+    """Coleccion de metricas que se exponen juntas en ``/metrics``"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> Any:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def callback_gauge(self, name: str, documentation: str, callback: Callable[[], Dict[Tuple[str, ...], float]],
+                       labelnames: Sequence[str] = ()) -> CallbackGauge:
+        """Registra (o reemplaza) un gauge calculado en cada scrape"""
+        return self._register(CallbackGauge(name, documentation, callback, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            try:
+                lines.extend(metric.render())
+            except Exception:
+                # Un callback roto no debe tumbar el scrape entero
+                continue
+        return "\n".join(lines) + "\n"
+
+
+# Instancia global
+registry = MetricsRegistry()
+
+http_requests = registry.counter(
+    "chat_api_http_requests_total", "HTTP requests by route, method and status", ("route", "method", "status"))
+http_latency = registry.histogram(
+    "chat_api_http_request_duration_seconds", "HTTP request latency until the last body byte", ("route", "method"))
+http_in_flight = registry.gauge("chat_api_http_requests_in_flight", "HTTP requests being served")
+stage_latency = registry.histogram(
+    "chat_api_stage_duration_seconds",
+    "Time spent per request stage (admission, context_build, bedrock, response_parse, serialize)", ("stage",))
+tokens = registry.counter("chat_api_llm_tokens_total", "LLM tokens by model and direction", ("model", "direction"))
+bedrock_errors = registry.counter("chat_api_bedrock_errors_total", "Failed Bedrock calls by error code", ("code",))
+bedrock_in_flight = registry.gauge("chat_api_bedrock_calls_in_flight", "Bedrock calls (including streams) running")
+embedding_batch_size = registry.histogram(
+    "chat_api_embedding_batch_size", "Texts per embedding backend call", ("service",),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+embedding_wait = registry.histogram(
+    "chat_api_embedding_wait_seconds", "Time a text waits for its embedding batch to be sent", ("service",),
+    buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05))
+embedding_backend_latency = registry.histogram(
+    "chat_api_embedding_backend_duration_seconds", "Embedding backend call latency", ("service",),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0))
+
+
+class _Stage:
+    """Mide una etapa en ``chat_api_stage_duration_seconds`` y, con tracing, abre su span"""
+
+    __slots__ = ("child", "name", "span", "started")
+
+    def __init__(self, child: _HistogramValue, name: str):
+        self.child = child
+        self.name = name
+        self.span = None
+
+    def __enter__(self) -> "_Stage":
+        if tracer is not None:
+            self.span = tracer.start_as_current_span(self.name)
+            self.span.__enter__()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.child.observe(time.perf_counter() - self.started)
+        if self.span is not None:
+            self.span.__exit__(exc_type, exc, tb)
+
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoStage":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        return None
+
+
+_NO_STAGE = _NoStage()
+
+
+def stage(name: str) -> Any:
+    """``with stage("context_build"): ...`` (no-op con metricas desactivadas)"""
+    if not settings.metrics_enabled:
+        return _NO_STAGE
+    return _Stage(stage_latency.labels(name), name)
+
+
+def observe_stage(name: str, seconds: float) -> None:
+    """Registra una etapa medida fuera de un bloque ``with``"""
+    if settings.metrics_enabled:
+        stage_latency.labels(name).observe(seconds)
+
+
+def record_usage(model_id: Optional[str], usage: Dict[str, Any]) -> None:
+    """Suma los tokens de una llamada al modelo"""
+    if not settings.metrics_enabled or not model_id:
+        return
+    tokens.labels(model_id, "input").inc(usage.get("input_tokens") or 0)
+    tokens.labels(model_id, "output").inc(usage.get("output_tokens") or 0)
+
+
+def record_error(code: str) -> None:
+    """Cuenta un fallo de Bedrock por su codigo (``ThrottlingException``, ...)"""
+    if settings.metrics_enabled:
+        bedrock_errors.labels(code).inc()
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI: cuenta peticiones y mide su latencia completa (hasta el
+    ultimo byte, tambien en streams). La ruta es la plantilla
+    (``/api/v1/sessions/{session_id}``), no la URL, para no crear una serie
+    por id; con tracing, el span de la peticion se renombra igual al
+    terminar (al abrirlo aun no se ha resuelto la ruta). Si el handler dejo
+    ``request.state.handler_done``, el tiempo hasta enviar las cabeceras se
+    registra como etapa ``serialize``.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+        span_context = span = None
+        if tracer is not None:
+            span_context = tracer.start_as_current_span(scope["method"])
+            span = span_context.__enter__()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                handler_done = scope.get("state", {}).get("handler_done")
+                if handler_done is not None:
+                    observe_stage("serialize", time.perf_counter() - handler_done)
+            await send(message)
+
+        http_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_in_flight.dec()
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            http_requests.labels(path, method, status).inc()
+            http_latency.labels(path, method).observe(time.perf_counter() - started)
+            if span_context is not None:
+                span.update_name(f"{method} {path}")
+                span.set_attribute("http.route", path)
+                span.set_attribute("http.status_code", status)
+                span_context.__exit__(None, None, None)
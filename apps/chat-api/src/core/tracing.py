@@ -0,0 +1,75 @@
+"""
+Tracing OpenTelemetry opcional
+
+Con ``TRACING_EXPORTER=otlp`` los spans se envian a un collector local
+(``TRACING_OTLP_ENDPOINT``); con ``file`` se escriben como JSON en
+``TRACING_FILE_PATH``. Sin exporter, con uno desconocido o sin el SDK
+instalado, ``tracer`` es None y las etapas solo alimentan las metricas.
+``shutdown_tracing`` (al parar la app) vacia los spans pendientes y cierra
+el fichero.
+"""
+import logging
+from typing import IO, Any, Optional
+
+from .config import settings
+
+
+logger = logging.getLogger(__name__)
+
+EXPORTERS = ("otlp", "file")
+
+# Provider y fichero de spans abiertos por ``_build_tracer``
+_provider: Optional[Any] = None
+_trace_file: Optional[IO[str]] = None
+
+
+def _build_tracer() -> Optional[Any]:
+    global _provider, _trace_file
+    exporter_name = settings.tracing_exporter.lower()
+    if not exporter_name:
+        return None
+    if exporter_name not in EXPORTERS:
+        logger.warning(f"Unknown tracing exporter {settings.tracing_exporter!r} (expected otlp or file); "
+                       f"tracing disabled")
+        return None
+    try:
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    except ImportError:
+        logger.warning("TRACING_EXPORTER is set but opentelemetry-sdk is not installed; tracing disabled")
+        return None
+
+    if exporter_name == "otlp":
+        try:
+            from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            logger.warning("opentelemetry-exporter-otlp is not installed; tracing disabled")
+            return None
+        exporter = OTLPSpanExporter(endpoint=settings.tracing_otlp_endpoint, insecure=True)
+    else:
+        _trace_file = open(settings.tracing_file_path, "a", encoding="utf-8")
+        exporter = ConsoleSpanExporter(out=_trace_file, formatter=lambda span: span.to_json(indent=None) + "\n")
+
+    _provider = TracerProvider(resource=Resource.create({"service.name": settings.tracing_service_name}))
+    # Export en lote desde un hilo propio: no anade latencia a las peticiones
+    _provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(_provider)
+    logger.info(f"Tracing enabled ({exporter_name})")
+    return trace.get_tracer("chat-api")
+
+
+def shutdown_tracing() -> None:
+    """Exporta los spans pendientes y cierra el fichero de spans"""
+    global _provider, _trace_file
+    if _provider is not None:
+        _provider.shutdown()
+        _provider = None
+    if _trace_file is not None:
+        _trace_file.close()
+        _trace_file = None
+
+
+# Instancia global (None = tracing desactivado)
+tracer = _build_tracer()
@@ -0,0 +1 @@
+# Ingestion module
@@ -0,0 +1,148 @@
+"""
+Extraccion de texto por paginas, metadatos de la ruta y chunking con solape
+"""
+import os
+import re
+from html.parser import HTMLParser
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+SUPPORTED_EXTENSIONS = (".txt", ".md", ".htm", ".html", ".pdf")
+
+# Paginas "equivalentes" para formatos sin paginas reales (HTML)
+PAGE_CHARS = 3000
+
+_TICKER_PART = re.compile(r"(?:^|[_\-\s./])([A-Z]{1,5})(?=$|[_\-\s./])")
+_YEAR_PART = re.compile(r"(?:19|20)\d{2}")
+_DOC_TYPE_PART = re.compile(r"10-?K|10-?Q|8-?K|20-?F|S-?1|earnings[_\- ]call|annual[_\- ]report", re.IGNORECASE)
+_NOT_TICKERS = frozenset("PDF TXT HTM HTML MD K Q F S".split())
+
+
+def path_metadata(path: str) -> Dict[str, Any]:
+    """
+    Ticker, año y tipo de documento deducidos de la ruta, p.ej.
+    ``filings/AAPL/2023/10-K.pdf`` o ``AAPL_10-Q_2024.txt``.
+    """
+    base = os.path.splitext(path)[0]
+    parts = base.replace("\\", "/").split("/")
+    ticker = None
+    for part in reversed(parts):
+        match = next((m for m in _TICKER_PART.findall(part) if m not in _NOT_TICKERS), None)
+        if match:
+            ticker = match
+            break
+    years = _YEAR_PART.findall(base)
+    doc_type = _DOC_TYPE_PART.search(base)
+    normalized = None
+    if doc_type:
+        normalized = doc_type.group(0).upper().replace("_", "-").replace(" ", "-")
+        normalized = re.sub(r"^(10|8|20)-?([KQF])$", r"\1-\2", normalized)
+        normalized = re.sub(r"^S-?1$", "S-1", normalized)
+    return {"ticker": ticker, "year": int(years[-1]) if years else None, "doc_type": normalized}
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.parts: List[str] = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("script", "style"):
+            self._skip += 1
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style") and self._skip:
+            self._skip -= 1
+        elif tag in ("p", "div", "br", "tr", "li", "h1", "h2", "h3", "table"):
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.parts.append(data)
+
+
+def iter_pages(path: str) -> Iterator[str]:
+    """
+    Texto del documento pagina a pagina, sin cargarlo entero cuando el
+    formato lo permite. En texto plano el salto de pagina es ``\\f``
+    (la salida de pdftotext).
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".pdf":
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            raise RuntimeError("PDF ingestion requires pypdf (pip install pypdf)")
+        for page in PdfReader(path).pages:
+            yield page.extract_text() or ""
+    elif extension in (".htm", ".html"):
+        parser = _TextExtractor()
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for block in iter(lambda: f.read(1 << 16), ""):
+                parser.feed(block)
+        parser.close()
+        text = "".join(parser.parts)
+        for start in range(0, len(text), PAGE_CHARS):
+            yield text[start:start + PAGE_CHARS]
+    else:
+        page: List[str] = []
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                while "\f" in line:
+                    before, line = line.split("\f", 1)
+                    page.append(before)
+                    yield "".join(page)
+                    page = []
+                page.append(line)
+        if any(part.strip() for part in page):
+            yield "".join(page)
+
+
+def chunk_pages(pages: Iterator[str], chunk_chars: int = 1200, overlap_chars: int = 200
+                ) -> Iterator[Tuple[str, int]]:
+    """
+    Trocea el texto en ventanas de ~``chunk_chars`` caracteres cortando por
+    palabras, con ``overlap_chars`` de solape. Devuelve (texto, pagina inicial).
+    """
+    words: List[str] = []
+    size = 0
+    fresh = 0  # palabras nuevas desde el ultimo chunk (no solo solape)
+    first_page = 1
+    for page_number, page in enumerate(pages, start=1):
+        for word in page.split():
+            words.append(word)
+            size += len(word) + 1
+            fresh += 1
+            if size >= chunk_chars:
+                yield " ".join(words), first_page
+                # Se conserva la cola como solape con el siguiente chunk
+                tail: List[str] = []
+                tail_size = 0
+                while words and tail_size + len(words[-1]) + 1 <= overlap_chars:
+                    tail_size += len(words[-1]) + 1
+                    tail.append(words.pop())
+                words = tail[::-1]
+                size = tail_size
+                fresh = 0
+                first_page = page_number
+    if fresh:
+        yield " ".join(words), first_page
+
+
+def find_documents(root: str) -> List[str]:
+    """Documentos soportados bajo ``root`` (ordenados, rutas relativas)"""
+    found = []
+    for directory, _, files in os.walk(root):
+        for name in files:
+            if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                found.append(os.path.relpath(os.path.join(directory, name), root))
+    return sorted(found)
+
+
+def document_metadata(relative_path: str, overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    metadata = path_metadata(relative_path)
+    metadata["source"] = relative_path
+    if overrides:
+        metadata.update(overrides)
+    return metadata
@@ -0,0 +1,258 @@
+"""
+Pipeline de ingesta: documentos -> chunks -> embeddings -> indice en disco.
+
+Cada documento se procesa en un pool de procesos y deja un "shard" en el
+directorio de cache (vectores crudos + chunks JSONL). Un manifiesto guarda
+el hash del contenido de cada documento, asi al re-ejecutar solo se
+procesan los documentos nuevos o modificados; despues se ensambla el indice
+que carga la API (ver ``src.retrieval.store``).
+
+    python -m src.ingestion.pipeline --input data/filings --output data/index --workers 4
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from ..core.config import settings
+from ..retrieval.store import IndexWriter
+from ..services.embeddings import HashingEmbedder
+from .documents import chunk_pages, document_metadata, find_documents, iter_pages
+
+
+logger = logging.getLogger(__name__)
+
+
+CACHE_MANIFEST = "manifest.json"
+# Unicos ficheros que la limpieza puede borrar: el directorio lo elige el usuario
+_SHARD_FILE = re.compile(r"^([0-9a-f]{32})\.(?:jsonl|vec)(?:\.tmp)?$")
+
+
+def file_digest(path: str) -> str:
+    """sha256 del contenido, leyendo por bloques"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def shard_id(source: str, digest: str) -> str:
+    return hashlib.sha256(f"{source}\0{digest}".encode("utf-8")).hexdigest()[:32]
+
+
+def process_document(path: str, source: str, shard: str, cache_dir: str, dim: int, dtype: str,
+                     chunk_chars: int, overlap_chars: int, batch_size: int) -> Dict[str, Any]:
+    """
+    Extrae, trocea y embebe un documento escribiendo su shard. Se ejecuta en
+    un proceso del pool; solo devuelve contadores, los datos van a disco.
+    """
+    started = time.perf_counter()
+    embedder = HashingEmbedder(dim)
+    metadata = document_metadata(source)
+    pages = 0
+
+    def counted_pages() -> Iterator[str]:
+        nonlocal pages
+        for page in iter_pages(path):
+            pages += 1
+            yield page
+
+    vectors_path = os.path.join(cache_dir, f"{shard}.vec")
+    chunks_path = os.path.join(cache_dir, f"{shard}.jsonl")
+    count = 0
+    texts: List[str] = []
+    batch: List[Dict[str, Any]] = []
+    with open(vectors_path + ".tmp", "wb") as vectors_file, open(chunks_path + ".tmp", "wb") as chunks_file:
+        def flush():
+            vectors_file.write(embedder.embed_batch(texts).astype(dtype).tobytes())
+            for chunk in batch:
+                chunks_file.write(json.dumps(chunk, ensure_ascii=False).encode("utf-8") + b"\n")
+            texts.clear()
+            batch.clear()
+
+        for text, page in chunk_pages(counted_pages(), chunk_chars, overlap_chars):
+            texts.append(text)
+            batch.append({"id": f"{shard[:12]}-{count}", "text": text, "page": page, **metadata})
+            count += 1
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+    os.replace(vectors_path + ".tmp", vectors_path)
+    os.replace(chunks_path + ".tmp", chunks_path)
+    return {
+        "source": source,
+        "shard": shard,
+        "pages": pages,
+        "chunks": count,
+        "seconds": time.perf_counter() - started
+    }
+
+
+def _load_manifest(cache_dir: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    path = os.path.join(cache_dir, CACHE_MANIFEST)
+    if os.path.exists(path):
+        with open(path) as f:
+            manifest = json.load(f)
+        # Otros parametros de chunking/embedding invalidan todos los shards
+        if manifest.get("params") == params:
+            return manifest
+    return {"params": params, "documents": {}}
+
+
+def _save_manifest(cache_dir: str, manifest: Dict[str, Any]) -> None:
+    path = os.path.join(cache_dir, CACHE_MANIFEST)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _assemble(output_dir: str, cache_dir: str, documents: Dict[str, Any], dim: int, dtype: str,
+              batch_size: int, ivf_nlist: Optional[int]) -> int:
+    """Concatena los shards en un indice nuevo, por lotes"""
+    writer = IndexWriter(output_dir, dim=dim, dtype=dtype)
+    for source in sorted(documents):
+        shard = documents[source]["shard"]
+        count = documents[source]["chunks"]
+        if not count:
+            continue
+        vectors = np.memmap(os.path.join(cache_dir, f"{shard}.vec"), dtype=dtype, mode="r", shape=(count, dim))
+        with open(os.path.join(cache_dir, f"{shard}.jsonl"), "rb") as f:
+            batch: List[Dict[str, Any]] = []
+            start = 0
+            for line in f:
+                batch.append(json.loads(line))
+                if len(batch) >= batch_size:
+                    writer.add(vectors[start:start + len(batch)], batch)
+                    start += len(batch)
+                    batch = []
+            if batch:
+                writer.add(vectors[start:start + len(batch)], batch)
+        del vectors
+    writer.close(ivf_nlist=ivf_nlist)
+    return writer.count
+
+
+def run_ingestion(input_dir: str, output_dir: str, cache_dir: Optional[str] = None, workers: Optional[int] = None,
+                  dim: int = 512, dtype: str = "float16", chunk_chars: int = 1200, overlap_chars: int = 200,
+                  batch_size: int = 256, ivf_nlist: Optional[int] = None, force: bool = False) -> Dict[str, Any]:
+    """
+    Ingresa los documentos de ``input_dir`` y escribe el indice en
+    ``output_dir``. Devuelve un informe con el throughput.
+    """
+    started = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    cache_dir = cache_dir or f"{output_dir.rstrip(os.sep)}.cache"
+    os.makedirs(cache_dir, exist_ok=True)
+    params = {"dim": dim, "dtype": dtype, "chunk_chars": chunk_chars, "overlap_chars": overlap_chars,
+              "embedder": "hashing"}
+    manifest = _load_manifest(cache_dir, params)
+    previous = manifest["documents"]
+
+    current: Dict[str, Any] = {}
+    todo = []
+    for source in find_documents(input_dir):
+        digest = file_digest(os.path.join(input_dir, source))
+        shard = shard_id(source, digest)
+        entry = previous.get(source)
+        if (not force and entry is not None and entry["shard"] == shard
+                and os.path.exists(os.path.join(cache_dir, f"{shard}.jsonl"))):
+            current[source] = entry
+        else:
+            todo.append((os.path.join(input_dir, source), source, shard))
+
+    results: List[Dict[str, Any]] = []
+    failed: Dict[str, str] = {}
+    task_options = (cache_dir, dim, dtype, chunk_chars, overlap_chars, batch_size)
+    if workers <= 1 or len(todo) <= 1:
+        for path, source, shard in todo:
+            try:
+                results.append(process_document(path, source, shard, *task_options))
+            except Exception as e:
+                failed[source] = str(e)
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(todo))) as pool:
+            futures = {
+                source: pool.submit(process_document, path, source, shard, *task_options)
+                for path, source, shard in todo
+            }
+            for source, future in futures.items():
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    failed[source] = str(e)
+    for source, error in failed.items():
+        logger.error(f"Failed to ingest {source}: {error}")
+
+    for result in results:
+        current[result["source"]] = {key: result[key] for key in ("shard", "pages", "chunks")}
+
+    # Shards de documentos borrados o modificados
+    live = {entry["shard"] for entry in current.values()}
+    for name in os.listdir(cache_dir):
+        match = _SHARD_FILE.match(name)
+        path = os.path.join(cache_dir, name)
+        if match and match.group(1) not in live and os.path.isfile(path):
+            os.remove(path)
+
+    changed = bool(results) or set(current) != set(previous) or not os.path.exists(output_dir)
+    total_chunks = sum(entry["chunks"] for entry in current.values())
+    if changed:
+        total_chunks = _assemble(output_dir, cache_dir, current, dim, dtype, batch_size, ivf_nlist)
+    manifest["documents"] = current
+    _save_manifest(cache_dir, manifest)
+
+    elapsed = time.perf_counter() - started
+    pages = sum(result["pages"] for result in results)
+    busy = sum(result["seconds"] for result in results)
+    return {
+        "documents": len(current) + len(failed),
+        "processed": len(results),
+        "skipped": len(current) - len(results),
+        "failed": failed,
+        "pages_processed": pages,
+        "chunks_total": total_chunks,
+        "index_rebuilt": changed,
+        "workers": workers,
+        "seconds": round(elapsed, 3),
+        "pages_per_sec": round(pages / elapsed, 1) if elapsed > 0 else None,
+        "pages_per_sec_per_core": round(pages / busy, 1) if busy > 0 else None
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Ingest filings into the retrieval index")
+    parser.add_argument("--input", required=True, help="directorio con documentos (.pdf, .txt, .md, .htm)")
+    parser.add_argument("--output", default=settings.retrieval_index_dir or "data/index")
+    parser.add_argument("--cache", default=None, help="shards y manifiesto (por defecto <output>.cache)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--dim", type=int, default=settings.embedding_dim)
+    parser.add_argument("--dtype", choices=["float16", "float32"], default="float16")
+    parser.add_argument("--chunk-chars", type=int, default=1200)
+    parser.add_argument("--overlap-chars", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--ivf-nlist", type=int, default=None, help="0 = solo busqueda exacta")
+    parser.add_argument("--force", action="store_true", help="reprocesa todos los documentos")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    report = run_ingestion(
+        args.input, args.output, cache_dir=args.cache, workers=args.workers, dim=args.dim, dtype=args.dtype,
+        chunk_chars=args.chunk_chars, overlap_chars=args.overlap_chars, batch_size=args.batch_size,
+        ivf_nlist=args.ivf_nlist, force=args.force
+    )
+    print(json.dumps(report, indent=2))
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,31 @@
 """
 Main FastAPI application
 """
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 
 from .api.routes import router
 from .core.config import settings
+from .core.metrics import MetricsMiddleware, registry
+from .core.tracing import shutdown_tracing
+from .services.llm_service_factory import warm_up
+from .services.quote_snapshot import quote_store
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Prepara el servicio LLM y arranca/detiene las tareas de fondo (refresco de cotizaciones)"""
+    await warm_up()
+    if quote_store is not None:
+        quote_store.start()
+    yield
+    if quote_store is not None:
+        await quote_store.stop()
+    shutdown_tracing()
+
 
 # Create FastAPI application
 app = FastAPI(
@@ -13,7 +33,9 @@ app = FastAPI(
     description="API to interact with LLMs for financial analysis",
     version="0.1.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
@@ -24,6 +46,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
 
 # Include routes
 app.include_router(router, prefix="/api/v1")
@@ -39,6 +63,12 @@ async def root():
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics() -> PlainTextResponse:
+    """Metricas en formato de texto de Prometheus"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -1,16 +1,19 @@
 """
 Pydantic models for LLM operations
 """
-from typing import List, Optional, Dict, Any
-from pydantic import BaseModel, Field
+from typing import List, Optional, Dict, Any, Tuple
+from pydantic import BaseModel, Field, model_validator
 
 
 class LLMRequest(BaseModel):
     """Request model for LLM operations"""
     prompt: str = Field(..., description="Prompt for the LLM")
-    max_tokens: Optional[int] = Field(1000, description="Maximum number of tokens to generate")
+    max_tokens: Optional[int] = Field(None, description="Maximum number of tokens to generate (derived from the context if omitted)")
     temperature: Optional[float] = Field(0.7, description="Temperature for generation randomness")
     model_id: Optional[str] = Field(None, description="ID of the model to use")
+    bypass_cache: Optional[bool] = Field(False, description="Skip the response cache for this request")
+    session_id: Optional[str] = Field(None, description="Client session identifier")
+    top_k: Optional[int] = Field(None, ge=1, le=50, description="Number of document chunks to retrieve as context")
 
 
 class LLMResponse(BaseModel):
@@ -20,6 +23,35 @@ class LLMResponse(BaseModel):
     usage: Dict[str, Any] = Field(default_factory=dict, description="Usage information")
     
     
+class BatchGenerateRequest(BaseModel):
+    """Batch of generations: explicit items, or one template run over a ticker list"""
+    items: Optional[List[LLMRequest]] = Field(None, description="Requests to run")
+    template: Optional[LLMRequest] = Field(None, description="Request whose prompt contains {ticker}")
+    tickers: Optional[List[str]] = Field(None, description="Tickers substituted into the template")
+    max_concurrency: Optional[int] = Field(None, ge=1, description="Parallel items (capped by the server)")
+    deadline_seconds: Optional[float] = Field(None, gt=0, description="Deadline for the whole batch (capped by the server)")
+
+    @model_validator(mode="after")
+    def _check_shape(self) -> "BatchGenerateRequest":
+        if (self.items is None) == (self.template is None):
+            raise ValueError("Send either 'items' or 'template' with 'tickers'")
+        if self.template is not None and not self.tickers:
+            raise ValueError("'template' needs a non-empty 'tickers' list")
+        if self.items is not None and not self.items:
+            raise ValueError("'items' must not be empty")
+        return self
+
+    def expand(self) -> Tuple[List[LLMRequest], Optional[List[str]]]:
+        """Requests to run and, for templates, the ticker of each one"""
+        if self.items is not None:
+            return list(self.items), None
+        requests = [
+            self.template.model_copy(update={"prompt": self.template.prompt.replace("{ticker}", ticker)})
+            for ticker in self.tickers
+        ]
+        return requests, list(self.tickers)
+
+
 class ChatMessage(BaseModel):
     """Individual message in a conversation"""
     role: str = Field(..., description="Role of the message: user, assistant, system")
@@ -32,6 +64,9 @@ class ChatRequest(BaseModel):
     max_tokens: Optional[int] = Field(1000, description="Maximum number of tokens to generate")
     temperature: Optional[float] = Field(0.7, description="Temperature for generation randomness")
     model_id: Optional[str] = Field(None, description="ID of the model to use")
+    bypass_cache: Optional[bool] = Field(False, description="Skip the response cache for this request")
+    session_id: Optional[str] = Field(
+        None, description="Server-side session from POST /sessions; send only the new message(s)")
 
 
 class ChatResponse(BaseModel):
@@ -0,0 +1,151 @@
+"""
+Indices vectoriales embebidos: busqueda exacta (NumPy) e IVF aproximada.
+
+Las matrices pueden ser arrays normales o ``np.memmap`` float32/float16;
+se puntuan por bloques convirtiendo a float32 para no cargar todo en RAM.
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+def top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Posiciones y puntuaciones de los ``k`` mayores, de mayor a menor"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    part = np.argpartition(-scores, k - 1)[:k]
+    order = part[np.argsort(-scores[part], kind="stable")]
+    return order, scores[order]
+
+
+def score_rows(vectors: np.ndarray, query: np.ndarray, rows: Optional[np.ndarray] = None,
+               block_rows: int = 65536) -> np.ndarray:
+    """Producto escalar de ``query`` con todas las filas (o solo ``rows``), por bloques"""
+    total = len(vectors) if rows is None else len(rows)
+    scores = np.empty(total, dtype=np.float32)
+    for start in range(0, total, block_rows):
+        end = min(start + block_rows, total)
+        block = vectors[start:end] if rows is None else vectors[rows[start:end]]
+        scores[start:end] = np.asarray(block, dtype=np.float32) @ query
+    return scores
+
+
+def assign_clusters(vectors: np.ndarray, centroids: np.ndarray, block_rows: int = 8192) -> np.ndarray:
+    """Centroide mas cercano (producto escalar) de cada fila"""
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    centroids_t = np.ascontiguousarray(centroids.T, dtype=np.float32)
+    for start in range(0, len(vectors), block_rows):
+        block = np.asarray(vectors[start:start + block_rows], dtype=np.float32)
+        assignments[start:start + len(block)] = np.argmax(block @ centroids_t, axis=1)
+    return assignments
+
+
+def spherical_kmeans(vectors: np.ndarray, nlist: int, iterations: int = 10, sample_size: int = 65536,
+                     seed: int = 0) -> np.ndarray:
+    """K-means sobre la esfera unidad entrenado con una muestra de ``vectors``"""
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    rows = np.sort(rng.choice(n, size=min(n, max(sample_size, nlist)), replace=False))
+    sample = np.asarray(vectors[rows], dtype=np.float32)
+    centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = assign_clusters(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        counts = np.bincount(assignments, minlength=nlist)
+        # Listas vacias: se re-siembran con puntos al azar
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            sums[empty] = sample[rng.choice(len(sample), size=len(empty), replace=False)]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = sums / np.maximum(norms, 1e-12)
+    return centroids.astype(np.float32)
+
+
+class FlatIndex:
+    """Busqueda exacta: puntua todas las filas (o las que pasan el filtro)"""
+
+    kind = "flat"
+
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def search(self, query: np.ndarray, k: int, mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Ids y puntuaciones de los ``k`` vecinos mas similares"""
+        query = np.asarray(query, dtype=np.float32)
+        if mask is None:
+            return top_k(score_rows(self.vectors, query), k)
+        candidates = np.flatnonzero(mask)
+        positions, scores = top_k(score_rows(self.vectors, query, candidates), k)
+        return candidates[positions], scores
+
+
+class IVFIndex:
+    """
+    Indice de ficheros invertidos (IVF) sobre la misma matriz de vectores.
+
+    Cada vector pertenece a la lista de su centroide mas cercano; una consulta
+    solo puntua las ``nprobe`` listas mas prometedoras. Las listas se guardan
+    en formato CSR (``list_offsets`` + ``list_ids``). Con filtros muy
+    selectivos se hace busqueda exacta sobre las filas que pasan el filtro,
+    que es mas barato y no pierde recall.
+    """
+
+    kind = "ivf"
+
+    def __init__(self, vectors: np.ndarray, centroids: np.ndarray, list_offsets: np.ndarray,
+                 list_ids: np.ndarray, nprobe: int = 16, exact_threshold: int = 20000):
+        self.vectors = vectors
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.list_offsets = list_offsets
+        self.list_ids = list_ids
+        self.nprobe = nprobe
+        self.exact_threshold = exact_threshold
+        self._flat = FlatIndex(vectors)
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, nlist: Optional[int] = None, iterations: int = 10,
+              seed: int = 0, **options) -> "IVFIndex":
+        """Entrena los centroides y reparte los vectores en listas"""
+        nlist = nlist or default_nlist(len(vectors))
+        centroids = spherical_kmeans(vectors, nlist, iterations=iterations, seed=seed)
+        assignments = assign_clusters(vectors, centroids)
+        list_ids = np.argsort(assignments, kind="stable").astype(np.int64)
+        counts = np.bincount(assignments, minlength=nlist)
+        list_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return cls(vectors, centroids, list_offsets, list_ids, **options)
+
+    def search(self, query: np.ndarray, k: int, mask: Optional[np.ndarray] = None,
+               nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Ids y puntuaciones aproximados de los ``k`` vecinos mas similares"""
+        query = np.asarray(query, dtype=np.float32)
+        if mask is not None and np.count_nonzero(mask) <= self.exact_threshold:
+            return self._flat.search(query, k, mask)
+
+        probes, _ = top_k(self.centroids @ query, nprobe or self.nprobe)
+        candidates = np.concatenate([
+            self.list_ids[self.list_offsets[p]:self.list_offsets[p + 1]] for p in probes
+        ])
+        if mask is not None:
+            candidates = candidates[mask[candidates]]
+        # Lecturas ordenadas: acceso secuencial al memmap
+        candidates.sort()
+        positions, scores = top_k(score_rows(self.vectors, query, candidates), k)
+        return candidates[positions], scores
+
+
+def default_nlist(count: int) -> int:
+    """Numero de listas IVF por defecto (~sqrt(n))"""
+    return int(max(1, min(65536, np.sqrt(count))))
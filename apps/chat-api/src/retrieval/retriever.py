@@ -0,0 +1,69 @@
+"""
+Busqueda de chunks relevantes para un prompt
+"""
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from ..services.embeddings import HashingEmbedder
+from ..services.ticker_extractor import extract_tickers
+from .store import ChunkStore, open_index
+
+
+_YEAR_PATTERN = re.compile(r"\b(?:19|20)\d{2}\b")
+
+
+class Retriever:
+    """Embebe la consulta, aplica filtros de metadatos y devuelve los top-k chunks"""
+
+    def __init__(self, embedder: Any, index: Any, store: ChunkStore, max_top_k: int = 50):
+        self.embedder = embedder
+        self.index = index
+        self.store = store
+        self.max_top_k = max_top_k
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def search(self, query: str, top_k: int, tickers: Optional[Iterable[str]] = None,
+               years: Optional[Iterable[int]] = None, doc_type: Optional[str] = None,
+               query_vector: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """Chunks mas similares a ``query`` que cumplen los filtros, con su ``score``"""
+        top_k = max(1, min(top_k, self.max_top_k))
+        mask = self.store.mask(tickers=tickers, years=years, doc_type=doc_type)
+        if query_vector is None:
+            query_vector = self.embedder.embed(query)
+        ids, scores = self.index.search(query_vector, top_k, mask)
+        hits = []
+        for position, score in zip(ids, scores):
+            chunk = self.store.get(int(position))
+            chunk["score"] = round(float(score), 4)
+            hits.append(chunk)
+        return hits
+
+    def search_prompt(self, prompt: str, top_k: int, query_vector: Optional[np.ndarray] = None) -> Dict[str, Any]:
+        """
+        Busqueda con filtros deducidos del prompt (tickers y años mencionados).
+
+        Si los filtros no dejan resultados se relajan: primero el año y
+        despues el ticker.
+        """
+        tickers = sorted(t for t in extract_tickers(prompt) if t in self.store.ticker_codes)
+        years = sorted({int(y) for y in _YEAR_PATTERN.findall(prompt)})
+        if query_vector is None:
+            query_vector = self.embedder.embed(prompt)
+        attempts = [(tickers, years), (tickers, []), ([], [])]
+        for ticker_filter, year_filter in attempts:
+            hits = self.search(prompt, top_k, tickers=ticker_filter, years=year_filter, query_vector=query_vector)
+            if hits or not (ticker_filter or year_filter):
+                return {"hits": hits, "filters": {"tickers": ticker_filter, "years": year_filter}}
+        return {"hits": [], "filters": {}}
+
+
+def load_retriever(directory: str, nprobe: int = 16) -> Retriever:
+    """Abre un indice escrito por ``IndexWriter``"""
+    index, manifest = open_index(directory, nprobe=nprobe)
+    if manifest["embedder"] != "hashing":
+        raise ValueError(f"Unsupported embedder in index: {manifest['embedder']}")
+    return Retriever(HashingEmbedder(manifest["dim"]), index, ChunkStore(directory, manifest))
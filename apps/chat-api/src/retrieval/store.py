@@ -0,0 +1,192 @@
+"""
+Formato en disco del indice de chunks y su carga con memmap.
+
+Un directorio de indice contiene:
+
+- ``index.json``: manifiesto (dimension, dtype, embedder, vocabularios, IVF)
+- ``vectors.npy``: matriz (n, dim) float16/float32 normalizada L2
+- ``chunks.jsonl``: un chunk por linea (id, text, ticker, year, doc_type, source)
+- ``meta_*.npy``: columnas de metadatos para filtrar sin leer el JSONL
+- ``ivf_*.npy``: centroides y listas invertidas (opcional)
+
+Todo se abre con ``mmap_mode="r"``, asi arrancar con un indice grande no
+copia la matriz en memoria y varios workers comparten las paginas.
+"""
+import json
+import mmap
+import os
+import shutil
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .index import FlatIndex, IVFIndex
+
+
+MANIFEST = "index.json"
+FORMAT_VERSION = 1
+
+
+class IndexWriter:
+    """
+    Escribe un indice por lotes sin tener todos los vectores en memoria.
+
+    Los vectores se vuelcan a un fichero crudo y al cerrar se convierten a
+    ``.npy``. Se escribe en un directorio temporal que sustituye al destino
+    al final, para que la API nunca vea un indice a medio escribir.
+    """
+
+    def __init__(self, directory: str, dim: int, dtype: str = "float16", embedder: str = "hashing"):
+        self.directory = directory
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.embedder = embedder
+        self.staging = f"{directory.rstrip(os.sep)}.tmp-{os.getpid()}"
+        shutil.rmtree(self.staging, ignore_errors=True)
+        os.makedirs(self.staging)
+        self._raw = open(os.path.join(self.staging, "vectors.raw"), "wb")
+        self._chunks = open(os.path.join(self.staging, "chunks.jsonl"), "wb")
+        self._offsets: List[int] = [0]
+        self._tickers: List[int] = []
+        self._years: List[int] = []
+        self._doc_types: List[int] = []
+        self.ticker_vocab: Dict[str, int] = {}
+        self.doc_type_vocab: Dict[str, int] = {}
+        self.count = 0
+
+    def add(self, vectors: np.ndarray, chunks: List[Dict[str, Any]]) -> None:
+        """Añade un lote de vectores y sus chunks (mismo orden)"""
+        if len(vectors) != len(chunks):
+            raise ValueError("vectors and chunks must have the same length")
+        self._raw.write(np.ascontiguousarray(vectors, dtype=self.dtype).tobytes())
+        for chunk in chunks:
+            line = json.dumps(chunk, ensure_ascii=False).encode("utf-8") + b"\n"
+            self._chunks.write(line)
+            self._offsets.append(self._offsets[-1] + len(line))
+            self._tickers.append(self._code(self.ticker_vocab, chunk.get("ticker")))
+            self._years.append(int(chunk.get("year") or 0))
+            self._doc_types.append(self._code(self.doc_type_vocab, chunk.get("doc_type")))
+        self.count += len(chunks)
+
+    @staticmethod
+    def _code(vocab: Dict[str, int], value: Optional[str]) -> int:
+        if not value:
+            return -1
+        return vocab.setdefault(value, len(vocab))
+
+    def close(self, ivf_nlist: Optional[int] = None, ivf_min_vectors: int = 50000) -> str:
+        """
+        Cierra el indice; construye IVF si ``ivf_nlist`` > 0 o, por defecto,
+        si hay al menos ``ivf_min_vectors`` vectores. Devuelve el directorio.
+        """
+        self._raw.close()
+        self._chunks.close()
+        raw_path = os.path.join(self.staging, "vectors.raw")
+        vectors_path = os.path.join(self.staging, "vectors.npy")
+        if self.count:
+            vectors = np.lib.format.open_memmap(vectors_path, mode="w+", dtype=self.dtype, shape=(self.count, self.dim))
+            vectors[:] = np.memmap(raw_path, dtype=self.dtype, mode="r", shape=(self.count, self.dim))
+            vectors.flush()
+        else:
+            vectors = np.empty((0, self.dim), dtype=self.dtype)
+            np.save(vectors_path, vectors)
+        os.remove(raw_path)
+
+        np.save(os.path.join(self.staging, "meta_offsets.npy"), np.asarray(self._offsets, dtype=np.int64))
+        np.save(os.path.join(self.staging, "meta_ticker.npy"), np.asarray(self._tickers, dtype=np.int32))
+        np.save(os.path.join(self.staging, "meta_year.npy"), np.asarray(self._years, dtype=np.int16))
+        np.save(os.path.join(self.staging, "meta_doc_type.npy"), np.asarray(self._doc_types, dtype=np.int32))
+
+        ivf = None
+        if self.count and (ivf_nlist or (ivf_nlist is None and self.count >= ivf_min_vectors)):
+            index = IVFIndex.build(vectors, nlist=ivf_nlist or None)
+            np.save(os.path.join(self.staging, "ivf_centroids.npy"), index.centroids)
+            np.save(os.path.join(self.staging, "ivf_offsets.npy"), index.list_offsets)
+            np.save(os.path.join(self.staging, "ivf_ids.npy"), index.list_ids)
+            ivf = {"nlist": index.nlist}
+        del vectors
+
+        manifest = {
+            "format_version": FORMAT_VERSION,
+            "count": self.count,
+            "dim": self.dim,
+            "dtype": self.dtype.name,
+            "embedder": self.embedder,
+            "tickers": sorted(self.ticker_vocab, key=self.ticker_vocab.get),
+            "doc_types": sorted(self.doc_type_vocab, key=self.doc_type_vocab.get),
+            "ivf": ivf
+        }
+        with open(os.path.join(self.staging, MANIFEST), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+        previous = f"{self.directory.rstrip(os.sep)}.old-{os.getpid()}"
+        if os.path.exists(self.directory):
+            os.replace(self.directory, previous)
+        os.replace(self.staging, self.directory)
+        shutil.rmtree(previous, ignore_errors=True)
+        return self.directory
+
+
+class ChunkStore:
+    """Metadatos en columnas (para filtrar) y texto de los chunks bajo demanda"""
+
+    def __init__(self, directory: str, manifest: Dict[str, Any]):
+        self.directory = directory
+        self.tickers = np.load(os.path.join(directory, "meta_ticker.npy"), mmap_mode="r")
+        self.years = np.load(os.path.join(directory, "meta_year.npy"), mmap_mode="r")
+        self.doc_types = np.load(os.path.join(directory, "meta_doc_type.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(directory, "meta_offsets.npy"), mmap_mode="r")
+        self.ticker_codes = {ticker: code for code, ticker in enumerate(manifest["tickers"])}
+        self.doc_type_codes = {doc_type: code for code, doc_type in enumerate(manifest["doc_types"])}
+        self._file = open(os.path.join(directory, "chunks.jsonl"), "rb")
+        self._text = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.offsets[-1] else b""
+
+    def __len__(self) -> int:
+        return len(self.tickers)
+
+    def get(self, position: int) -> Dict[str, Any]:
+        """Chunk completo en la posicion ``position``"""
+        start, end = int(self.offsets[position]), int(self.offsets[position + 1])
+        return json.loads(self._text[start:end])
+
+    def mask(self, tickers: Optional[Iterable[str]] = None, years: Optional[Iterable[int]] = None,
+             doc_type: Optional[str] = None) -> Optional[np.ndarray]:
+        """Mascara booleana de filas que cumplen los filtros (None = sin filtros)"""
+        mask = None
+        if tickers:
+            codes = [self.ticker_codes[t] for t in tickers if t in self.ticker_codes]
+            mask = _and(mask, np.isin(self.tickers, codes))
+        if years:
+            mask = _and(mask, np.isin(self.years, list(years)))
+        if doc_type:
+            mask = _and(mask, self.doc_types == self.doc_type_codes.get(doc_type, -2))
+        return mask
+
+    def close(self) -> None:
+        if isinstance(self._text, mmap.mmap):
+            self._text.close()
+        self._file.close()
+
+
+def _and(mask: Optional[np.ndarray], other: np.ndarray) -> np.ndarray:
+    return other if mask is None else mask & other
+
+
+def read_manifest(directory: str) -> Dict[str, Any]:
+    with open(os.path.join(directory, MANIFEST)) as f:
+        return json.load(f)
+
+
+def open_index(directory: str, nprobe: int = 16):
+    """Abre vectores (memmap) e indice: IVF si existe, si no busqueda exacta"""
+    manifest = read_manifest(directory)
+    vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r")
+    if manifest.get("ivf"):
+        return IVFIndex(
+            vectors,
+            np.load(os.path.join(directory, "ivf_centroids.npy")),
+            np.load(os.path.join(directory, "ivf_offsets.npy"), mmap_mode="r"),
+            np.load(os.path.join(directory, "ivf_ids.npy"), mmap_mode="r"),
+            nprobe=nprobe
+        ), manifest
+    return FlatIndex(vectors), manifest
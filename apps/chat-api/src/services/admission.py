@@ -0,0 +1,189 @@
+"""
+Control de admision con prioridades y descarte de carga delante de los servicios LLM
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from ..core.config import settings
+
+
+class Priority(IntEnum):
+    """Clases de prioridad: menor valor = se atiende antes"""
+    INTERACTIVE = 0
+    DEFAULT = 1
+    BULK = 2
+
+
+class AdmissionRejected(Exception):
+    """La peticion no se admite; el cliente deberia reintentar tras ``retry_after`` segundos"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Server busy ({reason}), retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionSlot:
+    """Plaza concedida; ``release`` es idempotente"""
+
+    def __init__(self, controller: "AdmissionController"):
+        self._controller = controller
+        self._started = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._controller._release(time.monotonic() - self._started)
+
+
+class AdmissionController:
+    """
+    Limite global de concurrencia con una cola acotada por prioridades.
+
+    Cuando todas las plazas estan ocupadas la peticion espera en la cola
+    (las interactivas primero). Si la espera estimada (posicion en la cola
+    por el tiempo medio de servicio) supera el deadline de su clase, o la
+    cola esta llena, se rechaza de inmediato en lugar de esperar a un timeout.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, deadlines: Dict[Priority, float],
+                 initial_service_time: float = 2.0, sample_size: int = 512):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.deadlines = deadlines
+        self.service_time = initial_service_time  # EWMA en segundos
+        self._active = 0
+        self._queue: List[Tuple[int, int, asyncio.Future]] = []
+        self._queued = 0
+        self._sequence = itertools.count()
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {"queue_full": 0, "deadline": 0, "timeout": 0}
+        self._waits: Dict[Priority, Deque[float]] = {p: deque(maxlen=sample_size) for p in Priority}
+
+    def estimated_wait(self, priority: Priority) -> float:
+        """Espera estimada para una nueva peticion de esta prioridad"""
+        ahead = sum(1 for p, _, future in self._queue if p <= priority and not future.cancelled())
+        return (ahead + 1) * self.service_time / self.max_concurrency
+
+    def _retry_after(self, priority: Priority) -> int:
+        return max(1, math.ceil(self.estimated_wait(priority)))
+
+    async def acquire(self, priority: Priority = Priority.DEFAULT) -> AdmissionSlot:
+        """Obtiene una plaza o lanza ``AdmissionRejected``"""
+        if self._active < self.max_concurrency and self._queued == 0:
+            self._active += 1
+            self._admit(priority, 0.0)
+            return AdmissionSlot(self)
+
+        deadline = self.deadlines[priority]
+        if self._queued >= self.max_queue:
+            self.rejected["queue_full"] += 1
+            raise AdmissionRejected("queue_full", self._retry_after(priority))
+        if self.estimated_wait(priority) > deadline:
+            self.rejected["deadline"] += 1
+            raise AdmissionRejected("deadline", self._retry_after(priority))
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (int(priority), next(self._sequence), future))
+        self._queued += 1
+        enqueued = time.monotonic()
+        try:
+            await asyncio.wait({future}, timeout=deadline)
+        except asyncio.CancelledError:
+            self._abandon(future)
+            raise
+        if not future.done():
+            self._abandon(future)
+            self.rejected["timeout"] += 1
+            raise AdmissionRejected("timeout", self._retry_after(priority))
+
+        self._admit(priority, time.monotonic() - enqueued)
+        return AdmissionSlot(self)
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority = Priority.DEFAULT) -> AsyncIterator[AdmissionSlot]:
+        """``async with controller.slot(priority):`` reserva una plaza mientras dura el bloque"""
+        admission = await self.acquire(priority)
+        try:
+            yield admission
+        finally:
+            admission.release()
+
+    def _admit(self, priority: Priority, waited: float) -> None:
+        self.admitted += 1
+        self._waits[priority].append(waited)
+
+    def _abandon(self, future: asyncio.Future) -> None:
+        """Quita de la cola a quien deja de esperar; si ya tenia plaza, la devuelve"""
+        if future.done() and not future.cancelled():
+            self._release(None)
+        else:
+            future.cancel()
+            self._queued -= 1
+
+    def _release(self, service_time: Optional[float]) -> None:
+        if service_time is not None:
+            self.service_time = 0.8 * self.service_time + 0.2 * service_time
+        while self._queue:
+            _, _, future = heapq.heappop(self._queue)
+            if future.cancelled():
+                continue
+            # La plaza pasa directamente al siguiente en la cola
+            self._queued -= 1
+            future.set_result(None)
+            return
+        self._active -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        waits: Dict[str, Any] = {}
+        for priority, samples in self._waits.items():
+            ordered = sorted(samples)
+            waits[priority.name.lower()] = {
+                "avg_wait_ms": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0,
+                "p95_wait_ms": round(ordered[int(len(ordered) * 0.95) - 1] * 1000, 3) if ordered else 0.0
+            }
+        return {
+            "max_concurrency": self.max_concurrency,
+            "active": self._active,
+            "queued": self._queued,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "service_time_ewma_ms": round(self.service_time * 1000, 3),
+            "wait": waits
+        }
+
+
+def parse_priority(value: Optional[str], default: Priority) -> Priority:
+    """
+    Prioridad pedida por el cliente (cabecera ``X-Priority``).
+
+    Solo se permite bajar la prioridad por defecto del endpoint, nunca subirla.
+    """
+    if not value:
+        return default
+    try:
+        requested = Priority[value.strip().upper()]
+    except KeyError:
+        return default
+    return max(requested, default)
+
+
+# Instancia global del control de admision
+admission_controller = AdmissionController(
+    max_concurrency=settings.admission_max_concurrency,
+    max_queue=settings.admission_max_queue,
+    deadlines={
+        Priority.INTERACTIVE: settings.admission_deadline_interactive,
+        Priority.DEFAULT: settings.admission_deadline_default,
+        Priority.BULK: settings.admission_deadline_bulk
+    }
+)
@@ -0,0 +1,169 @@
+"""
+Ejecucion de lotes de generaciones con paralelismo acotado
+"""
+import asyncio
+import random
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+from ..core.config import settings
+from ..models.llm import LLMRequest
+from .admission import AdmissionController, AdmissionRejected, Priority, admission_controller
+
+
+class BatchRunner:
+    """
+    Reparte un lote de ``LLMRequest`` entre ``max_concurrency`` workers y
+    emite cada resultado en cuanto termina (no en el orden de entrada).
+
+    Cada item pasa por el control de admision con prioridad BULK, asi un
+    lote grande no le quita plazas al trafico interactivo. Si la admision
+    lo rechaza se reintenta con backoff (al menos ``retry_after``) mientras
+    quede deadline; solo entonces el item falla con 429. Los errores son
+    por item; al vencer el deadline del lote se cancelan los pendientes y
+    se emiten como errores 504. El ultimo evento es un ``summary`` con los
+    totales y el uso agregado.
+    """
+
+    def __init__(self, max_concurrency: int = 16, deadline: float = 300.0,
+                 admission: Optional[AdmissionController] = None, retry_backoff: float = 0.1,
+                 max_retry_backoff: float = 10.0):
+        self.max_concurrency = max_concurrency
+        self.deadline = deadline
+        self.admission = admission
+        self.retry_backoff = retry_backoff
+        self.max_retry_backoff = max_retry_backoff
+        self.admission_retries = 0
+        self.batches = 0
+        self.items = 0
+        self.failed = 0
+        self.deadline_exceeded = 0
+
+    async def _admit(self, deadline_at: float) -> Any:
+        """Plaza BULK; los rechazos se reintentan mientras el deadline del lote lo permita"""
+        attempt = 0
+        while True:
+            try:
+                return await self.admission.acquire(Priority.BULK)
+            except AdmissionRejected as e:
+                backoff = min(self.retry_backoff * 2 ** attempt, self.max_retry_backoff)
+                delay = max(e.retry_after, backoff) * random.uniform(1.0, 1.25)
+                if time.monotonic() + delay >= deadline_at:
+                    raise
+                attempt += 1
+                self.admission_retries += 1
+                await asyncio.sleep(delay)
+
+    async def _run_item(self, service: Any, request: LLMRequest, deadline_at: float) -> Dict[str, Any]:
+        if self.admission is None:
+            response = await service.generate_text(request)
+        else:
+            admission = await self._admit(deadline_at)
+            try:
+                response = await service.generate_text(request)
+            finally:
+                admission.release()
+        return {"text": response.text, "model_id": response.model_id, "usage": response.usage}
+
+    async def run(self, service: Any, requests: Sequence[LLMRequest], labels: Optional[Sequence[str]] = None,
+                  max_concurrency: Optional[int] = None,
+                  deadline: Optional[float] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Eventos ``result`` / ``error`` (con ``index`` y, si hay, ``ticker``)
+        en orden de llegada y un ``summary`` final. ``max_concurrency`` y
+        ``deadline`` del cliente solo pueden bajar los del servidor.
+        """
+        started = time.monotonic()
+        concurrency = min(max_concurrency or self.max_concurrency, self.max_concurrency, max(1, len(requests)))
+        deadline = min(deadline or self.deadline, self.deadline)
+        self.batches += 1
+        self.items += len(requests)
+
+        results: asyncio.Queue = asyncio.Queue()
+        pending = iter(range(len(requests)))
+
+        async def worker() -> None:
+            for index in pending:
+                try:
+                    result = await self._run_item(service, requests[index], started + deadline)
+                    results.put_nowait((index, result, None))
+                except AdmissionRejected as e:
+                    results.put_nowait((index, None, {"status": 429, "detail": str(e), "retry_after": e.retry_after}))
+                except Exception as e:
+                    results.put_nowait((index, None, {"status": 500, "detail": str(e)}))
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+        reported: List[bool] = [False] * len(requests)
+        usage = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+        succeeded = failed = 0
+
+        def event(kind: str, index: int, data: Dict[str, Any]) -> Dict[str, Any]:
+            reported[index] = True
+            item = {"index": index}
+            if labels is not None:
+                item["ticker"] = labels[index]
+            item.update(data)
+            return {"event": kind, "data": item}
+
+        try:
+            for _ in range(len(requests)):
+                remaining = deadline - (time.monotonic() - started)
+                try:
+                    index, result, error = await asyncio.wait_for(results.get(), timeout=max(0.0, remaining))
+                except asyncio.TimeoutError:
+                    break
+                if error is not None:
+                    failed += 1
+                    yield event("error", index, error)
+                    continue
+                succeeded += 1
+                for key in usage:
+                    usage[key] += result["usage"].get(key) or 0
+                yield event("result", index, result)
+
+            for worker_task in workers:
+                worker_task.cancel()
+            timed_out = reported.count(False)
+            if timed_out:
+                self.deadline_exceeded += 1
+                failed += timed_out
+                for index, done in enumerate(reported):
+                    if not done:
+                        yield event("error", index, {"status": 504, "detail": f"Batch deadline of {deadline}s exceeded"})
+
+            self.failed += failed
+            yield {
+                "event": "summary",
+                "data": {
+                    "items": len(requests),
+                    "succeeded": succeeded,
+                    "failed": failed,
+                    "timed_out": timed_out,
+                    "concurrency": concurrency,
+                    "elapsed_ms": round((time.monotonic() - started) * 1000, 1),
+                    "usage": usage
+                }
+            }
+        finally:
+            # Tambien si el cliente se desconecta a mitad del lote
+            for worker_task in workers:
+                worker_task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "deadline_seconds": self.deadline,
+            "batches": self.batches,
+            "items": self.items,
+            "failed_items": self.failed,
+            "admission_retries": self.admission_retries,
+            "deadline_exceeded": self.deadline_exceeded
+        }
+
+
+# Instancia global
+batch_runner = BatchRunner(
+    max_concurrency=settings.batch_max_concurrency,
+    deadline=settings.batch_deadline_seconds,
+    admission=admission_controller
+)
@@ -0,0 +1,94 @@
+"""
+Pool de ejecucion dedicado para las llamadas bloqueantes de boto3
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+
+class BedrockExecutor:
+    """
+    Ejecuta llamadas bloqueantes de Bedrock en un pool de hilos propio.
+
+    A diferencia de ``asyncio.to_thread`` no comparte el executor por defecto
+    del event loop, tiene un numero de workers acotado (igual al tamaño del
+    pool de conexiones de botocore) y lleva estadisticas de cola para poder
+    ver cuando las peticiones esperan por un worker libre.
+    """
+
+    def __init__(self, max_workers: int, sample_size: int = 1024):
+        """Crea el pool con ``max_workers`` hilos"""
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bedrock")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._total_run = 0.0
+        self._wait_samples: deque = deque(maxlen=sample_size)
+
+    async def run(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Ejecuta ``func(*args, **kwargs)`` en el pool y espera su resultado"""
+        submitted = time.perf_counter()
+
+        def call():
+            started = time.perf_counter()
+            wait = started - submitted
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+                self._total_wait += wait
+                self._max_wait = max(self._max_wait, wait)
+                self._wait_samples.append(wait)
+            failed = False
+            try:
+                return func(*args, **kwargs)
+            except BaseException:
+                failed = True
+                raise
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._completed += 1
+                    self._failed += failed
+                    self._total_run += time.perf_counter() - started
+
+        with self._lock:
+            self._queued += 1
+        future = self._pool.submit(call)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # Si la tarea aun no habia empezado se descarta y se corrige la cola
+            if future.cancel():
+                with self._lock:
+                    self._queued -= 1
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        """Profundidad de cola y tiempos de espera/ejecucion"""
+        with self._lock:
+            completed = self._completed
+            samples = sorted(self._wait_samples)
+            started = completed + self._running
+            return {
+                "max_workers": self.max_workers,
+                "queued": self._queued,
+                "running": self._running,
+                "completed": completed,
+                "failed": self._failed,
+                "avg_wait_ms": round(self._total_wait / started * 1000, 3) if started else 0.0,
+                "p95_wait_ms": round(samples[int(len(samples) * 0.95) - 1] * 1000, 3) if samples else 0.0,
+                "max_wait_ms": round(self._max_wait * 1000, 3),
+                "avg_run_ms": round(self._total_run / completed * 1000, 3) if completed else 0.0,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Cierra el pool de hilos"""
+        self._pool.shutdown(wait=wait)
@@ -4,17 +4,27 @@ Servicio AWS Bedrock para LLMs reales
 import json
 import logging
 import boto3
+import orjson
 import asyncio
-from typing import Dict, Any
+import time
+from typing import AsyncIterator, Dict, Any, Optional
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
 from ..models.llm import LLMRequest, LLMResponse, ChatRequest, ChatResponse, ChatMessage
 from ..core.config import settings
+from ..core.metrics import bedrock_in_flight, observe_stage, record_error, record_usage, stage
+from .bedrock_executor import BedrockExecutor
+from .context_builder import context_builder
 from .prompt_template import get_financial_prompt
+from .retry_policy import DEFAULT_RETRY_BUDGETS, RetryPolicy, error_code as bedrock_error_code
 
 
 logger = logging.getLogger(__name__)
 
+# Marca de fin del EventStream en la cola del pump
+_STREAM_END = object()
+
 
 class BedrockService:
     """Servicio para interactuar con AWS Bedrock"""
@@ -22,78 +32,170 @@ class BedrockService:
     def __init__(self):
         """Inicializa el cliente de Bedrock"""
         self.client = None
+        self.executor = BedrockExecutor(settings.bedrock_max_workers)
+        self.retry_policy = RetryPolicy(
+            budgets={**DEFAULT_RETRY_BUDGETS, **settings.bedrock_retry_budgets},
+            base_delay=settings.bedrock_retry_base_delay,
+            max_delay=settings.bedrock_retry_max_delay,
+            deadline=settings.bedrock_retry_deadline,
+            hedging=settings.bedrock_hedging_enabled,
+            hedge_quantile=settings.bedrock_hedge_quantile,
+            hedge_min_samples=settings.bedrock_hedge_min_samples
+        )
+        self.context_builder = context_builder
         self._initialize_client()
     
     def _initialize_client(self):
         """Inicializa el cliente de AWS Bedrock"""
         try:
+            # Un pool de conexiones por worker para que ningun hilo espere
+            # una conexion HTTP libre; las conexiones se reutilizan (keep-alive)
+            client_config = Config(
+                max_pool_connections=settings.bedrock_max_workers,
+                tcp_keepalive=True,
+                # Los reintentos los gestiona RetryPolicy, no botocore
+                retries={"total_max_attempts": 1, "mode": "standard"},
+                connect_timeout=settings.bedrock_connect_timeout,
+                read_timeout=settings.bedrock_read_timeout
+            )
             self.client = boto3.client(
                 'bedrock-runtime',
                 region_name=settings.aws_region,
                 aws_access_key_id=settings.aws_access_key_id,
-                aws_secret_access_key=settings.aws_secret_access_key
+                aws_secret_access_key=settings.aws_secret_access_key,
+                endpoint_url=settings.bedrock_endpoint_url or None,
+                config=client_config
             )
             logger.info("Bedrock client initialized successfully")
         except Exception as e:
             logger.error(f"Error initializing Bedrock client: {e}")
             self.client = None
     
+    async def warm_up(self, connections: int = 1) -> int:
+        """
+        Abre conexiones del pool antes de la primera peticion real: resuelve
+        credenciales y hace el handshake TLS con una llamada invalida a
+        proposito (body vacio -> ValidationException, sin coste de tokens).
+        
+        Returns:
+            Conexiones que obtuvieron respuesta de Bedrock
+        """
+        if not self.client:
+            return 0
+        
+        def ping() -> bool:
+            try:
+                self.client.invoke_model(
+                    modelId=settings.bedrock_model_id,
+                    contentType='application/json',
+                    accept='application/json',
+                    body=b"{}"
+                )
+            except ClientError:
+                pass  # Bedrock respondio: la conexion queda abierta en el pool
+            except Exception as e:
+                logger.warning(f"Bedrock warm-up failed: {e}")
+                return False
+            return True
+        
+        # En paralelo, para que cada worker abra su propia conexion
+        results = await asyncio.gather(*(self.executor.run(ping) for _ in range(connections)))
+        return sum(results)
+    
     def _process_response(self, response: Dict[str, Any]) -> Dict[str, Any]:
-        """Process Bedrock response to extract JSON data"""
-        response_data = response['body'].read()
-        if isinstance(response_data, bytes):
-            response_data = response_data.decode('utf-8')
-        return json.loads(response_data)
+        """Process Bedrock response to extract JSON data (orjson parsea los bytes sin decodificarlos antes)"""
+        return orjson.loads(response['body'].read())
     
     def _extract_text_safely(self, response_body: Dict[str, Any]) -> str:
         """Extract text from response with error handling"""
         try:
-            return response_body['content'][0]['text']
+            text = response_body['content'][0]['text']
         except (KeyError, IndexError, TypeError) as e:
             logger.error(f"Invalid response format from Bedrock: {e}")
             raise Exception(f"Invalid response format from Bedrock: {e}")
+        # Las respuestas se construyen sin validar: el tipo se comprueba aqui
+        if not isinstance(text, str):
+            logger.error("Invalid response format from Bedrock: text is not a string")
+            raise Exception("Invalid response format from Bedrock: text is not a string")
+        return text
     
-    
-    
-    
-    
-    
-    async def generate_text(self, request: LLMRequest) -> LLMResponse:
-        """Generar texto usando Bedrock"""
-        if not self.client:
-            raise Exception("Bedrock client not initialized")
-             
-        
-        
+    def _build_generate_body(self, request: LLMRequest, context: str, max_tokens: Optional[int] = None) -> Dict[str, Any]:
+        """Construye el payload de Claude para una generacion simple (``max_tokens`` derivado del contexto)"""
         prompt = get_financial_prompt(
             user_query=request.prompt,
-            context="Shares of apple are AAPL: $175, up 2% today, P/E ratio 25.4"
+            context=context
         )
         
-        
-                
-        # Preparar payload para Claude
-        body = {
+        return {
             "anthropic_version": "bedrock-2023-05-31",
-            "max_tokens": request.max_tokens or settings.bedrock_max_tokens,
-            "temperature": request.temperature or settings.bedrock_temperature,
+            "max_tokens": request.max_tokens or max_tokens or settings.bedrock_max_tokens,
+            "temperature": request.temperature if request.temperature is not None else settings.bedrock_temperature,
             "messages": [
                 {
                     "role": "user",
-                    "content":prompt
+                    "content": prompt
                 }
             ]
         }
+    
+    def _build_chat_body(self, request: ChatRequest) -> Dict[str, Any]:
+        """Construye el payload de Claude para una conversacion"""
+        # Convertir mensajes al formato de Claude; los mensajes "system"
+        # (instrucciones, resumen del historial) van en el campo "system"
+        messages = []
+        system = []
+        for msg in request.messages:
+            if msg.role == "system":
+                system.append(msg.content)
+                continue
+            messages.append({
+                "role": msg.role,
+                "content": msg.content
+            })
+        
+        body = {
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": request.max_tokens or settings.bedrock_max_tokens,
+            "temperature": request.temperature if request.temperature is not None else settings.bedrock_temperature,
+            "messages": messages
+        }
+        if system:
+            body["system"] = "\n\n".join(system)
+        return body
+    
+    async def _invoke_model(self, model_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Llama a invoke_model en el executor aplicando la politica de reintentos"""
+        payload = json.dumps(body)
+        bedrock_in_flight.inc()
+        try:
+            with stage("bedrock"):
+                return await self.retry_policy.call(
+                    lambda: self.executor.run(
+                        self.client.invoke_model,
+                        modelId=model_id,
+                        contentType='application/json',
+                        accept='application/json',
+                        body=payload
+                    )
+                )
+        except Exception as e:
+            record_error(bedrock_error_code(e) or type(e).__name__)
+            raise
+        finally:
+            bedrock_in_flight.dec()
+    
+    async def generate_text(self, request: LLMRequest) -> LLMResponse:
+        """Generar texto usando Bedrock"""
+        if not self.client:
+            raise Exception("Bedrock client not initialized")
+        
+        with stage("context_build"):
+            context, retrieval = await self.context_builder.build(request)
+        body = self._build_generate_body(request, context, retrieval.get("max_tokens"))
         
         try:
             # Llamada a Bedrock
-            response = await asyncio.to_thread(
-                self.client.invoke_model,
-                modelId=request.model_id or settings.bedrock_model_id,
-                contentType='application/json',
-                accept='application/json',
-                body=json.dumps(body)
-            )
+            response = await self._invoke_model(request.model_id or settings.bedrock_model_id, body)
             
             
        
@@ -101,16 +203,20 @@ class BedrockService:
              
             
             # Procesar respuesta
-            response_body = self._process_response(response)
-            text = self._extract_text_safely(response_body)
+            with stage("response_parse"):
+                response_body = self._process_response(response)
+                text = self._extract_text_safely(response_body)
+            record_usage(request.model_id or settings.bedrock_model_id, response_body['usage'])
             
-            return LLMResponse(
+            # Datos ya comprobados: model_construct evita validarlos otra vez
+            return LLMResponse.model_construct(
                 text=text,
                 model_id=request.model_id or settings.bedrock_model_id,
                 usage={
                     "input_tokens": response_body['usage']['input_tokens'],
                     "output_tokens": response_body['usage']['output_tokens'],
-                    "total_tokens": response_body['usage']['input_tokens'] + response_body['usage']['output_tokens']
+                    "total_tokens": response_body['usage']['input_tokens'] + response_body['usage']['output_tokens'],
+                    "retrieval": retrieval
                 }
             )
             
@@ -145,39 +251,22 @@ class BedrockService:
         if not self.client:
             raise Exception("Bedrock client not initialized")
         
-        # Convertir mensajes al formato de Claude
-        messages = []
-        for msg in request.messages:
-            messages.append({
-                "role": msg.role,
-                "content": msg.content
-            })
-        
-        body = {
-            "anthropic_version": "bedrock-2023-05-31",
-            "max_tokens": request.max_tokens or settings.bedrock_max_tokens,
-            "temperature": request.temperature or settings.bedrock_temperature,
-            "messages": messages
-        }
+        body = self._build_chat_body(request)
         
         try:
-            response = await asyncio.to_thread(
-                self.client.invoke_model,
-                modelId=request.model_id or settings.bedrock_model_id,
-                contentType='application/json',
-                accept='application/json',
-                body=json.dumps(body)
-            )
+            response = await self._invoke_model(request.model_id or settings.bedrock_model_id, body)
             
-            response_body = self._process_response(response)
-            text = self._extract_text_safely(response_body)
+            with stage("response_parse"):
+                response_body = self._process_response(response)
+                text = self._extract_text_safely(response_body)
+            record_usage(request.model_id or settings.bedrock_model_id, response_body['usage'])
             
-            assistant_message = ChatMessage(
+            assistant_message = ChatMessage.model_construct(
                 role="assistant",
                 content=text
             )
             
-            return ChatResponse(
+            return ChatResponse.model_construct(
                 message=assistant_message,
                 model_id=request.model_id or settings.bedrock_model_id,
                 usage={
@@ -198,7 +287,136 @@ class BedrockService:
         except Exception as e:
             logger.error(f"Unexpected error calling Bedrock: {e}")
             raise Exception(f"Error calling Bedrock: {e}")
-
-
-# Instancia global del servicio Bedrock
-bedrock_service = BedrockService()
\ No newline at end of file
+    
+    async def generate_text_stream(self, request: LLMRequest) -> AsyncIterator[Dict[str, Any]]:
+        """Generar texto usando Bedrock, emitiendo eventos a medida que llegan los tokens"""
+        if not self.client:
+            raise Exception("Bedrock client not initialized")
+        
+        model_id = request.model_id or settings.bedrock_model_id
+        with stage("context_build"):
+            context, retrieval = await self.context_builder.build(request)
+        body = self._build_generate_body(request, context, retrieval.get("max_tokens"))
+        async for event in self._stream_model(model_id, body):
+            if event["event"] == "usage":
+                event["data"]["usage"]["retrieval"] = retrieval
+            yield event
+    
+    async def chat_stream(self, request: ChatRequest) -> AsyncIterator[Dict[str, Any]]:
+        """Chat conversacional usando Bedrock, emitiendo eventos a medida que llegan los tokens"""
+        if not self.client:
+            raise Exception("Bedrock client not initialized")
+        
+        model_id = request.model_id or settings.bedrock_model_id
+        async for event in self._stream_model(model_id, self._build_chat_body(request)):
+            if event["event"] == "usage":
+                event["data"]["usage"]["conversation_turns"] = len(request.messages)
+            yield event
+    
+    async def _stream_model(self, model_id: str, body: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Invoca el modelo con invoke_model_with_response_stream y traduce el
+        EventStream de Bedrock a eventos ``delta`` (texto) y un ``usage`` final.
+        
+        El EventStream es bloqueante, asi que se consume en un worker del
+        executor que publica en una cola asyncio; si el consumidor se cancela
+        se cierra el stream para liberar el worker.
+        """
+        started = time.perf_counter()
+        bedrock_in_flight.inc()
+        try:
+            # Solo se reintenta la apertura del stream, nunca a mitad de respuesta
+            payload = json.dumps(body)
+            response = await self.retry_policy.call(
+                lambda: self.executor.run(
+                    self.client.invoke_model_with_response_stream,
+                    modelId=model_id,
+                    contentType='application/json',
+                    accept='application/json',
+                    body=payload
+                ),
+                hedge=False
+            )
+        except ClientError as e:
+            bedrock_in_flight.dec()
+            error_code = e.response.get('Error', {}).get('Code', 'Unknown')
+            error_message = e.response.get('Error', {}).get('Message', str(e))
+            record_error(error_code)
+            logger.error(f"Bedrock API error [{error_code}]: {error_message}")
+            raise Exception(f"Bedrock API error [{error_code}]: {error_message}")
+        except Exception as e:
+            bedrock_in_flight.dec()
+            record_error(bedrock_error_code(e) or type(e).__name__)
+            logger.error(f"Unexpected error calling Bedrock: {e}")
+            raise Exception(f"Error calling Bedrock: {e}")
+        
+        stream = response['body']
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        
+        def pump():
+            try:
+                for stream_event in stream:
+                    loop.call_soon_threadsafe(queue.put_nowait, stream_event)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, _STREAM_END)
+        
+        pump_task = asyncio.ensure_future(self.executor.run(pump))
+        usage = {"input_tokens": 0, "output_tokens": 0}
+        first_token_ms = None
+        stop_reason = None
+        try:
+            while True:
+                item = await queue.get()
+                if item is _STREAM_END:
+                    break
+                if isinstance(item, Exception):
+                    record_error(bedrock_error_code(item) or type(item).__name__)
+                    logger.error(f"Bedrock stream interrupted: {item}")
+                    raise Exception(f"Error calling Bedrock: {item}")
+                
+                chunk = self._process_stream_event(item)
+                if chunk is None:
+                    continue
+                chunk_type = chunk.get('type')
+                if chunk_type == 'message_start':
+                    usage["input_tokens"] = chunk['message']['usage']['input_tokens']
+                elif chunk_type == 'content_block_delta':
+                    text = chunk.get('delta', {}).get('text', '')
+                    if text:
+                        if first_token_ms is None:
+                            first_token_ms = round((time.perf_counter() - started) * 1000, 1)
+                            observe_stage("bedrock_first_token", first_token_ms / 1000)
+                        yield {"event": "delta", "data": {"text": text}}
+                elif chunk_type == 'message_delta':
+                    usage["output_tokens"] = chunk.get('usage', {}).get('output_tokens', 0)
+                    stop_reason = chunk.get('delta', {}).get('stop_reason')
+            
+            usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+            usage["time_to_first_token_ms"] = first_token_ms
+            usage["stop_reason"] = stop_reason
+            record_usage(model_id, usage)
+            yield {"event": "usage", "data": {"model_id": model_id, "usage": usage}}
+        finally:
+            bedrock_in_flight.dec()
+            if not pump_task.done():
+                close = getattr(stream, 'close', None)
+                if close is not None:
+                    close()
+    
+    def _process_stream_event(self, stream_event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Decode one EventStream event, raising on in-band Bedrock errors"""
+        if 'chunk' not in stream_event:
+            for error_key, error_value in stream_event.items():
+                message = error_value.get('message', '') if isinstance(error_value, dict) else str(error_value)
+                record_error(error_key)
+                logger.error(f"Bedrock stream error [{error_key}]: {message}")
+                raise Exception(f"Bedrock API error [{error_key}]: {message}")
+            return None
+        try:
+            return orjson.loads(stream_event['chunk']['bytes'])
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse Bedrock stream chunk: {e}")
+            raise Exception(f"Invalid JSON response from Bedrock: {e}")
\ No newline at end of file
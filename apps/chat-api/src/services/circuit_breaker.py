@@ -0,0 +1,345 @@
+"""
+Circuit breaker por modelo con respuestas de respaldo (modo degradado)
+"""
+import logging
+import re
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+
+from ..core.metrics import registry
+from ..models.llm import LLMRequest, LLMResponse, ChatRequest, ChatResponse
+from .layers import ServiceLayer
+from .response_cache import ResponseCache, request_cache_key
+from .retry_policy import error_code
+
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# Errores de la peticion, no del servicio: no abren el circuito
+CLIENT_ERROR_CODES = frozenset({"ValidationException", "AccessDeniedException", "ResourceNotFoundException"})
+# BedrockService envuelve los ClientError como "Bedrock API error [Code]: ..."
+_CODE_PATTERN = re.compile(r"Bedrock API error \[(\w+)\]")
+
+circuit_transitions = registry.counter(
+    "chat_api_circuit_transitions_total", "Circuit breaker state changes by model and new state", ("model", "state"))
+degraded_responses = registry.counter(
+    "chat_api_degraded_responses_total", "Responses served by a fallback, by fallback kind", ("fallback",))
+
+
+def is_client_error(error: BaseException) -> bool:
+    code = error_code(error)
+    if code is None:
+        match = _CODE_PATTERN.search(str(error))
+        code = match.group(1) if match else None
+    return code in CLIENT_ERROR_CODES
+
+
+class CircuitOpen(Exception):
+    """No hay llamada al modelo: su circuito esta abierto"""
+
+
+class CircuitBreaker:
+    """
+    Estado de un modelo: ``closed`` (normal), ``open`` (se rechaza sin
+    llamar) y ``half_open`` (se deja pasar una sonda).
+
+    Se abre cuando, con al menos ``min_calls`` en la ventana de las ultimas
+    ``window`` llamadas, la fraccion de errores supera ``error_threshold`` o
+    la de llamadas lentas (mas de ``slow_call_seconds``) supera
+    ``slow_call_threshold``. Tras ``open_seconds`` pasa a half-open: si la
+    sonda va bien se cierra con la ventana limpia; si falla, vuelve a abrirse.
+    """
+
+    def __init__(self, name: str, window: int = 20, min_calls: int = 10, error_threshold: float = 0.5,
+                 slow_call_seconds: float = 15.0, slow_call_threshold: float = 0.8, open_seconds: float = 30.0,
+                 half_open_probes: int = 1):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_threshold = error_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_threshold = slow_call_threshold
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self._outcomes: Deque[Tuple[bool, bool]] = deque(maxlen=window)  # (ok, lenta)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self.transitions: Dict[str, int] = {CLOSED: 0, OPEN: 0, HALF_OPEN: 0}
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._transition(HALF_OPEN)
+        return self._state
+
+    def _transition(self, state: str) -> None:
+        logger.warning(f"Circuit for {self.name}: {self._state} -> {state}")
+        self._state = state
+        self.transitions[state] += 1
+        circuit_transitions.labels(self.name, state).inc()
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        if state != HALF_OPEN:
+            self._probes = 0
+        if state == CLOSED:
+            self._outcomes.clear()
+
+    def allow(self) -> bool:
+        """Reserva una llamada; si devuelve True hay que llamar a ``record`` o ``release``"""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and self._probes < self.half_open_probes:
+            self._probes += 1
+            return True
+        self.rejected += 1
+        return False
+
+    def release(self) -> None:
+        """La llamada no llego a dar resultado (cancelada, error del cliente)"""
+        if self._state == HALF_OPEN and self._probes:
+            self._probes -= 1
+
+    def record(self, latency: float, ok: bool) -> None:
+        slow = latency > self.slow_call_seconds
+        if self._state == HALF_OPEN:
+            self._transition(CLOSED if ok and not slow else OPEN)
+            return
+        self._outcomes.append((ok, slow))
+        calls = len(self._outcomes)
+        if self._state != CLOSED or calls < self.min_calls:
+            return
+        errors = sum(1 for outcome_ok, _ in self._outcomes if not outcome_ok)
+        slow_calls = sum(1 for _, outcome_slow in self._outcomes if outcome_slow)
+        if errors / calls >= self.error_threshold or slow_calls / calls >= self.slow_call_threshold:
+            self._transition(OPEN)
+
+    def stats(self) -> Dict[str, Any]:
+        calls = len(self._outcomes)
+        return {
+            "state": self.state,
+            "calls_in_window": calls,
+            "error_rate": round(sum(1 for ok, _ in self._outcomes if not ok) / calls, 4) if calls else 0.0,
+            "slow_rate": round(sum(1 for _, slow in self._outcomes if slow) / calls, 4) if calls else 0.0,
+            "rejected": self.rejected,
+            "transitions": dict(self.transitions)
+        }
+
+
+class CircuitBreakers:
+    """Un ``CircuitBreaker`` por ``model_id``, creados bajo demanda con la misma configuracion"""
+
+    def __init__(self, **config: Any):
+        self.config = config
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, model_id: str) -> CircuitBreaker:
+        breaker = self.breakers.get(model_id)
+        if breaker is None:
+            breaker = self.breakers[model_id] = CircuitBreaker(model_id, **self.config)
+        return breaker
+
+    def states(self) -> Dict[str, str]:
+        return {model_id: breaker.state for model_id, breaker in self.breakers.items()}
+
+    def stats(self) -> Dict[str, Any]:
+        return {model_id: breaker.stats() for model_id, breaker in self.breakers.items()}
+
+    def metric_values(self) -> Dict[Tuple[str, ...], float]:
+        """Para el gauge ``chat_api_circuit_state`` (0 closed, 1 half-open, 2 open)"""
+        return {(model_id,): _STATE_VALUES[state] for model_id, state in self.states().items()}
+
+
+class CircuitBreakerLayer(ServiceLayer):
+    """
+    Protege cada llamada con el circuito de su modelo.
+
+    Si el circuito esta abierto, o la llamada falla por un error del
+    servicio (no de la peticion), se responde con el primer respaldo
+    disponible: otro modelo con el circuito cerrado, una respuesta
+    cacheada de la misma peticion o, si se ha activado, el servicio dummy.
+    La respuesta lleva ``usage["degraded"]`` con el motivo y el respaldo
+    usado (las capas de cache y sesion no la guardan, el router la cuenta
+    como fallo); si no queda ninguno se propaga el error original.
+    """
+
+    def __init__(self, inner: Any, breakers: CircuitBreakers, default_model_id: str,
+                 fallback_models: Optional[List[str]] = None, cache: Optional[ResponseCache] = None,
+                 default_temperature: float = 0.7, dummy: Any = None):
+        super().__init__(inner)
+        self.breakers = breakers
+        self.default_model_id = default_model_id
+        self.fallback_models = fallback_models or []
+        self.cache = cache
+        self.default_temperature = default_temperature
+        self.dummy = dummy
+
+    async def _guarded(self, request: Any, call: Callable[[Any], Any]) -> Any:
+        """Llama al modelo de la peticion a traves de su circuito"""
+        breaker = self.breakers.get(request.model_id or self.default_model_id)
+        if not breaker.allow():
+            raise CircuitOpen(f"Circuit open for {breaker.name}")
+        started = time.monotonic()
+        try:
+            response = await call(request)
+        except Exception as e:
+            if is_client_error(e):
+                breaker.release()
+            else:
+                breaker.record(time.monotonic() - started, ok=False)
+            raise
+        except BaseException:
+            breaker.release()
+            raise
+        breaker.record(time.monotonic() - started, ok=True)
+        return response
+
+    def _fallback_models(self, model_id: str) -> List[str]:
+        return [m for m in self.fallback_models if m != model_id and self.breakers.get(m).state != OPEN]
+
+    async def _cached(self, request: Any, response_type: Any) -> Optional[Any]:
+        if self.cache is None:
+            return None
+        # La clave del cache se calcula con la peticion del cliente (sin el modelo del router)
+        for candidate in (request, request.model_copy(update={"model_id": None})):
+            key = request_cache_key(candidate, self.default_model_id, self.default_temperature)
+            cached = await self.cache.backend.get(key)
+            if cached is not None:
+                return response_type.model_validate_json(cached)
+        return None
+
+    async def _respond(self, request: Any, call_name: str, response_type: Any) -> Any:
+        model_id = request.model_id or self.default_model_id
+        try:
+            return await self._guarded(request, getattr(self.inner, call_name))
+        except Exception as e:
+            if not isinstance(e, CircuitOpen) and is_client_error(e):
+                raise
+            reason, original = ("circuit_open" if isinstance(e, CircuitOpen) else "error"), e
+
+        for fallback_model in self._fallback_models(model_id):
+            try:
+                response = await self._guarded(request.model_copy(update={"model_id": fallback_model}),
+                                               getattr(self.inner, call_name))
+            except Exception:
+                continue
+            return self._mark(response, reason, model_id, f"model:{fallback_model}")
+        response = await self._cached(request, response_type)
+        if response is not None:
+            return self._mark(response, reason, model_id, "cache")
+        if self.dummy is not None:
+            response = await getattr(self.dummy, call_name)(self._for_dummy(request))
+            return self._mark(response, reason, model_id, "dummy")
+        raise original
+
+    @staticmethod
+    def _for_dummy(request: Any) -> Any:
+        # Sin model_id el dummy responde (y cuenta tokens) con su propio modelo
+        return request.model_copy(update={"model_id": None})
+
+    def _mark(self, response: Any, reason: str, model_id: str, fallback: str) -> Any:
+        degraded_responses.labels(fallback.split(":")[0]).inc()
+        response.usage["degraded"] = {"reason": reason, "model_id": model_id, "fallback": fallback}
+        return response
+
+    async def generate_text(self, request: LLMRequest) -> LLMResponse:
+        return await self._respond(request, "generate_text", LLMResponse)
+
+    async def chat(self, request: ChatRequest) -> ChatResponse:
+        return await self._respond(request, "chat", ChatResponse)
+
+    async def generate_text_stream(self, request: LLMRequest) -> AsyncIterator[Dict[str, Any]]:
+        async for event in self._stream(request, "generate_text_stream", "generate_text", LLMResponse):
+            yield event
+
+    async def chat_stream(self, request: ChatRequest) -> AsyncIterator[Dict[str, Any]]:
+        async for event in self._stream(request, "chat_stream", "chat", ChatResponse):
+            yield event
+
+    async def _open_stream(self, request: Any, stream_name: str) -> Tuple[Dict[str, Any], AsyncIterator, Any, float]:
+        """
+        Abre el stream y espera el primer evento: solo hasta ahi se puede usar
+        un respaldo. La latencia que cuenta para el circuito es la de ese
+        primer evento (una respuesta larga no es una llamada lenta).
+        """
+        breaker = self.breakers.get(request.model_id or self.default_model_id)
+        if not breaker.allow():
+            raise CircuitOpen(f"Circuit open for {breaker.name}")
+        started = time.monotonic()
+        events = getattr(self.inner, stream_name)(request)
+        try:
+            first = await events.__anext__()
+        except Exception as e:
+            if is_client_error(e):
+                breaker.release()
+            else:
+                breaker.record(time.monotonic() - started, ok=False)
+            raise
+        except BaseException:
+            breaker.release()
+            raise
+        return first, events, breaker, time.monotonic() - started
+
+    async def _stream(self, request: Any, stream_name: str, call_name: str,
+                      response_type: Any) -> AsyncIterator[Dict[str, Any]]:
+        model_id = request.model_id or self.default_model_id
+        opened = None
+        degraded = None
+        try:
+            opened = await self._open_stream(request, stream_name)
+        except Exception as e:
+            if not isinstance(e, CircuitOpen) and is_client_error(e):
+                raise
+            reason, original = ("circuit_open" if isinstance(e, CircuitOpen) else "error"), e
+
+        if opened is None:
+            for fallback_model in self._fallback_models(model_id):
+                try:
+                    opened = await self._open_stream(request.model_copy(update={"model_id": fallback_model}),
+                                                     stream_name)
+                except Exception:
+                    continue
+                degraded_responses.labels("model").inc()
+                degraded = {"reason": reason, "model_id": model_id, "fallback": f"model:{fallback_model}"}
+                break
+
+        if opened is None:
+            # Sin modelo disponible: la respuesta de respaldo se emite de una vez
+            response, fallback = await self._cached(request, response_type), "cache"
+            if response is None and self.dummy is not None:
+                response, fallback = await getattr(self.dummy, call_name)(self._for_dummy(request)), "dummy"
+            if response is None:
+                raise original
+            self._mark(response, reason, model_id, fallback)
+            text = response.text if isinstance(response, LLMResponse) else response.message.content
+            yield {"event": "delta", "data": {"text": text}}
+            yield {"event": "usage", "data": {"model_id": response.model_id, "usage": response.usage}}
+            return
+
+        event, events, breaker, first_event_latency = opened
+        finished = False
+        try:
+            while True:
+                if event["event"] == "usage":
+                    finished = True
+                    breaker.record(first_event_latency, ok=True)
+                    if degraded is not None:
+                        event["data"]["usage"]["degraded"] = degraded
+                yield event
+                try:
+                    event = await events.__anext__()
+                except StopAsyncIteration:
+                    break
+        except Exception:
+            if not finished:
+                finished = True
+                breaker.record(first_event_latency, ok=False)
+            raise
+        finally:
+            if not finished:
+                breaker.release()
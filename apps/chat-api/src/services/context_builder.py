@@ -0,0 +1,134 @@
+"""
+Contexto de mercado para el prompt a partir del indice de documentos
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..core.config import settings
+from ..models.llm import LLMRequest
+from .embedding_service import EmbeddingService, LocalEmbeddingBackend
+from .financial_ratios import FinancialAnalysis, financial_analysis
+from .prompt_packer import ContextPiece, PromptPacker, prompt_packer
+from .quote_snapshot import QuoteStore, format_quote, quote_store
+from .ticker_extractor import extract_tickers
+
+
+logger = logging.getLogger(__name__)
+
+
+NO_CONTEXT = "No additional market context available."
+
+# Prioridad de los datos exactos frente a los chunks (score = similitud <= 1)
+QUOTES_SCORE = 3.0
+RATIOS_SCORE = 2.0
+
+
+def format_chunk(chunk: Dict[str, Any]) -> str:
+    """Texto del chunk precedido por su procedencia, p.ej. ``[AAPL 10-K 2023]``"""
+    label = " ".join(str(part) for part in (chunk.get("ticker"), chunk.get("doc_type"), chunk.get("year")) if part)
+    return f"[{label}] {chunk['text']}" if label else chunk["text"]
+
+
+class ContextBuilder:
+    """
+    Cotizaciones y ratios precalculados de los tickers del prompt mas los
+    ``top_k`` chunks recuperados; el ``PromptPacker`` elige cuales caben en
+    el presupuesto de tokens. Sin datos devuelve ``NO_CONTEXT``.
+    """
+
+    def __init__(self, retriever: Any = None, default_top_k: int = 5, packer: Optional[PromptPacker] = None,
+                 embeddings: Optional[EmbeddingService] = None, quotes: Optional[QuoteStore] = None,
+                 financials: Optional[FinancialAnalysis] = None):
+        self.retriever = retriever
+        self.quotes = quotes
+        self.financials = financials
+        self.default_top_k = default_top_k
+        self.packer = packer or PromptPacker()
+        # Micro-batching de los embeddings de consulta con el embedder del indice
+        self.embeddings = embeddings
+
+    async def build(self, request: LLMRequest) -> Tuple[str, Dict[str, Any]]:
+        """Contexto para ``get_financial_prompt`` y metricas para ``usage['retrieval']``"""
+        pieces: List[ContextPiece] = []
+        report: Dict[str, Any] = {"chunks": 0, "index": None}
+        tickers = extract_tickers(request.prompt) if self.quotes is not None or self.financials is not None else ()
+        # Datos exactos de los tickers mencionados: siempre por delante de los chunks
+        if self.quotes is not None:
+            quotes = self.quotes.quotes_for(tickers)
+            if quotes:
+                as_of = datetime.fromtimestamp(self.quotes.snapshot.as_of, tz=timezone.utc)
+                text = f"Market data as of {as_of:%Y-%m-%d %H:%M} UTC:\n" + "\n".join(format_quote(q) for q in quotes)
+                pieces.append(ContextPiece(text, QUOTES_SCORE, "quotes"))
+            report["quotes"] = len(quotes)
+            report["quotes_stale"] = self.quotes.is_stale()
+        if self.financials is not None:
+            summaries = self.financials.summaries_for(tickers)
+            if summaries:
+                text = "Financial ratios (precomputed, use as given):\n" + "\n".join(summaries)
+                pieces.append(ContextPiece(text, RATIOS_SCORE, "ratios"))
+            report["ratios"] = len(summaries)
+
+        if self.retriever is not None:
+            top_k = request.top_k or self.default_top_k
+            started = time.perf_counter()
+            vector = await self.embeddings.embed(request.prompt) if self.embeddings is not None else None
+            # La busqueda es CPU (NumPy libera el GIL en los productos)
+            result = await asyncio.to_thread(self.retriever.search_prompt, request.prompt, top_k, vector)
+            pieces.extend(ContextPiece(format_chunk(chunk), chunk["score"], "chunk") for chunk in result["hits"])
+            report.update({
+                "top_k": top_k,
+                "filters": result["filters"],
+                "index": self.retriever.index.kind,
+                "latency_ms": round((time.perf_counter() - started) * 1000, 2)
+            })
+
+        selected, packing = self.packer.pack(request.prompt, pieces, request.max_tokens)
+        report["chunks"] = sum(1 for piece in selected if piece.kind == "chunk")
+        report.update(packing)
+        return ("\n\n".join(piece.text for piece in selected) or NO_CONTEXT), report
+
+
+def _load_retriever() -> Optional[Any]:
+    """Carga el indice configurado; si no hay o falla se sigue sin contexto"""
+    if not settings.retrieval_index_dir:
+        return None
+    if not os.path.exists(settings.retrieval_index_dir):
+        logger.warning(f"Retrieval index not found at {settings.retrieval_index_dir}")
+        return None
+    try:
+        from ..retrieval.retriever import load_retriever
+        retriever = load_retriever(settings.retrieval_index_dir, nprobe=settings.retrieval_nprobe)
+        logger.info(f"Retrieval index loaded: {len(retriever)} chunks ({retriever.index.kind})")
+        return retriever
+    except Exception as e:
+        logger.error(f"Error loading retrieval index: {e}")
+        return None
+
+
+def _build_context_builder() -> ContextBuilder:
+    retriever = _load_retriever()
+    embeddings = None
+    if retriever is not None:
+        embeddings = EmbeddingService(
+            LocalEmbeddingBackend(retriever.embedder),
+            max_batch_size=settings.embedding_max_batch_size,
+            max_wait_ms=settings.embedding_max_wait_ms,
+            cache_size=settings.embedding_cache_size,
+            name="retrieval"
+        )
+    return ContextBuilder(
+        retriever,
+        default_top_k=settings.retrieval_default_top_k,
+        packer=prompt_packer,
+        embeddings=embeddings,
+        quotes=quote_store,
+        financials=financial_analysis
+    )
+
+
+# Instancia global
+context_builder = _build_context_builder()
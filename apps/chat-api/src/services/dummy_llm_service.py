@@ -1,19 +1,98 @@
 """
-Dummy LLM service for initial testing
+Dummy LLM service: simulacion local de Bedrock para pruebas y carga
 """
-import random
 import asyncio
-from typing import List
+import math
+import random
+import time
+from collections import deque
+from typing import TYPE_CHECKING, AsyncIterator, Deque, Dict, Any, NamedTuple, Optional
 
 from ..models.llm import LLMRequest, LLMResponse, ChatRequest, ChatResponse, ChatMessage
 from ..core.config import settings
+from ..core.metrics import record_error, record_usage
+from .prompt_packer import count_tokens
+
+if TYPE_CHECKING:
+    from botocore.exceptions import ClientError
+
+
+class SimulationProfile:
+    """
+    Parametros de la simulacion.
+
+    - Latencia: TTFT log-normal (``ttft_median_ms``, ``ttft_sigma``) y un
+      retardo por token log-normal alrededor de ``1 / tokens_per_second``.
+    - Longitud: tokens de salida log-normales (``output_tokens_median``),
+      limitados por ``max_tokens`` de la peticion.
+    - Fallos: ``ThrottlingException`` y timeouts de lectura con la
+      probabilidad indicada; un timeout tarda ``timeout_seconds``.
+    - Cuotas: ``max_concurrency`` y ``requests_per_minute`` (0 = sin limite);
+      por encima se responde ``ThrottlingException`` como hace Bedrock.
+    """
+
+    def __init__(self, ttft_median_ms: float = 300.0, ttft_sigma: float = 0.5, tokens_per_second: float = 80.0,
+                 token_sigma: float = 0.3, output_tokens_median: int = 80, output_tokens_sigma: float = 0.4,
+                 throttle_rate: float = 0.0, timeout_rate: float = 0.0, timeout_seconds: float = 10.0,
+                 max_concurrency: int = 0, requests_per_minute: int = 0):
+        self.ttft_median_ms = ttft_median_ms
+        self.ttft_sigma = ttft_sigma
+        self.tokens_per_second = tokens_per_second
+        self.token_sigma = token_sigma
+        self.output_tokens_median = output_tokens_median
+        self.output_tokens_sigma = output_tokens_sigma
+        self.throttle_rate = throttle_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_seconds = timeout_seconds
+        self.max_concurrency = max_concurrency
+        self.requests_per_minute = requests_per_minute
+
+    @classmethod
+    def from_settings(cls) -> "SimulationProfile":
+        return cls(
+            ttft_median_ms=settings.dummy_ttft_median_ms,
+            ttft_sigma=settings.dummy_ttft_sigma,
+            tokens_per_second=settings.dummy_tokens_per_second,
+            token_sigma=settings.dummy_token_sigma,
+            output_tokens_median=settings.dummy_output_tokens_median,
+            output_tokens_sigma=settings.dummy_output_tokens_sigma,
+            throttle_rate=settings.dummy_throttle_rate,
+            timeout_rate=settings.dummy_timeout_rate,
+            timeout_seconds=settings.dummy_timeout_seconds,
+            max_concurrency=settings.dummy_max_concurrency,
+            requests_per_minute=settings.dummy_requests_per_minute
+        )
+
+
+class _Plan(NamedTuple):
+    """Todo lo aleatorio de una llamada, decidido al empezar"""
+    rng: random.Random
+    ttft: float
+    token_delay: float
+    output_tokens: int
+    failure: Optional[str]  # None | ThrottlingException | timeout
+
+
+def _throttled(message: str) -> "ClientError":
+    # botocore se importa solo al fallar: el modo dummy arranca sin cargarlo
+    from botocore.exceptions import ClientError
+    record_error("ThrottlingException")
+    return ClientError({"Error": {"Code": "ThrottlingException", "Message": message}}, "InvokeModel")
 
 
 class DummyLLMService:
-    """LLM service with simulated responses"""
-    
-    def __init__(self):
+    """
+    LLM service with simulated responses.
+
+    Cada llamada obtiene su propio ``random.Random`` derivado de ``seed`` y
+    del numero de llamada, asi la misma secuencia de peticiones produce las
+    mismas latencias, longitudes y fallos aunque se ejecuten en paralelo.
+    """
+
+    def __init__(self, profile: Optional[SimulationProfile] = None, seed: Optional[int] = None):
         """Initialize the dummy service"""
+        self.profile = profile or SimulationProfile()
+        self.seed = seed
         self.financial_responses = [
             "As a financial AI analyst, I can help you with market analysis, asset valuation and investment strategies.",
             "The NASDAQ market shows interesting trends. Are you interested in any specific sector?",
@@ -21,70 +100,232 @@ class DummyLLMService:
             "Risk metrics are essential for a balanced portfolio. What's your risk profile?",
             "Technical indicators suggest several patterns. Do you want to analyze any specific asset?"
         ]
-    
+        self._calls = 0
+        self._in_flight = 0
+        self._recent: Deque[float] = deque()
+        self.peak_in_flight = 0
+        self.throttled = 0
+        self.timeouts = 0
+        self.completed = 0
+
+    def _rng(self) -> random.Random:
+        self._calls += 1
+        if self.seed is None:
+            return random.Random()
+        return random.Random(f"{self.seed}:{self._calls}")
+
+    def _lognormal(self, rng: random.Random, median: float, sigma: float) -> float:
+        return median * math.exp(rng.gauss(0.0, sigma)) if sigma > 0 else median
+
+    def _plan(self, max_tokens: Optional[int]) -> _Plan:
+        """Latencias, longitud y fallo de la llamada"""
+        p = self.profile
+        rng = self._rng()
+        roll = rng.random()
+        failure = None
+        if roll < p.throttle_rate:
+            failure = "ThrottlingException"
+        elif roll < p.throttle_rate + p.timeout_rate:
+            failure = "timeout"
+        output_tokens = max(1, round(self._lognormal(rng, p.output_tokens_median, p.output_tokens_sigma)))
+        if max_tokens:
+            output_tokens = min(output_tokens, max_tokens)
+        return _Plan(
+            rng=rng,
+            ttft=self._lognormal(rng, p.ttft_median_ms, p.ttft_sigma) / 1000,
+            token_delay=1.0 / p.tokens_per_second if p.tokens_per_second > 0 else 0.0,
+            output_tokens=output_tokens,
+            failure=failure
+        )
+
+    def _token_delay(self, plan: _Plan) -> float:
+        return self._lognormal(plan.rng, plan.token_delay, self.profile.token_sigma) if plan.token_delay else 0.0
+
+    def _acquire(self) -> None:
+        """Cuotas simuladas: Bedrock rechaza (no encola) por encima del limite"""
+        p = self.profile
+        if p.max_concurrency and self._in_flight >= p.max_concurrency:
+            self.throttled += 1
+            raise _throttled("Too many concurrent requests, please wait before trying again.")
+        if p.requests_per_minute:
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] >= 60.0:
+                self._recent.popleft()
+            if len(self._recent) >= p.requests_per_minute:
+                self.throttled += 1
+                raise _throttled("Too many requests, please wait before trying again.")
+            self._recent.append(now)
+        self._in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self._in_flight)
+
+    async def _fail(self, plan: _Plan) -> None:
+        if plan.failure == "ThrottlingException":
+            self.throttled += 1
+            await asyncio.sleep(plan.ttft / 4)
+            raise _throttled("Too many requests, please wait before trying again.")
+        if plan.failure == "timeout":
+            self.timeouts += 1
+            record_error("ReadTimeoutError")
+            await asyncio.sleep(self.profile.timeout_seconds)
+            from botocore.exceptions import ReadTimeoutError
+            raise ReadTimeoutError(endpoint_url="https://bedrock-runtime.simulated/model/invoke")
+
+    def _answer(self, base: str, plan: _Plan) -> str:
+        """Respuesta de ``plan.output_tokens`` palabras a partir de las frases fijas"""
+        words = base.split(" ")
+        while len(words) < plan.output_tokens:
+            words.extend(plan.rng.choice(self.financial_responses).split(" "))
+        return " ".join(words[:plan.output_tokens])
+
+    def _generate_response_text(self, request: LLMRequest, plan: _Plan) -> str:
+        """Select a canned answer for a generation request"""
+        response_text = self._answer(plan.rng.choice(self.financial_responses), plan)
+        response_text += f"\n\n[Processing prompt: '{request.prompt[:50]}...']"
+        return response_text
+
+    def _chat_response_text(self, request: ChatRequest, plan: _Plan) -> str:
+        """Select a contextual answer from the last user message"""
+        last_user_message = ""
+        for message in reversed(request.messages):
+            if message.role == "user":
+                last_user_message = message.content
+                break
+
+        if "hello" in last_user_message.lower():
+            return "Hello! I'm your financial AI assistant. How can I help you today?"
+        if any(word in last_user_message.lower() for word in ['thanks', 'thank you']):
+            return "You're welcome! I'm here to help you with any financial queries."
+        return self._answer(plan.rng.choice(self.financial_responses), plan)
+
+    async def _simulate(self, plan: _Plan, output_tokens: int) -> None:
+        """Espera lo que tardaria la respuesta completa (sin streaming)"""
+        await self._fail(plan)
+        await asyncio.sleep(plan.ttft + sum(self._token_delay(plan) for _ in range(output_tokens - 1)))
+
     async def generate_text(self, request: LLMRequest) -> LLMResponse:
         """Simulate text generation"""
-        # Simulate processing latency
-        await asyncio.sleep(random.uniform(0.5, 2.0))
-        
-        # Select response
-        response_text = random.choice(self.financial_responses)
-        response_text += f"\n\n[Processing prompt: '{request.prompt[:50]}...']"
-        
-        return LLMResponse(
+        self._acquire()
+        try:
+            plan = self._plan(request.max_tokens)
+            response_text = self._generate_response_text(request, plan)
+            output_tokens = len(response_text.split())
+            await self._simulate(plan, output_tokens)
+            self.completed += 1
+        finally:
+            self._in_flight -= 1
+
+        input_tokens = count_tokens(request.prompt)
+        response = LLMResponse(
             text=response_text,
             model_id=request.model_id or settings.default_model_id,
             usage={
-                "input_tokens": len(request.prompt.split()),
-                "output_tokens": len(response_text.split()),
-                "total_tokens": len(request.prompt.split()) + len(response_text.split())
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens
             }
         )
-        
-        
-        
-        
-        
-        
-        
-        
-        
-        
-    
+        record_usage(response.model_id, response.usage)
+        return response
+
     async def chat(self, request: ChatRequest) -> ChatResponse:
         """Simulate conversation"""
-        await asyncio.sleep(random.uniform(0.5, 2.0))
-        
-        # Get last user message
-        last_user_message = ""
-        for message in reversed(request.messages):
-            if message.role == "user":
-                last_user_message = message.content
-                break
-        
-        # Generate contextual response
-        if "hello" in last_user_message.lower():
-            response_text = "Hello! I'm your financial AI assistant. How can I help you today?"
-        elif any(word in last_user_message.lower() for word in ['thanks', 'thank you']):
-            response_text = "You're welcome! I'm here to help you with any financial queries."
-        else:
-            response_text = random.choice(self.financial_responses)
-        
+        self._acquire()
+        try:
+            plan = self._plan(request.max_tokens)
+            response_text = self._chat_response_text(request, plan)
+            await self._simulate(plan, len(response_text.split()))
+            self.completed += 1
+        finally:
+            self._in_flight -= 1
+
         assistant_message = ChatMessage(
             role="assistant",
             content=response_text
         )
-        
-        return ChatResponse(
+
+        response = ChatResponse(
             message=assistant_message,
             model_id=request.model_id or settings.default_model_id,
             usage={
-                "input_tokens": sum(len(msg.content.split()) for msg in request.messages),
+                "input_tokens": sum(count_tokens(msg.content) for msg in request.messages),
                 "output_tokens": len(response_text.split()),
                 "conversation_turns": len(request.messages)
             }
         )
+        record_usage(response.model_id, response.usage)
+        return response
+
+
+    async def generate_text_stream(self, request: LLMRequest) -> AsyncIterator[Dict[str, Any]]:
+        """Simulate token streaming for text generation"""
+        self._acquire()
+        try:
+            plan = self._plan(request.max_tokens)
+            response_text = self._generate_response_text(request, plan)
+            input_tokens = count_tokens(request.prompt)
+            async for event in self._stream_words(response_text, request.model_id, input_tokens, plan):
+                yield event
+        finally:
+            self._in_flight -= 1
+
+    async def chat_stream(self, request: ChatRequest) -> AsyncIterator[Dict[str, Any]]:
+        """Simulate token streaming for conversation"""
+        self._acquire()
+        try:
+            plan = self._plan(request.max_tokens)
+            response_text = self._chat_response_text(request, plan)
+            input_tokens = sum(count_tokens(msg.content) for msg in request.messages)
+            async for event in self._stream_words(response_text, request.model_id, input_tokens, plan):
+                if event["event"] == "usage":
+                    event["data"]["usage"]["conversation_turns"] = len(request.messages)
+                yield event
+        finally:
+            self._in_flight -= 1
+
+    async def _stream_words(self, response_text: str, model_id: str, input_tokens: int,
+                            plan: _Plan) -> AsyncIterator[Dict[str, Any]]:
+        """Emit the answer word by word (one word = one token) after the simulated TTFT"""
+        started = time.perf_counter()
+        await self._fail(plan)
+        await asyncio.sleep(plan.ttft)
+        first_token_ms = None
+        words = response_text.split(" ")
+        for index, word in enumerate(words):
+            if index:
+                await asyncio.sleep(self._token_delay(plan))
+                word = " " + word
+            if first_token_ms is None:
+                first_token_ms = round((time.perf_counter() - started) * 1000, 1)
+            yield {"event": "delta", "data": {"text": word}}
+        self.completed += 1
+
+        output_tokens = len(response_text.split())
+        record_usage(model_id or settings.default_model_id,
+                     {"input_tokens": input_tokens, "output_tokens": output_tokens})
+        yield {
+            "event": "usage",
+            "data": {
+                "model_id": model_id or settings.default_model_id,
+                "usage": {
+                    "input_tokens": input_tokens,
+                    "output_tokens": output_tokens,
+                    "total_tokens": input_tokens + output_tokens,
+                    "time_to_first_token_ms": first_token_ms,
+                    "stop_reason": "end_turn"
+                }
+            }
+        }
 
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "seed": self.seed,
+            "calls": self._calls,
+            "completed": self.completed,
+            "in_flight": self._in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "throttled": self.throttled,
+            "timeouts": self.timeouts
+        }
 
 # Global instance of the dummy service
-dummy_llm_service = DummyLLMService()
\ No newline at end of file
+dummy_llm_service = DummyLLMService(SimulationProfile.from_settings(), seed=settings.dummy_seed)
@@ -0,0 +1,227 @@
+"""
+Servicio de embeddings con micro-batching: agrupa llamadas concurrentes
+"""
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import numpy as np
+
+from ..core.metrics import embedding_backend_latency, embedding_batch_size, embedding_wait
+from .embeddings import HashingEmbedder
+
+
+def _snapshot(series: Any, scale: float = 1.0) -> Dict[str, Any]:
+    """Resumen de una serie de histograma de ``/metrics`` para ``/stats`` (en la unidad de ``scale``)"""
+    bounds = [bound * scale for bound in series.upper_bounds]
+    labels = [f"<={bound:g}" for bound in bounds] + [f">{bounds[-1]:g}"]
+    count = sum(series.counts)
+    return {
+        "buckets": dict(zip(labels, series.counts)),
+        "avg": round(series.sum * scale / count, 3) if count else 0.0,
+        "count": count
+    }
+
+
+class LocalEmbeddingBackend:
+    """Backend local determinista (hashing); sustituto de Titan en dev y tests"""
+
+    def __init__(self, embedder: HashingEmbedder):
+        self.embedder = embedder
+        self.dim = embedder.dim
+        self.name = f"hashing-{embedder.dim}"
+
+    async def embed_batch(self, texts: List[str]) -> np.ndarray:
+        return self.embedder.embed_batch(texts)
+
+
+# Modelos que no aceptan otra dimension de salida
+_FIXED_DIMENSIONS = {
+    "cohere.embed-english-v3": 1024,
+    "cohere.embed-multilingual-v3": 1024,
+}
+
+
+class BedrockEmbeddingBackend:
+    """
+    Embeddings de Bedrock reutilizando el cliente, el executor y la politica
+    de reintentos de ``BedrockService``.
+
+    Cohere Embed acepta una lista de textos por llamada; Titan solo uno, asi
+    que el lote se envia como llamadas concurrentes en la misma ventana.
+    La dimension se pide al modelo (Titan v2, Cohere v4); los modelos de
+    dimension fija (Cohere v3) solo se aceptan con esa dimension.
+
+    ``get_bedrock`` devuelve el servicio y solo se llama en el primer lote:
+    crear el backend no importa boto3.
+    """
+
+    def __init__(self, get_bedrock: Callable[[], Any], model_id: str, dim: int):
+        fixed = _FIXED_DIMENSIONS.get(model_id.split(":")[0])
+        if fixed is not None and fixed != dim:
+            raise ValueError(f"{model_id} returns {fixed}-dim vectors, but embedding_dim is {dim}")
+        self._get_bedrock = get_bedrock
+        self._bedrock: Optional[Any] = None
+        self.model_id = model_id
+        self.dim = dim
+        self.name = model_id
+
+    @property
+    def bedrock(self) -> Any:
+        if self._bedrock is None:
+            self._bedrock = self._get_bedrock()
+        return self._bedrock
+
+    async def _invoke(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        payload = json.dumps(body)
+        response = await self.bedrock.retry_policy.call(
+            lambda: self.bedrock.executor.run(
+                self.bedrock.client.invoke_model,
+                modelId=self.model_id,
+                contentType='application/json',
+                accept='application/json',
+                body=payload
+            )
+        )
+        return self.bedrock._process_response(response)
+
+    async def embed_batch(self, texts: List[str]) -> np.ndarray:
+        if self.model_id.startswith("cohere."):
+            body: Dict[str, Any] = {"texts": texts, "input_type": "search_query"}
+            if self.model_id.split(":")[0] not in _FIXED_DIMENSIONS:
+                body["output_dimension"] = self.dim
+            result = await self._invoke(body)
+            vectors = result["embeddings"]
+        else:
+            results = await asyncio.gather(*(
+                self._invoke({"inputText": text, "dimensions": self.dim, "normalize": True}) for text in texts
+            ))
+            vectors = [result["embedding"] for result in results]
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim != 2 or matrix.shape[1] != self.dim:
+            raise Exception(f"{self.model_id} returned vectors of shape {matrix.shape}, expected dim {self.dim}")
+        return matrix
+
+
+class _Pending:
+    __slots__ = ("future", "enqueued")
+
+    def __init__(self, future: asyncio.Future, enqueued: float):
+        self.future = future
+        self.enqueued = enqueued
+
+
+class EmbeddingService:
+    """
+    Agrupa las llamadas ``embed`` concurrentes en lotes.
+
+    Un lote se envia cuando alcanza ``max_batch_size`` textos o cuando el
+    primero lleva ``max_wait_ms`` esperando; cada llamador recibe su vector.
+    Los textos repetidos salen de un LRU y, dentro de un mismo lote, se
+    envian una sola vez. Tamaños de lote, esperas y latencia del backend van
+    a ``/metrics`` con la etiqueta ``service=name``.
+    """
+
+    def __init__(self, backend: Any, max_batch_size: int = 32, max_wait_ms: float = 5.0,
+                 cache_size: int = 4096, name: str = "embeddings"):
+        self.backend = backend
+        self.dim = backend.dim
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._pending: "OrderedDict[str, _Pending]" = OrderedDict()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.requests = 0
+        self.cache_hits = 0
+        self.batches = 0
+        self.errors = 0
+        # Series de /metrics etiquetadas con ``name``; /stats las resume
+        self.batch_sizes = embedding_batch_size.labels(name)
+        self.wait = embedding_wait.labels(name)
+        self.backend_latency = embedding_backend_latency.labels(name)
+
+    async def embed(self, text: str) -> np.ndarray:
+        """Vector de ``text`` (compartiendo lote con otras llamadas concurrentes)"""
+        self.requests += 1
+        cached = self._cache.get(text)
+        if cached is not None:
+            self._cache.move_to_end(text)
+            self.cache_hits += 1
+            return cached
+
+        pending = self._pending.get(text)
+        if pending is None:
+            loop = asyncio.get_running_loop()
+            pending = self._pending[text] = _Pending(loop.create_future(), time.perf_counter())
+            if len(self._pending) >= self.max_batch_size:
+                self._flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.max_wait, self._flush)
+        return await asyncio.shield(pending.future)
+
+    async def embed_many(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.stack(await asyncio.gather(*(self.embed(text) for text in texts)))
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, OrderedDict()
+        now = time.perf_counter()
+        for pending in batch.values():
+            self.wait.observe(now - pending.enqueued)
+        self.batches += 1
+        self.batch_sizes.observe(len(batch))
+        # Referencia fuerte: una tarea sin referencias puede recogerla el GC a medias
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: "OrderedDict[str, _Pending]") -> None:
+        texts = list(batch)
+        started = time.perf_counter()
+        try:
+            vectors = await self.backend.embed_batch(texts)
+        except Exception as e:
+            self.errors += 1
+            for pending in batch.values():
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+            return
+        finally:
+            self.backend_latency.observe(time.perf_counter() - started)
+
+        for text, vector in zip(texts, vectors):
+            self._remember(text, vector)
+            future = batch[text].future
+            if not future.done():
+                future.set_result(vector)
+
+    def _remember(self, text: str, vector: np.ndarray) -> None:
+        self._cache[text] = vector
+        self._cache.move_to_end(text)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend.name,
+            "requests": self.requests,
+            "cache_hits": self.cache_hits,
+            "cache_size": len(self._cache),
+            "batches": self.batches,
+            "errors": self.errors,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batch_size": _snapshot(self.batch_sizes),
+            "wait_ms": _snapshot(self.wait, 1000),
+            "backend_ms": _snapshot(self.backend_latency, 1000)
+        }
@@ -0,0 +1,82 @@
+"""
+Embeddings locales deterministas (sin red) para cache semantico y pruebas
+"""
+import re
+import zlib
+from typing import Iterable, List
+
+import numpy as np
+
+
+# Formas equivalentes frecuentes en preguntas financieras
+FINANCIAL_SYNONYMS = {
+    "p/e": "price earnings ratio",
+    "pe": "price earnings ratio",
+    "price-to-earnings": "price earnings",
+    "eps": "earnings per share",
+    "mkt": "market",
+    "cap": "capitalization",
+    "div": "dividend",
+    "yoy": "year over year",
+    "qoq": "quarter over quarter",
+    "rev": "revenue",
+}
+
+STOPWORDS = frozenset(
+    "a an and are as at be by can could do does doing for from how i in is it its me my of on or "
+    "please s tell the to us was what what's whats which will with would you your".split()
+)
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[/.\-][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """Tokens en minusculas, con sinonimos financieros expandidos y sin stopwords"""
+    tokens: List[str] = []
+    for token in _TOKEN_PATTERN.findall(text.casefold()):
+        expanded = FINANCIAL_SYNONYMS.get(token, token)
+        for word in expanded.split():
+            if word not in STOPWORDS:
+                tokens.append(word)
+    return tokens
+
+
+class HashingEmbedder:
+    """
+    Embedding por hashing de rasgos (palabras, bigramas y trigramas de caracteres).
+
+    Es determinista entre procesos (usa crc32, no ``hash()``), no necesita
+    modelo ni red y produce vectores float32 normalizados L2, asi que el
+    producto escalar es directamente la similitud coseno.
+    """
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def _features(self, text: str) -> Iterable[str]:
+        tokens = tokenize(text)
+        for token in tokens:
+            yield "w:" + token
+            padded = f"#{token}#"
+            for i in range(len(padded) - 2):
+                yield "c:" + padded[i:i + 3]
+        for first, second in zip(tokens, tokens[1:]):
+            yield f"b:{first} {second}"
+
+    def embed(self, text: str) -> np.ndarray:
+        """Vector normalizado de ``dim`` dimensiones"""
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self._features(text):
+            digest = zlib.crc32(feature.encode("utf-8"))
+            # El bit alto decide el signo para que las colisiones se compensen
+            vector[digest % self.dim] += 1.0 if digest & 0x80000000 else -1.0
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector
+
+    def embed_batch(self, texts: List[str]) -> np.ndarray:
+        """Matriz (len(texts), dim) de embeddings"""
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.stack([self.embed(text) for text in texts])
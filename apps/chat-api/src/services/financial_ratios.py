@@ -0,0 +1,292 @@
+"""
+Ratios financieros precalculados (margenes, liquidez, apalancamiento, crecimiento)
+"""
+import csv
+import logging
+import math
+import re
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+# Partidas de los estados financieros (columnas del CSV)
+LINE_ITEMS: Tuple[str, ...] = (
+    "revenue", "cost_of_revenue", "gross_profit", "operating_income", "net_income", "interest_expense",
+    "total_assets", "total_liabilities", "total_equity", "current_assets", "current_liabilities",
+    "cash", "inventory", "total_debt", "operating_cash_flow", "capital_expenditure"
+)
+
+RATIOS: Tuple[str, ...] = (
+    "gross_margin", "operating_margin", "net_margin",
+    "current_ratio", "quick_ratio", "cash_ratio",
+    "debt_to_equity", "liabilities_to_assets", "interest_coverage",
+    "roe", "roa", "free_cash_flow", "fcf_margin",
+    "revenue_growth", "net_income_growth", "operating_margin_change", "net_margin_change"
+)
+
+# Como se muestra cada ratio en el contexto
+_PERCENT = {"gross_margin", "operating_margin", "net_margin", "roe", "roa", "fcf_margin",
+            "revenue_growth", "net_income_growth", "liabilities_to_assets"}
+_POINTS = {"operating_margin_change", "net_margin_change"}
+_LABELS = {
+    "gross_margin": "gross margin", "operating_margin": "operating margin", "net_margin": "net margin",
+    "current_ratio": "current ratio", "quick_ratio": "quick ratio", "cash_ratio": "cash ratio",
+    "debt_to_equity": "D/E", "liabilities_to_assets": "liabilities/assets", "interest_coverage": "interest coverage",
+    "roe": "ROE", "roa": "ROA", "free_cash_flow": "FCF", "fcf_margin": "FCF margin",
+    "revenue_growth": "revenue growth", "net_income_growth": "net income growth",
+    "operating_margin_change": "operating margin chg", "net_margin_change": "net margin chg"
+}
+
+
+# ``2024``, ``FY2024``, ``2024Q1``, ``2024-Q1``
+_PERIOD = re.compile(r"^(?:FY)?(\d{4})(?:[-\s]?Q([1-4]))?$", re.IGNORECASE)
+
+
+def _period_key(period: str) -> Tuple[int, int, int, str]:
+    """Orden por (año, trimestre); el anual va tras su Q4 y lo no reconocido al principio"""
+    match = _PERIOD.match(period)
+    if match is None:
+        return (0, 0, 0, period)
+    return (1, int(match.group(1)), int(match.group(2) or 5), period)
+
+
+def _period_kind(period: str) -> Optional[str]:
+    match = _PERIOD.match(period)
+    if match is None:
+        return None
+    return "quarter" if match.group(2) else "annual"
+
+
+class StatementStore:
+    """
+    Estados financieros en un array ``(empresa, periodo, partida)`` de float64;
+    NaN = dato no disponible. Los periodos se ordenan por año y trimestre
+    (``2023`` < ``2024Q1`` < ``2024Q4`` < ``2024``); el crecimiento compara
+    cada periodo con el anterior de su mismo tipo (anual o trimestral).
+    """
+
+    def __init__(self, companies: Sequence[str], periods: Sequence[str], data: np.ndarray):
+        self.companies = list(companies)
+        self.periods = list(periods)
+        self.data = data
+        self._rows = {company: row for row, company in enumerate(self.companies)}
+        self._columns = {period: column for column, period in enumerate(self.periods)}
+
+    def column(self, period: str) -> Optional[int]:
+        return self._columns.get(period)
+
+    def previous_columns(self) -> np.ndarray:
+        """Columna del periodo anterior del mismo tipo (-1 si no hay o no se reconoce)"""
+        previous = np.full(len(self.periods), -1, dtype=np.int64)
+        last: Dict[str, int] = {}
+        for column, period in sorted(enumerate(self.periods), key=lambda cp: _period_key(cp[1])):
+            kind = _period_kind(period)
+            if kind is None:
+                continue
+            previous[column] = last.get(kind, -1)
+            last[kind] = column
+        return previous
+
+    def __len__(self) -> int:
+        return len(self.companies)
+
+    def __contains__(self, company: str) -> bool:
+        return company in self._rows
+
+    def row(self, company: str) -> Optional[int]:
+        return self._rows.get(company)
+
+    def item(self, name: str) -> np.ndarray:
+        """Matriz ``(empresa, periodo)`` de una partida"""
+        return self.data[:, :, LINE_ITEMS.index(name)]
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]]) -> "StatementStore":
+        """Filas ``{symbol, period, <partida>: valor}``, una por empresa y periodo"""
+        rows = list(rows)
+        companies = sorted({str(row["symbol"]).strip().upper() for row in rows})
+        periods = sorted({str(row["period"]).strip() for row in rows}, key=_period_key)
+        company_index = {c: i for i, c in enumerate(companies)}
+        period_index = {p: i for i, p in enumerate(periods)}
+        data = np.full((len(companies), len(periods), len(LINE_ITEMS)), np.nan)
+        for row in rows:
+            c = company_index[str(row["symbol"]).strip().upper()]
+            p = period_index[str(row["period"]).strip()]
+            data[c, p] = [_to_float(row.get(name)) for name in LINE_ITEMS]
+        return cls(companies, periods, data)
+
+    @classmethod
+    def from_csv(cls, path: str) -> "StatementStore":
+        with open(path, newline="") as f:
+            return cls.from_rows(csv.DictReader(f))
+
+
+def _to_float(value: Any) -> float:
+    if value is None or value == "":
+        return math.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    # Division por cero o sin dato -> NaN (nunca inf)
+    out = np.full(np.broadcast(numerator, denominator).shape, np.nan)
+    np.divide(numerator, denominator, out=out, where=(denominator != 0) & ~np.isnan(denominator))
+    return out
+
+
+def _change(values: np.ndarray, previous: np.ndarray, relative: bool) -> np.ndarray:
+    """Variacion respecto a la columna ``previous`` de cada periodo (NaN si es -1)"""
+    out = np.full(values.shape, np.nan)
+    has_previous = previous >= 0
+    before, current = values[:, previous[has_previous]], values[:, has_previous]
+    if relative:
+        out[:, has_previous] = _ratio(current - before, np.abs(before))
+    else:
+        out[:, has_previous] = current - before
+    return out
+
+
+def compute_ratios(store: StatementStore) -> np.ndarray:
+    """Todos los ratios de todas las empresas y periodos: ``(empresa, periodo, ratio)``"""
+    item = store.item
+    previous = store.previous_columns()
+    revenue = item("revenue")
+    gross_profit = np.where(np.isnan(item("gross_profit")), revenue - item("cost_of_revenue"), item("gross_profit"))
+    inventory = np.nan_to_num(item("inventory"))
+    free_cash_flow = item("operating_cash_flow") - np.abs(item("capital_expenditure"))
+    operating_margin = _ratio(item("operating_income"), revenue)
+    net_margin = _ratio(item("net_income"), revenue)
+
+    columns = {
+        "gross_margin": _ratio(gross_profit, revenue),
+        "operating_margin": operating_margin,
+        "net_margin": net_margin,
+        "current_ratio": _ratio(item("current_assets"), item("current_liabilities")),
+        "quick_ratio": _ratio(item("current_assets") - inventory, item("current_liabilities")),
+        "cash_ratio": _ratio(item("cash"), item("current_liabilities")),
+        "debt_to_equity": _ratio(item("total_debt"), item("total_equity")),
+        "liabilities_to_assets": _ratio(item("total_liabilities"), item("total_assets")),
+        "interest_coverage": _ratio(item("operating_income"), np.abs(item("interest_expense"))),
+        "roe": _ratio(item("net_income"), item("total_equity")),
+        "roa": _ratio(item("net_income"), item("total_assets")),
+        "free_cash_flow": free_cash_flow,
+        "fcf_margin": _ratio(free_cash_flow, revenue),
+        "revenue_growth": _change(revenue, previous, relative=True),
+        "net_income_growth": _change(item("net_income"), previous, relative=True),
+        "operating_margin_change": _change(operating_margin, previous, relative=False),
+        "net_margin_change": _change(net_margin, previous, relative=False)
+    }
+    return np.stack([columns[name] for name in RATIOS], axis=2)
+
+
+def _format_money(value: float) -> str:
+    magnitude = abs(value)
+    for unit, size in (("T", 1e12), ("B", 1e9), ("M", 1e6)):
+        if magnitude >= size:
+            return f"${value / size:,.1f}{unit}"
+    return f"${value:,.0f}"
+
+
+def format_value(name: str, value: float) -> str:
+    if name in _PERCENT:
+        return f"{value * 100:.1f}%"
+    if name in _POINTS:
+        return f"{value * 100:+.1f}pp"
+    if name == "free_cash_flow":
+        return _format_money(value)
+    return f"{value:.2f}"
+
+
+class FinancialAnalysis:
+    """
+    Tabla de ratios precalculada sobre un ``StatementStore``. Se recalcula
+    entera (una pasada vectorizada) cada vez que se cargan estados nuevos.
+    """
+
+    def __init__(self, store: StatementStore):
+        self.store = store
+        self.values = np.empty((0, 0, len(RATIOS)))
+        self.latest = np.empty(0, dtype=np.int64)
+        self.compute_ms: Optional[float] = None
+        self.recompute()
+
+    def recompute(self) -> None:
+        started = time.perf_counter()
+        self.values = compute_ratios(self.store)
+        # Ultimo periodo con algun dato de cada empresa
+        has_data = ~np.all(np.isnan(self.store.data), axis=2)
+        periods = has_data.shape[1]
+        if periods:
+            self.latest = periods - 1 - np.argmax(has_data[:, ::-1], axis=1)
+        self.compute_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    def ratios(self, company: str, period: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Ratios de ``company`` en ``period`` (por defecto el mas reciente)"""
+        row = self.store.row(company)
+        if row is None:
+            return None
+        column = self.store.column(period) if period is not None else int(self.latest[row])
+        if column is None:
+            return None
+        values = self.values[row, column].tolist()
+        result: Dict[str, Any] = {"symbol": company, "period": self.store.periods[column]}
+        result.update({name: (None if math.isnan(v) else v) for name, v in zip(RATIOS, values)})
+        result["revenue"] = _none_if_nan(self.store.data[row, column, LINE_ITEMS.index("revenue")])
+        result["net_income"] = _none_if_nan(self.store.data[row, column, LINE_ITEMS.index("net_income")])
+        return result
+
+    def summaries_for(self, companies: Iterable[str]) -> List[str]:
+        return [format_ratios(r) for r in (self.ratios(c) for c in sorted(set(companies))) if r is not None]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "companies": len(self.store),
+            "periods": len(self.store.periods),
+            "ratios": len(RATIOS),
+            "compute_ms": self.compute_ms
+        }
+
+
+def _none_if_nan(value: float) -> Optional[float]:
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+def format_ratios(ratios: Dict[str, Any]) -> str:
+    """Linea compacta con las cifras disponibles, p.ej. ``AAPL FY2024: revenue $391.0B, net margin 24.0%``"""
+    parts = []
+    if ratios.get("revenue") is not None:
+        parts.append(f"revenue {_format_money(ratios['revenue'])}")
+    if ratios.get("net_income") is not None:
+        parts.append(f"net income {_format_money(ratios['net_income'])}")
+    for name in RATIOS:
+        if ratios.get(name) is not None:
+            parts.append(f"{_LABELS[name]} {format_value(name, ratios[name])}")
+    return f"{ratios['symbol']} {ratios['period']}: " + ", ".join(parts)
+
+
+def _build_financial_analysis() -> Optional[FinancialAnalysis]:
+    """Carga los estados configurados (o None si no hay)"""
+    if not settings.financials_csv_path:
+        return None
+    try:
+        analysis = FinancialAnalysis(StatementStore.from_csv(settings.financials_csv_path))
+        logger.info(f"Financial statements loaded: {analysis.stats()}")
+        return analysis
+    except Exception as e:
+        logger.error(f"Error loading financial statements: {e}")
+        return None
+
+
+# Instancia global
+financial_analysis = _build_financial_analysis()
@@ -0,0 +1,226 @@
+"""
+Compactacion del historial de chat dentro de un presupuesto de tokens
+"""
+import hashlib
+import re
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from ..models.llm import ChatMessage, ChatRequest, ChatResponse
+from .layers import ServiceLayer
+
+
+# Tokens extra por mensaje (rol, separadores)
+MESSAGE_OVERHEAD_TOKENS = 4
+SUMMARY_HEADER = "Summary of the earlier conversation:"
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimacion barata de tokens (~4 caracteres por token)"""
+    return (len(text) + 3) // 4
+
+
+def message_tokens(message: ChatMessage) -> int:
+    return estimate_tokens(message.content) + MESSAGE_OVERHEAD_TOKENS
+
+
+def _prefix_digests(messages: List[ChatMessage]) -> List[str]:
+    """``digests[i]`` identifica ``messages[:i]`` (una sola pasada)"""
+    h = hashlib.sha1()
+    digests = [h.hexdigest()]
+    for message in messages:
+        h.update(message.role.encode("utf-8"))
+        h.update(b"\x00")
+        h.update(message.content.encode("utf-8"))
+        h.update(b"\x01")
+        digests.append(h.hexdigest())
+    return digests
+
+
+def summarize_message(message: ChatMessage, max_chars: int = 200) -> str:
+    """Resumen extractivo de un mensaje: su primera frase, recortada"""
+    text = " ".join(message.content.split())
+    sentence = _SENTENCE_END.split(text, maxsplit=1)[0]
+    if len(sentence) > max_chars:
+        sentence = sentence[:max_chars].rstrip() + "..."
+    return f"- {message.role}: {sentence}"
+
+
+class _Summary:
+    """Resumen cacheado de los primeros ``covered`` mensajes de una conversacion"""
+
+    __slots__ = ("covered", "digest", "lines")
+
+    def __init__(self, covered: int, digest: str, lines: List[str]):
+        self.covered = covered
+        self.digest = digest
+        self.lines = lines
+
+
+class HistoryManager:
+    """
+    Empaqueta el historial de un ChatRequest en ``token_budget`` tokens.
+
+    Los ultimos mensajes se mantienen literales; los anteriores se sustituyen
+    por un resumen extractivo que se envia como mensaje ``system``. El resumen
+    se cachea por conversacion, asi en cada turno solo se resumen los mensajes
+    que acaban de salir de la ventana y no todo el historial. La conversacion
+    se identifica por ``session_id`` o, sin sesion, por el digest del prefijo
+    ya resumido (dos conversaciones que empiezan igual no comparten entrada).
+    """
+
+    def __init__(self, token_budget: int = 3000, keep_recent_messages: int = 4,
+                 summary_max_tokens: int = 400, max_conversations: int = 4096):
+        self.token_budget = token_budget
+        self.keep_recent_messages = keep_recent_messages
+        self.summary_max_tokens = summary_max_tokens
+        self.max_conversations = max_conversations
+        self._summaries: "OrderedDict[str, _Summary]" = OrderedDict()
+        self.compacted = 0
+        self.passthrough = 0
+        self.summary_hits = 0
+        self.summary_extended = 0
+        self.summary_misses = 0
+        self.tokens_saved = 0
+
+    def _cached_summary(self, digests: List[str], conversation_id: Optional[str]) -> Tuple[Optional[str], Optional[_Summary]]:
+        """Resumen reutilizable (y su clave): el de la sesion o el del prefijo resumido mas largo"""
+        last = len(digests) - 2  # el ultimo mensaje nunca esta resumido
+        if conversation_id is not None:
+            cached = self._summaries.get(conversation_id)
+            if cached is not None and cached.covered <= last and cached.digest == digests[cached.covered]:
+                return conversation_id, cached
+            return None, None
+        for covered in range(last, 0, -1):
+            cached = self._summaries.get(digests[covered])
+            if cached is not None and cached.covered == covered:
+                return digests[covered], cached
+        return None, None
+
+    def compact(self, request: ChatRequest, conversation_id: Optional[str] = None) -> Tuple[ChatRequest, Dict[str, Any]]:
+        """Devuelve la peticion compactada y las metricas para ``usage['history']``"""
+        messages = request.messages
+        tokens_before = sum(message_tokens(m) for m in messages)
+        if tokens_before <= self.token_budget:
+            self.passthrough += 1
+            return request, self._report(messages, messages, tokens_before, tokens_before, 0, None)
+
+        system = [m for m in messages if m.role == "system"]
+        dialog = [m for m in messages if m.role != "system"]
+        cutoff = self._cutoff(dialog, sum(message_tokens(m) for m in system))
+
+        digests = _prefix_digests(dialog)
+        cached_key, cached = self._cached_summary(digests, conversation_id)
+        if cached is not None:
+            # No retroceder: lo ya resumido no vuelve a enviarse literal
+            cutoff = self._align(dialog, max(cutoff, cached.covered))
+        if cutoff == 0:
+            self.passthrough += 1
+            return request, self._report(messages, messages, tokens_before, tokens_before, 0, None)
+
+        if cached is None:
+            self.summary_misses += 1
+            status = "miss"
+            lines = [summarize_message(m) for m in dialog[:cutoff]]
+        elif cached.covered == cutoff:
+            self.summary_hits += 1
+            status = "hit"
+            lines = cached.lines
+        else:
+            self.summary_extended += 1
+            status = "extended"
+            lines = cached.lines + [summarize_message(m) for m in dialog[cached.covered:cutoff]]
+        lines = self._trim(lines)
+        key = conversation_id or digests[cutoff]
+        if cached_key is not None and cached_key != key:
+            self._summaries.pop(cached_key, None)
+        self._remember(key, _Summary(cutoff, digests[cutoff], lines))
+
+        summary = ChatMessage(role="system", content="\n".join([SUMMARY_HEADER] + lines))
+        compacted = system + [summary] + dialog[cutoff:]
+        tokens_after = sum(message_tokens(m) for m in compacted)
+        self.compacted += 1
+        self.tokens_saved += max(0, tokens_before - tokens_after)
+        return (
+            request.model_copy(update={"messages": compacted}),
+            self._report(messages, compacted, tokens_before, tokens_after, cutoff, status)
+        )
+
+    def _cutoff(self, dialog: List[ChatMessage], system_tokens: int) -> int:
+        """Primer mensaje que se envia literal: los recientes siempre, mas los que quepan"""
+        available = self.token_budget - system_tokens - self.summary_max_tokens
+        cutoff = max(0, len(dialog) - max(1, self.keep_recent_messages))
+        used = sum(message_tokens(m) for m in dialog[cutoff:])
+        while cutoff > 0 and used + message_tokens(dialog[cutoff - 1]) <= available:
+            cutoff -= 1
+            used += message_tokens(dialog[cutoff])
+        return self._align(dialog, cutoff)
+
+    def _align(self, dialog: List[ChatMessage], cutoff: int) -> int:
+        """Claude exige que la parte literal empiece por un mensaje ``user``"""
+        cutoff = min(cutoff, len(dialog) - 1)
+        while 0 < cutoff < len(dialog) - 1 and dialog[cutoff].role != "user":
+            cutoff += 1
+        return cutoff
+
+    def _trim(self, lines: List[str]) -> List[str]:
+        """Limita el resumen a ``summary_max_tokens`` descartando lo mas antiguo"""
+        total = sum(estimate_tokens(line) + 1 for line in lines)
+        start = 0
+        while total > self.summary_max_tokens and start < len(lines) - 1:
+            total -= estimate_tokens(lines[start]) + 1
+            start += 1
+        return lines[start:]
+
+    def _remember(self, key: str, summary: _Summary) -> None:
+        self._summaries[key] = summary
+        self._summaries.move_to_end(key)
+        while len(self._summaries) > self.max_conversations:
+            self._summaries.popitem(last=False)
+
+    def _report(self, original: List[ChatMessage], sent: List[ChatMessage], tokens_before: int,
+                tokens_after: int, summarized: int, status: Optional[str]) -> Dict[str, Any]:
+        return {
+            "messages_in": len(original),
+            "messages_sent": len(sent),
+            "summarized_messages": summarized,
+            "estimated_tokens_before": tokens_before,
+            "estimated_tokens_after": tokens_after,
+            "tokens_saved": max(0, tokens_before - tokens_after),
+            "summary_cache": status
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "token_budget": self.token_budget,
+            "compacted": self.compacted,
+            "passthrough": self.passthrough,
+            "summary_hits": self.summary_hits,
+            "summary_extended": self.summary_extended,
+            "summary_misses": self.summary_misses,
+            "tokens_saved": self.tokens_saved,
+            "conversations": len(self._summaries)
+        }
+
+
+class HistoryCompactionLayer(ServiceLayer):
+    """Compacta el historial de /chat antes de enviarlo al modelo"""
+
+    def __init__(self, inner: Any, manager: HistoryManager):
+        super().__init__(inner)
+        self.manager = manager
+
+    async def chat(self, request: ChatRequest) -> ChatResponse:
+        compacted, report = self.manager.compact(request, request.session_id)
+        response = await self.inner.chat(compacted)
+        response.usage["history"] = report
+        return response
+
+    async def chat_stream(self, request: ChatRequest) -> AsyncIterator[Dict[str, Any]]:
+        compacted, report = self.manager.compact(request, request.session_id)
+        async for event in self.inner.chat_stream(compacted):
+            if event["event"] == "usage":
+                event["data"]["usage"]["history"] = report
+            yield event
@@ -0,0 +1,28 @@
+"""
+Capas que envuelven un servicio LLM (cache, coalescing, routing, ...)
+"""
+from typing import Any, Dict
+
+
+class ServiceLayer:
+    """
+    Envuelve un servicio LLM y delega todo lo que no sobrescribe.
+
+    Las subclases redefinen solo los metodos que les interesan
+    (``generate_text``, ``chat``, ``generate_text_stream``, ``chat_stream``);
+    el resto se reenvia al servicio interno.
+    """
+
+    def __init__(self, inner: Any):
+        self.inner = inner
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.inner, name)
+
+
+def is_degraded(usage: Dict[str, Any]) -> bool:
+    """
+    Respuesta de respaldo del circuit breaker: no se guarda en caches ni en
+    sesiones (seguiria sirviendose cuando el modelo ya se ha recuperado).
+    """
+    return "degraded" in usage
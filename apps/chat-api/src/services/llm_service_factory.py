@@ -1,9 +1,173 @@
 """
 Factory para seleccionar el servicio LLM apropiado
 """
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
 from ..core.config import settings
-from .dummy_llm_service import dummy_llm_service
-from .bedrock_service import bedrock_service
+from ..core.metrics import registry
+from .dummy_llm_service import DummyLLMService, SimulationProfile, dummy_llm_service
+from .admission import admission_controller
+from .batch_runner import batch_runner
+from .circuit_breaker import CircuitBreakerLayer, CircuitBreakers
+from .context_builder import context_builder
+from .embedding_service import BedrockEmbeddingBackend, EmbeddingService, LocalEmbeddingBackend
+from .embeddings import HashingEmbedder
+from .financial_ratios import financial_analysis
+from .history_manager import HistoryCompactionLayer, HistoryManager
+from .model_router import ModelRouter, ModelRouterLayer
+from .quote_snapshot import quote_store
+from .response_cache import MemoryCacheBackend, RedisCacheBackend, ResponseCache, ResponseCacheLayer
+from .semantic_cache import SemanticCache, SemanticCacheLayer
+from .shared_store import shared_store
+from .session_store import SessionLayer, SessionStore, SqlSessionBackend
+from .single_flight import SingleFlight, SingleFlightLayer
+from .ticker_extractor import ticker_extractor
+
+
+logger = logging.getLogger(__name__)
+
+# Servicio Bedrock, creado la primera vez que se usa
+_bedrock_service: Optional[Any] = None
+
+
+def get_bedrock_service():
+    """
+    Servicio Bedrock compartido, creado bajo demanda.
+    
+    boto3 y el cliente solo se cargan si se usa el modo bedrock (o los
+    embeddings de Bedrock): el modo dummy, los tests y las herramientas
+    arrancan sin pagar ese coste.
+    """
+    global _bedrock_service
+    if _bedrock_service is None:
+        from .bedrock_service import BedrockService
+        _bedrock_service = BedrockService()
+    return _bedrock_service
+
+
+def _build_response_cache() -> Optional[ResponseCache]:
+    """Crea el cache de respuestas segun la configuracion (o None si esta desactivado)"""
+    if not settings.cache_enabled:
+        return None
+    if settings.cache_backend == "redis":
+        backend = RedisCacheBackend(settings.redis_url)
+    else:
+        backend = MemoryCacheBackend(settings.cache_max_entries)
+    return ResponseCache(backend, settings.cache_ttl_seconds, settings.cache_max_temperature)
+
+
+def _build_embedding_service() -> EmbeddingService:
+    """Servicio de embeddings compartido (cache semantico) con el backend configurado"""
+    if settings.embedding_backend == "bedrock":
+        backend = BedrockEmbeddingBackend(get_bedrock_service, settings.embedding_model_id, settings.embedding_dim)
+    else:
+        backend = LocalEmbeddingBackend(HashingEmbedder(settings.embedding_dim))
+    return EmbeddingService(
+        backend,
+        max_batch_size=settings.embedding_max_batch_size,
+        max_wait_ms=settings.embedding_max_wait_ms,
+        cache_size=settings.embedding_cache_size,
+        name="semantic_cache"
+    )
+
+
+def _build_semantic_cache() -> Optional[SemanticCache]:
+    """Crea el cache semantico segun la configuracion (o None si esta desactivado)"""
+    if not settings.semantic_cache_enabled:
+        return None
+    return SemanticCache(
+        HashingEmbedder(settings.embedding_dim),
+        capacity=settings.semantic_cache_capacity,
+        threshold=settings.semantic_cache_threshold,
+        ttl_seconds=settings.semantic_cache_ttl_seconds,
+        ticker_ttl_seconds=settings.semantic_cache_ticker_ttl_seconds
+    )
+
+
+def _build_session_store() -> Optional[SessionStore]:
+    """Crea el almacen de sesiones segun la configuracion (o None si esta desactivado)"""
+    if not settings.session_store_enabled:
+        return None
+    cold = SqlSessionBackend(settings.session_database_url) if settings.session_database_url else None
+    return SessionStore(cold, settings.session_max_hot, settings.session_max_messages, settings.session_secret)
+
+
+# Caches compartidos por ambos modos (el model_id forma parte de la clave)
+embedding_service = _build_embedding_service()
+response_cache = _build_response_cache()
+semantic_cache = _build_semantic_cache()
+session_store = _build_session_store()
+single_flight = SingleFlight() if settings.single_flight_enabled else None
+model_router = ModelRouter(
+    fast_model_id=settings.router_fast_model_id,
+    strong_model_id=settings.router_strong_model_id,
+    long_prompt_chars=settings.router_long_prompt_chars,
+    deep_conversation_turns=settings.router_deep_conversation_turns,
+    max_error_rate=settings.router_max_error_rate,
+    strong_latency_budget=settings.router_strong_latency_budget,
+    probe_every=settings.router_probe_every
+) if settings.router_enabled else None
+history_manager = HistoryManager(
+    token_budget=settings.history_token_budget,
+    keep_recent_messages=settings.history_keep_recent_messages,
+    summary_max_tokens=settings.history_summary_max_tokens,
+    max_conversations=settings.history_max_conversations
+) if settings.history_compaction_enabled else None
+circuit_breakers = CircuitBreakers(
+    window=settings.circuit_window,
+    min_calls=settings.circuit_min_calls,
+    error_threshold=settings.circuit_error_threshold,
+    slow_call_seconds=settings.circuit_slow_call_seconds,
+    slow_call_threshold=settings.circuit_slow_call_threshold,
+    open_seconds=settings.circuit_open_seconds
+) if settings.circuit_breaker_enabled else None
+
+# Pipelines ya construidos por modo
+_pipelines: Dict[str, Any] = {}
+
+
+def _build_pipeline(mode: str):
+    """Envuelve el servicio base del modo con las capas configuradas"""
+    if mode == "bedrock":
+        service, default_model_id = get_bedrock_service(), settings.bedrock_model_id
+    else:
+        service, default_model_id = dummy_llm_service, settings.default_model_id
+    
+    # La compactacion va por debajo de caches y routing: las claves y la
+    # clasificacion usan la conversacion completa, al modelo llega la compacta
+    if history_manager is not None:
+        service = HistoryCompactionLayer(service, history_manager)
+    # El circuito va bajo el router: protege el modelo ya elegido y, si esta
+    # abierto, responde con otro modelo, el cache o (opt-in) el dummy sin latencia
+    if mode == "bedrock" and circuit_breakers is not None:
+        fallback_models = settings.circuit_fallback_models or [
+            settings.router_fast_model_id, settings.router_strong_model_id, settings.bedrock_model_id]
+        dummy = None
+        if settings.circuit_dummy_fallback:
+            dummy = DummyLLMService(SimulationProfile(ttft_median_ms=0.0, ttft_sigma=0.0, tokens_per_second=0.0))
+        service = CircuitBreakerLayer(
+            service, circuit_breakers, default_model_id,
+            fallback_models=list(dict.fromkeys(fallback_models)),
+            cache=response_cache,
+            default_temperature=settings.bedrock_temperature,
+            dummy=dummy
+        )
+    # El routing solo tiene sentido entre modelos reales de Bedrock
+    if mode == "bedrock" and model_router is not None:
+        service = ModelRouterLayer(service, model_router)
+    if single_flight is not None:
+        service = SingleFlightLayer(service, single_flight, default_model_id, settings.bedrock_temperature)
+    if semantic_cache is not None:
+        service = SemanticCacheLayer(
+            service, semantic_cache, default_model_id, embedding_service, settings.bedrock_temperature)
+    if response_cache is not None:
+        service = ResponseCacheLayer(service, response_cache, default_model_id, settings.bedrock_temperature)
+    # La sesion se reconstruye antes que nada: el resto ve la conversacion completa
+    if session_store is not None:
+        service = SessionLayer(service, session_store)
+    return service
 
 
 def get_llm_service():
@@ -13,11 +177,92 @@ def get_llm_service():
     Returns:
         Servicio LLM (dummy o bedrock)
     """
-    if settings.llm_mode == "bedrock":
-        return bedrock_service
-    else:
-        return dummy_llm_service
+    mode = "bedrock" if settings.llm_mode == "bedrock" else "dummy"
+    service = _pipelines.get(mode)
+    if service is None:
+        service = _pipelines[mode] = _build_pipeline(mode)
+    return service
+
+
+def get_service_stats() -> Dict[str, Any]:
+    """
+    Estadisticas de los componentes del servicio LLM
+    
+    Returns:
+        Diccionario con las metricas de cada componente
+    """
+    return {
+        "mode": settings.llm_mode,
+        "admission": admission_controller.stats(),
+        "batch": batch_runner.stats(),
+        "dummy": dummy_llm_service.stats() if settings.llm_mode != "bedrock" else None,
+        "embeddings": embedding_service.stats(),
+        "retrieval_embeddings": context_builder.embeddings.stats() if context_builder.embeddings else None,
+        "bedrock_executor": _bedrock_service.executor.stats() if _bedrock_service is not None else None,
+        "bedrock_retries": _bedrock_service.retry_policy.stats() if _bedrock_service is not None else None,
+        "circuit_breakers": circuit_breakers.stats() if circuit_breakers is not None else None,
+        "model_router": model_router.stats() if model_router is not None else None,
+        "financials": financial_analysis.stats() if financial_analysis is not None else None,
+        "history": history_manager.stats() if history_manager is not None else None,
+        "quotes": quote_store.stats() if quote_store is not None else None,
+        "response_cache": response_cache.stats() if response_cache is not None else None,
+        "semantic_cache": semantic_cache.stats() if semantic_cache is not None else None,
+        "sessions": session_store.stats() if session_store is not None else None,
+        "shared_store": shared_store.stats() if shared_store is not None else None,
+        "single_flight": single_flight.stats() if single_flight is not None else None,
+        "tickers": ticker_extractor.stats() if ticker_extractor is not None else None
+    }
+
+
+def _register_metrics() -> None:
+    """Gauges leidos en cada scrape de ``/metrics`` (colas, executor, circuitos y cotizaciones)"""
+    def admission() -> Dict[tuple, float]:
+        stats = admission_controller.stats()
+        return {("active",): stats["active"], ("queued",): stats["queued"]}
+
+    def executor() -> Dict[tuple, float]:
+        if _bedrock_service is None:
+            return {}
+        stats = _bedrock_service.executor.stats()
+        return {("running",): stats["running"], ("queued",): stats["queued"]}
 
+    registry.callback_gauge(
+        "chat_api_admission_requests", "Requests holding (active) or waiting for (queued) an admission slot",
+        admission, ("state",))
+    registry.callback_gauge(
+        "chat_api_bedrock_executor_tasks", "Bedrock thread pool tasks running or queued for a worker",
+        executor, ("state",))
+    if circuit_breakers is not None:
+        registry.callback_gauge(
+            "chat_api_circuit_state", "Circuit breaker state by model (0 closed, 1 half-open, 2 open)",
+            circuit_breakers.metric_values, ("model",))
+    if quote_store is not None:
+        registry.callback_gauge(
+            "chat_api_quote_snapshot_age_seconds",
+            "Age of the quote snapshot data (data) and time since it was last published (refresh)",
+            quote_store.metric_values, ("kind",))
+        registry.callback_gauge(
+            "chat_api_quote_snapshot_stale", "1 while the quote snapshot is older than QUOTES_MAX_STALENESS",
+            lambda: {(): float(quote_store.is_stale())})
 
-# Instancia del servicio actual
-llm_service = get_llm_service()
\ No newline at end of file
+
+_register_metrics()
+
+
+async def warm_up() -> None:
+    """
+    Prepara el servicio del modo actual al arrancar (hook del lifespan):
+    construye el pipeline y, en modo bedrock, abre conexiones para que la
+    primera peticion no pague el handshake TLS. Un fallo solo se registra.
+    """
+    get_llm_service()
+    if settings.llm_mode != "bedrock" or not settings.bedrock_warmup_connections:
+        return
+    try:
+        opened = await asyncio.wait_for(
+            get_bedrock_service().warm_up(settings.bedrock_warmup_connections),
+            timeout=settings.bedrock_warmup_timeout
+        )
+        logger.info(f"Bedrock warm-up: {opened}/{settings.bedrock_warmup_connections} connections ready")
+    except asyncio.TimeoutError:
+        logger.warning(f"Bedrock warm-up timed out after {settings.bedrock_warmup_timeout}s")
@@ -0,0 +1,226 @@
+"""
+Router de modelos: preguntas rapidas a Haiku, analisis complejos a Sonnet
+"""
+import re
+import time
+from typing import Any, AsyncIterator, Dict, Optional, Tuple, Union
+
+from ..models.llm import LLMRequest, LLMResponse, ChatRequest, ChatResponse
+from .layers import ServiceLayer, is_degraded
+
+
+# USD por 1K tokens (entrada, salida) para estimar coste en ``usage``
+MODEL_PRICING: Dict[str, Tuple[float, float]] = {
+    "anthropic.claude-3-haiku-20240307-v1:0": (0.00025, 0.00125),
+    "anthropic.claude-3-sonnet-20240229-v1:0": (0.003, 0.015),
+}
+
+# Señales de analisis de varios periodos / estados financieros
+_ANALYSIS_PATTERN = re.compile(
+    r"\b(analy[sz]e|analysis|compare|comparison|balance sheet|income statement|cash[- ]flow|"
+    r"statements?|10-k|10-q|annual report|multi-year|trend|over the (?:last|past)|valuation|dcf|"
+    r"forecast|projection|margins?|ratio analysis|leverage|liquidity|growth rate|cagr|"
+    r"analiza|analisis|análisis|compara|balance|flujo de caja|estado de resultados|tendencia)\b",
+    re.IGNORECASE
+)
+# Señales de consulta rapida (cotizacion, dato puntual)
+_QUICK_PATTERN = re.compile(
+    r"\b(price|quote|trading at|ticker|symbol|market cap|close[ds]?|today|precio|cotizaci[oó]n)\b",
+    re.IGNORECASE
+)
+_YEAR_PATTERN = re.compile(r"\b(?:19|20)\d{2}\b")
+
+
+class ModelHealth:
+    """Latencia y tasa de error (EWMA) observadas para un modelo"""
+
+    def __init__(self, alpha: float):
+        self.alpha = alpha
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.requests = 0
+
+    def record(self, latency: float, ok: bool) -> None:
+        self.requests += 1
+        if ok:
+            self.latency = latency if self.latency is None else (1 - self.alpha) * self.latency + self.alpha * latency
+        self.error_rate = (1 - self.alpha) * self.error_rate + self.alpha * (0.0 if ok else 1.0)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "latency_ewma_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "error_rate_ewma": round(self.error_rate, 4)
+        }
+
+
+class ModelRouter:
+    """
+    Clasifica cada peticion y elige modelo.
+
+    La clasificacion es barata (regex y longitudes): prompts largos,
+    conversaciones profundas o preguntas de analisis (estados financieros,
+    varios años, ratios) van al modelo fuerte; el resto al rapido. Despues
+    se ajusta con la salud observada: si el modelo preferido falla mucho o
+    el fuerte supera su presupuesto de latencia se usa el otro.
+
+    La salud solo se actualiza con las peticiones que recibe cada modelo:
+    mientras se desvia trafico, una de cada ``probe_every`` peticiones
+    desviadas va igualmente al preferido como sonda, para que se recupere
+    cuando deje de fallar.
+    """
+
+    def __init__(self, fast_model_id: str, strong_model_id: str, long_prompt_chars: int = 1200,
+                 deep_conversation_turns: int = 8, max_error_rate: float = 0.25,
+                 strong_latency_budget: float = 20.0, alpha: float = 0.2, probe_every: int = 20):
+        self.fast_model_id = fast_model_id
+        self.strong_model_id = strong_model_id
+        self.long_prompt_chars = long_prompt_chars
+        self.deep_conversation_turns = deep_conversation_turns
+        self.max_error_rate = max_error_rate
+        self.strong_latency_budget = strong_latency_budget
+        self.probe_every = probe_every
+        self.health: Dict[str, ModelHealth] = {
+            fast_model_id: ModelHealth(alpha),
+            strong_model_id: ModelHealth(alpha)
+        }
+        self.decisions: Dict[str, int] = {}
+        self._diverted: Dict[str, int] = {fast_model_id: 0, strong_model_id: 0}
+
+    def classify(self, request: Union[LLMRequest, ChatRequest]) -> Tuple[str, str]:
+        """Devuelve (tier, motivo) con tier ``fast`` o ``strong``"""
+        if isinstance(request, ChatRequest):
+            turns = len(request.messages)
+            text = next((m.content for m in reversed(request.messages) if m.role == "user"), "")
+            total_chars = sum(len(m.content) for m in request.messages)
+            if turns > self.deep_conversation_turns:
+                return "strong", "deep_conversation"
+        else:
+            text = request.prompt
+            total_chars = len(text)
+
+        if total_chars > self.long_prompt_chars:
+            return "strong", "long_prompt"
+        if _ANALYSIS_PATTERN.search(text) or len(_YEAR_PATTERN.findall(text)) >= 2:
+            return "strong", "analysis"
+        if _QUICK_PATTERN.search(text):
+            return "fast", "quick_lookup"
+        return "fast", "default"
+
+    def choose(self, request: Union[LLMRequest, ChatRequest]) -> Dict[str, Any]:
+        """Decision de routing: modelo elegido, tier y motivos"""
+        tier, reason = self.classify(request)
+        preferred = self.strong_model_id if tier == "strong" else self.fast_model_id
+        alternative = self.fast_model_id if tier == "strong" else self.strong_model_id
+        chosen, adjustment = preferred, None
+
+        preferred_health = self.health[preferred]
+        alternative_health = self.health[alternative]
+        if (preferred_health.error_rate > self.max_error_rate
+                and alternative_health.error_rate < preferred_health.error_rate):
+            chosen, adjustment = alternative, "preferred_unhealthy"
+        elif (tier == "strong" and preferred_health.latency is not None
+                and preferred_health.latency > self.strong_latency_budget
+                and alternative_health.error_rate <= self.max_error_rate):
+            chosen, adjustment = alternative, "strong_over_latency_budget"
+
+        if adjustment is not None:
+            self._diverted[preferred] += 1
+            if self.probe_every and self._diverted[preferred] % self.probe_every == 0:
+                chosen, adjustment = preferred, "probe"
+
+        key = f"{tier}:{reason}" + (f":{adjustment}" if adjustment else "")
+        self.decisions[key] = self.decisions.get(key, 0) + 1
+        return {"model_id": chosen, "tier": tier, "reason": reason, "adjustment": adjustment}
+
+    def record(self, model_id: str, latency: float, ok: bool) -> None:
+        health = self.health.get(model_id)
+        if health is not None:
+            health.record(latency, ok)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "models": {model_id: health.stats() for model_id, health in self.health.items()},
+            "decisions": dict(self.decisions)
+        }
+
+
+def estimate_cost(model_id: str, usage: Dict[str, Any]) -> Optional[float]:
+    """Coste estimado en USD a partir de los tokens de ``usage``"""
+    pricing = MODEL_PRICING.get(model_id)
+    if pricing is None:
+        return None
+    return round(
+        usage.get("input_tokens", 0) / 1000 * pricing[0] + usage.get("output_tokens", 0) / 1000 * pricing[1],
+        6
+    )
+
+
+def _served_by(model_id: str, usage: Dict[str, Any]) -> Optional[str]:
+    """
+    Modelo que genero la respuesta: con un respaldo del circuit breaker es
+    otro modelo o ninguno (cache, dummy), y el elegido cuenta como fallo.
+    """
+    if not is_degraded(usage):
+        return model_id
+    fallback = usage["degraded"]["fallback"]
+    return fallback.split(":", 1)[1] if fallback.startswith("model:") else None
+
+
+def _routing_usage(decision: Dict[str, Any], usage: Dict[str, Any]) -> Dict[str, Any]:
+    served = _served_by(decision["model_id"], usage)
+    return {**decision, "estimated_cost_usd": estimate_cost(served, usage) if served else None}
+
+
+class ModelRouterLayer(ServiceLayer):
+    """Asigna ``model_id`` a las peticiones que no lo fijan y deja la decision en ``usage``"""
+
+    def __init__(self, inner: Any, router: ModelRouter):
+        super().__init__(inner)
+        self.router = router
+
+    def _route(self, request: Any) -> Tuple[Any, Dict[str, Any]]:
+        if request.model_id:
+            return request, {"model_id": request.model_id, "tier": None, "reason": "client_selected", "adjustment": None}
+        decision = self.router.choose(request)
+        return request.model_copy(update={"model_id": decision["model_id"]}), decision
+
+    async def generate_text(self, request: LLMRequest) -> LLMResponse:
+        return await self._call(request, self.inner.generate_text)
+
+    async def chat(self, request: ChatRequest) -> ChatResponse:
+        return await self._call(request, self.inner.chat)
+
+    async def _call(self, request: Any, call: Any) -> Any:
+        routed, decision = self._route(request)
+        started = time.monotonic()
+        try:
+            response = await call(routed)
+        except Exception:
+            self.router.record(decision["model_id"], time.monotonic() - started, ok=False)
+            raise
+        self.router.record(decision["model_id"], time.monotonic() - started, ok=not is_degraded(response.usage))
+        response.usage["routing"] = _routing_usage(decision, response.usage)
+        return response
+
+    async def generate_text_stream(self, request: LLMRequest) -> AsyncIterator[Dict[str, Any]]:
+        async for event in self._stream(request, self.inner.generate_text_stream):
+            yield event
+
+    async def chat_stream(self, request: ChatRequest) -> AsyncIterator[Dict[str, Any]]:
+        async for event in self._stream(request, self.inner.chat_stream):
+            yield event
+
+    async def _stream(self, request: Any, open_stream: Any) -> AsyncIterator[Dict[str, Any]]:
+        routed, decision = self._route(request)
+        started = time.monotonic()
+        try:
+            async for event in open_stream(routed):
+                if event["event"] == "usage":
+                    usage = event["data"]["usage"]
+                    self.router.record(decision["model_id"], time.monotonic() - started, ok=not is_degraded(usage))
+                    usage["routing"] = _routing_usage(decision, usage)
+                yield event
+        except Exception:
+            self.router.record(decision["model_id"], time.monotonic() - started, ok=False)
+            raise
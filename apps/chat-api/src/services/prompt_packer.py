@@ -0,0 +1,126 @@
+"""
+Ensamblado del contexto del prompt dentro de un presupuesto de tokens
+"""
+import re
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Optional, Sequence, Tuple
+
+from ..core.config import settings
+from .prompt_template import get_financial_prompt
+
+
+_TOKEN_PATTERN = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=16384)
+def count_tokens(text: str) -> int:
+    """
+    Tokens aproximados de un texto (sin tokenizer real): una palabra corta
+    es un token, las largas se parten cada 8 letras, los numeros cada 3
+    digitos y cada signo cuenta uno. Tiende a sobrestimar un poco, que es
+    lo seguro para un presupuesto. Cacheado: los chunks se repiten mucho.
+    """
+    total = 0
+    for piece in _TOKEN_PATTERN.findall(text):
+        if piece[0].isalpha():
+            total += 1 + len(piece) // 8
+        elif piece[0].isdigit():
+            total += (len(piece) + 2) // 3
+        else:
+            total += 1
+    return total
+
+
+class ContextPiece(NamedTuple):
+    text: str
+    score: float  # mayor = mas valioso (similitud para chunks)
+    kind: str  # quotes | ratios | chunk
+
+
+def _shingles(text: str, size: int = 3) -> FrozenSet[int]:
+    words = _WORD_PATTERN.findall(text.lower())
+    if len(words) < size:
+        return frozenset([hash(tuple(words))])
+    return frozenset(hash(tuple(words[i:i + size])) for i in range(len(words) - size + 1))
+
+
+class PromptPacker:
+    """
+    Elige las piezas de contexto de mas valor que caben en el presupuesto.
+
+    El presupuesto de contexto es ``max_input_tokens`` menos lo que ya ocupan
+    la plantilla y la pregunta. Las piezas se recorren de mayor a menor
+    ``score``; las que repiten a otra ya elegida (p.ej. el solape entre
+    chunks consecutivos) se descartan y las que no caben se saltan por si
+    cabe una menor. El texto final conserva el orden de entrada.
+    """
+
+    def __init__(self, max_input_tokens: int = 3000, min_output_tokens: int = 384, max_output_tokens: int = 1024,
+                 output_tokens_per_piece: int = 64, dedupe_threshold: float = 0.6):
+        self.max_input_tokens = max_input_tokens
+        self.min_output_tokens = min_output_tokens
+        self.max_output_tokens = max_output_tokens
+        self.output_tokens_per_piece = output_tokens_per_piece
+        self.dedupe_threshold = dedupe_threshold
+
+    def _duplicate(self, shingles: FrozenSet[int], chosen: List[FrozenSet[int]]) -> bool:
+        for other in chosen:
+            overlap = len(shingles & other) / max(1, min(len(shingles), len(other)))
+            if overlap >= self.dedupe_threshold:
+                return True
+        return False
+
+    def max_tokens_for(self, pieces: int, requested: Optional[int] = None) -> int:
+        """
+        ``max_tokens`` de la respuesta: el pedido si lo hay; si no, la
+        plantilla pide respuestas cortas y se da algo mas de margen por cada
+        pieza de contexto que el modelo puede citar.
+        """
+        if requested:
+            return requested
+        return min(self.max_output_tokens, self.min_output_tokens + self.output_tokens_per_piece * pieces)
+
+    def pack(self, query: str, pieces: Sequence[ContextPiece],
+             max_tokens: Optional[int] = None) -> Tuple[List[ContextPiece], Dict[str, Any]]:
+        """Piezas elegidas (en orden de entrada) y el informe para ``usage``"""
+        prompt_tokens = count_tokens(get_financial_prompt(user_query=query, context=""))
+        budget = max(0, self.max_input_tokens - prompt_tokens)
+        used = 0
+        chosen: List[int] = []
+        chosen_shingles: List[FrozenSet[int]] = []
+        duplicates = dropped = 0
+        for position in sorted(range(len(pieces)), key=lambda i: -pieces[i].score):
+            piece = pieces[position]
+            shingles = _shingles(piece.text)
+            if self._duplicate(shingles, chosen_shingles):
+                duplicates += 1
+                continue
+            tokens = count_tokens(piece.text) + 2  # separador entre piezas
+            if used + tokens > budget:
+                dropped += 1
+                continue
+            used += tokens
+            chosen.append(position)
+            chosen_shingles.append(shingles)
+
+        selected = [pieces[i] for i in sorted(chosen)]
+        report = {
+            "prompt_tokens": prompt_tokens,
+            "context_tokens": used,
+            "budget_tokens": budget,
+            "pieces": len(selected),
+            "duplicates": duplicates,
+            "dropped": dropped,
+            "max_tokens": self.max_tokens_for(len(selected), max_tokens)
+        }
+        return selected, report
+
+
+# Instancia global
+prompt_packer = PromptPacker(
+    max_input_tokens=settings.prompt_max_input_tokens,
+    min_output_tokens=settings.prompt_min_output_tokens,
+    max_output_tokens=settings.prompt_max_output_tokens,
+    dedupe_threshold=settings.prompt_dedupe_threshold
+)
@@ -0,0 +1,240 @@
+"""
+Snapshot de cotizaciones en memoria con refresco en segundo plano
+"""
+import asyncio
+import csv
+import logging
+import math
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..core.config import settings
+from .shared_store import SharedArrayStore, shared_store
+
+
+logger = logging.getLogger(__name__)
+
+
+# Columnas numericas del snapshot (NaN = sin dato)
+QUOTE_FIELDS: Tuple[str, ...] = (
+    "last_price", "change", "change_pct", "volume", "market_cap", "pe_ratio", "high_52w", "low_52w"
+)
+
+
+class QuoteSnapshot:
+    """
+    Tabla columnar inmutable: una columna NumPy por campo y un indice
+    simbolo -> fila. Nunca se modifica; cada refresco publica una nueva.
+    """
+
+    def __init__(self, symbols: Sequence[str], columns: Dict[str, np.ndarray], as_of: float):
+        self.symbols = list(symbols)
+        self.columns = columns
+        self.as_of = as_of
+        self.published = time.time()
+        self._rows = {symbol: row for row, symbol in enumerate(self.symbols)}
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._rows
+
+    def get(self, symbol: str) -> Optional[Dict[str, Any]]:
+        row = self._rows.get(symbol)
+        if row is None:
+            return None
+        quote: Dict[str, Any] = {"symbol": symbol}
+        for field, column in self.columns.items():
+            value = float(column[row])
+            quote[field] = None if math.isnan(value) else value
+        return quote
+
+    def select(self, symbols: Iterable[str]) -> List[Dict[str, Any]]:
+        """Cotizaciones de los simbolos conocidos, en orden alfabetico"""
+        return [self.get(symbol) for symbol in sorted(set(symbols)) if symbol in self._rows]
+
+
+EMPTY_SNAPSHOT = QuoteSnapshot([], {field: np.empty(0) for field in QUOTE_FIELDS}, as_of=0.0)
+
+
+class CsvQuoteProvider:
+    """
+    Proveedor a partir de un CSV (``symbol`` + columnas de ``QUOTE_FIELDS``).
+    Sirve para pruebas offline; ``as_of`` es la fecha de modificacion.
+
+    Cualquier objeto con ``async fetch() -> (symbols, columns, as_of)`` puede
+    usarse como proveedor.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _read(self) -> Tuple[List[str], Dict[str, np.ndarray], float]:
+        with open(self.path, newline="") as f:
+            rows = list(csv.DictReader(f))
+        symbols = [row["symbol"].strip().upper() for row in rows]
+        columns = {
+            field: np.array([_to_float(row.get(field)) for row in rows], dtype=np.float64)
+            for field in QUOTE_FIELDS
+        }
+        return symbols, columns, os.path.getmtime(self.path)
+
+    async def fetch(self) -> Tuple[List[str], Dict[str, np.ndarray], float]:
+        return await asyncio.to_thread(self._read)
+
+
+def _to_float(value: Optional[str]) -> float:
+    try:
+        return float(value) if value not in (None, "") else math.nan
+    except ValueError:
+        return math.nan
+
+
+class QuoteStore:
+    """
+    Publica snapshots de un proveedor con copy-on-write.
+
+    Los lectores solo leen ``self.snapshot`` (una referencia), asi que nunca
+    esperan al refresco; la tarea de fondo construye el snapshot nuevo y lo
+    sustituye de una vez.
+
+    Con ``shared`` (varios workers) solo el worker lider consulta al
+    proveedor y publica cada snapshot en memoria compartida; los demas
+    adoptan la ultima generacion publicada, mapeada y sin copiarla.
+    """
+
+    def __init__(self, provider: Any, refresh_interval: float = 15.0, max_staleness: float = 120.0,
+                 shared: Optional[SharedArrayStore] = None):
+        self.provider = provider
+        self.refresh_interval = refresh_interval
+        self.max_staleness = max_staleness
+        self.shared = shared
+        self.generation = 0
+        self.snapshot = EMPTY_SNAPSHOT
+        self._task: Optional[asyncio.Task] = None
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.last_refresh_ms: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    async def refresh(self) -> QuoteSnapshot:
+        """Descarga y publica un snapshot nuevo"""
+        if self.shared is not None and not self.shared.try_lead("quotes"):
+            return self._follow()
+        started = time.perf_counter()
+        try:
+            symbols, columns, as_of = await self.provider.fetch()
+        except Exception as e:
+            self.refresh_errors += 1
+            self.last_error = str(e)
+            logger.warning(f"Quote refresh failed: {e}")
+            raise
+        snapshot = QuoteSnapshot(symbols, columns, as_of)
+        if self.shared is not None:
+            self.generation = await asyncio.to_thread(
+                self.shared.publish, "quotes", columns, {"symbols": list(symbols), "as_of": as_of}
+            )
+        self.snapshot = snapshot
+        self.refreshes += 1
+        self.last_refresh_ms = round((time.perf_counter() - started) * 1000, 2)
+        return snapshot
+
+    def _follow(self) -> QuoteSnapshot:
+        """Adopta el ultimo snapshot publicado por el worker lider, si hay uno nuevo"""
+        if self.shared.generation("quotes") != self.generation:
+            loaded = self.shared.load("quotes")
+            if loaded is not None:
+                self.generation, columns, meta = loaded
+                self.snapshot = QuoteSnapshot(meta["symbols"], columns, meta["as_of"])
+        return self.snapshot
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                # Ya registrado; se sigue sirviendo el snapshot anterior
+                pass
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def quotes_for(self, symbols: Iterable[str]) -> List[Dict[str, Any]]:
+        return self.snapshot.select(symbols)
+
+    def is_stale(self) -> bool:
+        return not self.snapshot.as_of or time.time() - self.snapshot.as_of > self.max_staleness
+
+    def metric_values(self) -> Dict[Tuple[str, ...], float]:
+        """Para el gauge ``chat_api_quote_snapshot_age_seconds``: antigüedad de los datos y de la publicacion"""
+        now = time.time()
+        snapshot = self.snapshot
+        values: Dict[Tuple[str, ...], float] = {}
+        if snapshot.as_of:
+            values[("data",)] = now - snapshot.as_of
+        if len(snapshot):
+            values[("refresh",)] = now - snapshot.published
+        return values
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        snapshot = self.snapshot
+        return {
+            "symbols": len(snapshot),
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "last_error": self.last_error,
+            "last_refresh_ms": self.last_refresh_ms,
+            # Antigüedad de los datos y tiempo desde la ultima publicacion
+            "staleness_seconds": round(now - snapshot.as_of, 3) if snapshot.as_of else None,
+            "refresh_lag_seconds": round(now - snapshot.published, 3) if len(snapshot) else None,
+            "stale": self.is_stale(),
+            "running": self._task is not None and not self._task.done(),
+            "shared_generation": self.generation if self.shared is not None else None
+        }
+
+
+def format_quote(quote: Dict[str, Any]) -> str:
+    """Linea compacta, p.ej. ``AAPL: $175.00 (+2.00%), P/E 25.4``"""
+    parts = [f"{quote['symbol']}:"]
+    if quote.get("last_price") is not None:
+        parts.append(f"${quote['last_price']:,.2f}")
+    if quote.get("change_pct") is not None:
+        parts.append(f"({quote['change_pct']:+.2f}%)")
+    extras = []
+    if quote.get("pe_ratio") is not None:
+        extras.append(f"P/E {quote['pe_ratio']:.1f}")
+    if quote.get("market_cap") is not None:
+        extras.append(f"market cap ${quote['market_cap'] / 1e9:,.1f}B")
+    if quote.get("low_52w") is not None and quote.get("high_52w") is not None:
+        extras.append(f"52w range ${quote['low_52w']:,.2f}-${quote['high_52w']:,.2f}")
+    line = " ".join(parts)
+    return f"{line}, {', '.join(extras)}" if extras else line
+
+
+def _build_quote_store() -> Optional[QuoteStore]:
+    """Crea el almacen de cotizaciones (o None si no hay proveedor configurado)"""
+    if settings.quotes_provider == "csv" and settings.quotes_csv_path:
+        provider = CsvQuoteProvider(settings.quotes_csv_path)
+    else:
+        return None
+    return QuoteStore(provider, settings.quotes_refresh_interval, settings.quotes_max_staleness, shared_store)
+
+
+# Instancia global
+quote_store = _build_quote_store()
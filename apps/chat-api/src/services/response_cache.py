@@ -0,0 +1,189 @@
+"""
+Cache exacto de respuestas para /generate y /chat
+"""
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple, Union
+
+from ..models.llm import LLMRequest, LLMResponse, ChatRequest, ChatResponse
+from .layers import ServiceLayer, is_degraded
+
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """Colapsa espacios y pasa a minusculas para que variaciones triviales compartan clave"""
+    return " ".join(text.split()).casefold()
+
+
+def request_cache_key(request: Union[LLMRequest, ChatRequest], default_model_id: str,
+                      default_temperature: float) -> str:
+    """
+    Clave estable de una peticion: prompt o mensajes normalizados mas
+    ``model_id``, ``max_tokens`` y ``temperature`` efectivos.
+    """
+    if isinstance(request, ChatRequest):
+        kind = "chat"
+        content: Any = [[message.role, normalize_text(message.content)] for message in request.messages]
+    else:
+        kind = "generate"
+        # top_k cambia el contexto recuperado y por tanto la respuesta
+        content = [normalize_text(request.prompt), request.top_k]
+    temperature = request.temperature if request.temperature is not None else default_temperature
+    payload = json.dumps(
+        [kind, request.model_id or default_model_id, request.max_tokens, temperature, content],
+        separators=(",", ":"),
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryCacheBackend:
+    """LRU en memoria del proceso con TTL por entrada y tamaño maximo"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self.evictions = 0
+        self.expirations = 0
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+
+class RedisCacheBackend:
+    """Backend Redis compartido entre procesos; la expiracion la maneja Redis"""
+
+    def __init__(self, url: str, prefix: str = "chat-api:response:"):
+        # Import diferido: redis es una dependencia opcional
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(url)
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await self.client.get(self.prefix + key)
+        return value.decode("utf-8") if isinstance(value, bytes) else value
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        await self.client.set(self.prefix + key, value, ex=max(1, int(ttl)))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "redis"}
+
+
+class ResponseCache:
+    """Cache de respuestas con contadores de aciertos/fallos"""
+
+    def __init__(self, backend: Any, ttl_seconds: float, max_temperature: float):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.max_temperature = max_temperature
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.errors = 0
+
+    def is_cacheable(self, request: Union[LLMRequest, ChatRequest], default_temperature: float) -> bool:
+        """Solo se cachea si no se pidio bypass y la temperatura es casi determinista"""
+        if request.bypass_cache:
+            return False
+        temperature = request.temperature if request.temperature is not None else default_temperature
+        return temperature <= self.max_temperature
+
+    async def get(self, key: str) -> Optional[str]:
+        try:
+            value = await self.backend.get(key)
+        except Exception as e:
+            # Un fallo del backend nunca debe tumbar la peticion
+            logger.warning(f"Response cache get failed: {e}")
+            self.errors += 1
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: str) -> None:
+        try:
+            await self.backend.set(key, value, self.ttl_seconds)
+        except Exception as e:
+            logger.warning(f"Response cache set failed: {e}")
+            self.errors += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "errors": self.errors,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            **self.backend.stats()
+        }
+
+
+class ResponseCacheLayer(ServiceLayer):
+    """Sirve /generate y /chat desde el cache exacto cuando es posible"""
+
+    def __init__(self, inner: Any, cache: ResponseCache, default_model_id: str, default_temperature: float):
+        super().__init__(inner)
+        self.cache = cache
+        self.default_model_id = default_model_id
+        self.default_temperature = default_temperature
+
+    async def generate_text(self, request: LLMRequest) -> LLMResponse:
+        return await self._cached(request, self.inner.generate_text, LLMResponse)
+
+    async def chat(self, request: ChatRequest) -> ChatResponse:
+        return await self._cached(request, self.inner.chat, ChatResponse)
+
+    async def _cached(self, request, call, response_type):
+        if not self.cache.is_cacheable(request, self.default_temperature):
+            self.cache.bypassed += 1
+            response = await call(request)
+            response.usage.setdefault("cache", "bypass")
+            return response
+
+        key = request_cache_key(request, self.default_model_id, self.default_temperature)
+        cached = await self.cache.get(key)
+        if cached is not None:
+            response = response_type.model_validate_json(cached)
+            response.usage["cache"] = "hit"
+            return response
+
+        response = await call(request)
+        if not is_degraded(response.usage):
+            await self.cache.set(key, response.model_dump_json())
+        response.usage.setdefault("cache", "miss")
+        return response
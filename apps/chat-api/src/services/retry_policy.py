@@ -0,0 +1,156 @@
+"""
+Politica de reintentos para Bedrock: presupuesto por codigo de error,
+backoff exponencial con jitter decorrelacionado, deadline total y hedging
+"""
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+# Reintentos permitidos por codigo de error; el resto no se reintenta
+DEFAULT_RETRY_BUDGETS: Dict[str, int] = {
+    "ThrottlingException": 4,
+    "ModelNotReadyException": 3,
+    "ServiceUnavailableException": 2,
+    "InternalServerException": 2,
+    "ModelTimeoutException": 1,
+    "EndpointConnectionError": 2,
+    "ConnectTimeoutError": 2,
+    "ReadTimeoutError": 1,
+}
+
+
+def error_code(error: BaseException) -> Optional[str]:
+    """
+    Codigo de error de Bedrock de una excepcion.
+
+    Para ``ClientError`` es ``response['Error']['Code']``; para errores de
+    conexion de botocore se usa el nombre de la clase. Se resuelve por forma
+    y no por tipo para no depender de importar botocore aqui.
+    """
+    response = getattr(error, "response", None)
+    if isinstance(response, dict):
+        return response.get("Error", {}).get("Code")
+    name = type(error).__name__
+    return name if name in DEFAULT_RETRY_BUDGETS else None
+
+
+class RetryPolicy:
+    """
+    Ejecuta una llamada reintentando errores transitorios.
+
+    - Cada codigo de error tiene su propio presupuesto de reintentos.
+    - Espera con "decorrelated jitter": ``min(max_delay, U(base, previa * 3))``.
+    - Todo el proceso respeta un deadline total; si la siguiente espera no
+      cabe, se devuelve el ultimo error en lugar de dormir en vano.
+    - Con hedging, si el intento tarda mas que el percentil ``hedge_quantile``
+      de las latencias recientes se lanza un duplicado y gana el primero.
+    """
+
+    def __init__(self, budgets: Optional[Dict[str, int]] = None, base_delay: float = 0.1,
+                 max_delay: float = 4.0, deadline: float = 30.0, hedging: bool = False,
+                 hedge_quantile: float = 0.95, hedge_min_samples: int = 20,
+                 sample_size: int = 512, rng: Optional[random.Random] = None):
+        self.budgets = dict(DEFAULT_RETRY_BUDGETS if budgets is None else budgets)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.hedging = hedging
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.rng = rng or random.Random()
+        self._latencies: Deque[float] = deque(maxlen=sample_size)
+        self.calls = 0
+        self.retries: Dict[str, int] = {}
+        self.exhausted: Dict[str, int] = {}
+        self.deadline_exceeded = 0
+        self.hedges_sent = 0
+        self.hedges_won = 0
+
+    def hedge_delay(self) -> Optional[float]:
+        """Retraso antes de lanzar el duplicado (None si no hay muestras suficientes)"""
+        if not self.hedging or len(self._latencies) < self.hedge_min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * self.hedge_quantile))]
+
+    async def call(self, attempt: Callable[[], Awaitable[Any]], hedge: bool = True) -> Any:
+        """Ejecuta ``attempt()`` aplicando la politica; relanza el ultimo error si no se recupera"""
+        self.calls += 1
+        started = time.monotonic()
+        used: Dict[str, int] = {}
+        delay = self.base_delay
+        while True:
+            remaining = self.deadline - (time.monotonic() - started)
+            try:
+                if remaining <= 0:
+                    raise asyncio.TimeoutError("Bedrock retry deadline exceeded")
+                return await asyncio.wait_for(self._attempt(attempt, hedge), timeout=remaining)
+            except asyncio.TimeoutError:
+                if time.monotonic() - started >= self.deadline:
+                    self.deadline_exceeded += 1
+                raise
+            except Exception as e:
+                code = error_code(e)
+                used[code] = used.get(code, 0) + 1
+                if code is None or used[code] > self.budgets.get(code, 0):
+                    if code in self.budgets:
+                        self.exhausted[code] = self.exhausted.get(code, 0) + 1
+                    raise
+                delay = min(self.max_delay, self.rng.uniform(self.base_delay, delay * 3))
+                if delay >= self.deadline - (time.monotonic() - started):
+                    self.deadline_exceeded += 1
+                    raise
+                self.retries[code] = self.retries.get(code, 0) + 1
+                logger.warning(f"Bedrock {code}, retry {used[code]}/{self.budgets[code]} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def _attempt(self, attempt: Callable[[], Awaitable[Any]], hedge: bool) -> Any:
+        attempt_started = time.monotonic()
+        hedge_delay = self.hedge_delay() if hedge else None
+        if hedge_delay is None:
+            result = await attempt()
+            self._latencies.append(time.monotonic() - attempt_started)
+            return result
+
+        primary = asyncio.ensure_future(attempt())
+        pending = {primary}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=hedge_delay)
+            if not done:
+                self.hedges_sent += 1
+                pending.add(asyncio.ensure_future(attempt()))
+            error: Optional[BaseException] = None
+            while True:
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedges_won += 1
+                        self._latencies.append(time.monotonic() - attempt_started)
+                        return task.result()
+                    error = task.exception()
+                if not pending:
+                    raise error
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            # El perdedor (o ambos, si nos cancelan) se descarta
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "retries": dict(self.retries),
+            "exhausted": dict(self.exhausted),
+            "deadline_exceeded": self.deadline_exceeded,
+            "hedging": self.hedging,
+            "hedge_delay_ms": round(self.hedge_delay() * 1000, 3) if self.hedge_delay() is not None else None,
+            "hedges_sent": self.hedges_sent,
+            "hedges_won": self.hedges_won
+        }
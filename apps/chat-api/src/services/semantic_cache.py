@@ -0,0 +1,165 @@
+"""
+Cache semantico: reutiliza respuestas de preguntas casi identicas en /generate
+"""
+import re
+import time
+import zlib
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+
+from ..models.llm import LLMRequest, LLMResponse
+from .embeddings import HashingEmbedder
+from .layers import ServiceLayer, is_degraded
+from .ticker_extractor import extract_tickers, resolve_company_names
+
+
+# Palabras que cambian la respuesta aunque apenas muevan el embedding
+# ("buy" vs "sell", "five years" vs "two years", "last" vs "next")
+_QUALIFIER_WORDS = frozenset({
+    "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten", "eleven", "twelve",
+    "twenty", "thirty", "fifty", "hundred", "first", "second", "third", "fourth",
+    "last", "next", "previous", "past", "before", "after", "since", "until",
+    "buy", "sell", "hold", "long", "short", "bullish", "bearish", "calls", "puts",
+    "overvalued", "undervalued", "upside", "downside", "highest", "lowest", "best", "worst",
+    "gain", "gains", "loss", "losses", "increase", "decrease", "above", "below"
+})
+_WORD = re.compile(r"\w+(?:\.\d+)?%?")
+
+
+def extract_qualifiers(prompt: str) -> FrozenSet[str]:
+    """Años, trimestres, cifras y palabras de sentido/cantidad del prompt (``2023``, ``q3``, ``sell``)"""
+    words = _WORD.findall(prompt.casefold())
+    return frozenset(w for w in words if w in _QUALIFIER_WORDS or any(c.isdigit() for c in w))
+
+
+class SemanticCache:
+    """
+    Indice vectorial (buffer circular en NumPy) de prompts ya respondidos.
+
+    Cada entrada guarda el embedding del prompt, la respuesta serializada,
+    los tickers mencionados y un ``scope`` (modelo, max_tokens, temperature,
+    top_k, tickers y ``extract_qualifiers``): solo se comparan entradas del
+    mismo scope, asi una respuesta sobre AAPL nunca se sirve para MSFT, ni
+    la de FY2022 para FY2023, ni la de "buy" para "sell". Los nombres de empresa cuentan como su ticker
+    (tambien en el embedding, ver ``embedding_text``), asi "Apple price to
+    earnings ratio?" y "what's AAPL's P/E" caen en el mismo scope. Las
+    entradas con tickers caducan con ``ticker_ttl_seconds`` porque dependen
+    del precio.
+    """
+
+    def __init__(self, embedder: HashingEmbedder, capacity: int, threshold: float,
+                 ttl_seconds: float, ticker_ttl_seconds: float):
+        self.embedder = embedder
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.ticker_ttl_seconds = ticker_ttl_seconds
+        self._vectors = np.zeros((capacity, embedder.dim), dtype=np.float32)
+        self._expires = np.zeros(capacity, dtype=np.float64)  # 0 = hueco libre
+        self._scopes = np.zeros(capacity, dtype=np.int64)
+        self._entries: List[Optional[Tuple[str, FrozenSet[str]]]] = [None] * capacity
+        self._next = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def embedding_text(prompt: str) -> str:
+        """Texto que se embebe: con los nombres de empresa resueltos a su simbolo"""
+        return resolve_company_names(prompt)
+
+    def _scope(self, prompt: str, model_id: str, max_tokens: Optional[int], temperature: Optional[float],
+               top_k: Optional[int], tickers: FrozenSet[str]) -> int:
+        qualifiers = ",".join(sorted(extract_qualifiers(prompt)))
+        key = f"{model_id}|{max_tokens}|{temperature}|{top_k}|{','.join(sorted(tickers))}|{qualifiers}"
+        return zlib.crc32(key.encode("utf-8"))
+
+    def lookup(self, prompt: str, model_id: str, max_tokens: Optional[int],
+               vector: Optional[np.ndarray] = None, temperature: Optional[float] = None,
+               top_k: Optional[int] = None) -> Optional[Tuple[str, float]]:
+        """Devuelve (respuesta_json, similitud) del vecino mas cercano si supera el umbral"""
+        scope = self._scope(prompt, model_id, max_tokens, temperature, top_k, extract_tickers(prompt))
+        query = self.embedder.embed(self.embedding_text(prompt)) if vector is None else vector
+        scores = self._vectors @ query
+        valid = (self._expires > time.monotonic()) & (self._scopes == scope)
+        scores = np.where(valid, scores, -1.0)
+        best = int(np.argmax(scores))
+        similarity = float(scores[best])
+        if similarity < self.threshold:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self._entries[best][0], similarity
+
+    def store(self, prompt: str, model_id: str, max_tokens: Optional[int], response_json: str,
+              vector: Optional[np.ndarray] = None, temperature: Optional[float] = None,
+              top_k: Optional[int] = None) -> None:
+        """Añade una respuesta sobrescribiendo la entrada mas antigua"""
+        tickers = extract_tickers(prompt)
+        slot = self._next
+        self._next = (self._next + 1) % self.capacity
+        ttl = self.ticker_ttl_seconds if tickers else self.ttl_seconds
+        self._vectors[slot] = self.embedder.embed(self.embedding_text(prompt)) if vector is None else vector
+        self._expires[slot] = time.monotonic() + ttl
+        self._scopes[slot] = self._scope(prompt, model_id, max_tokens, temperature, top_k, tickers)
+        self._entries[slot] = (response_json, tickers)
+
+    def invalidate_ticker(self, ticker: str) -> int:
+        """Caduca todas las respuestas que mencionan ``ticker`` (p.ej. tras un movimiento de precio)"""
+        removed = 0
+        for slot, entry in enumerate(self._entries):
+            if entry is not None and ticker in entry[1] and self._expires[slot] > 0:
+                self._expires[slot] = 0.0
+                self._entries[slot] = None
+                removed += 1
+        self.invalidations += removed
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "size": int(np.count_nonzero(self._expires > time.monotonic())),
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "invalidations": self.invalidations
+        }
+
+
+class SemanticCacheLayer(ServiceLayer):
+    """Sirve /generate con la respuesta de una pregunta equivalente ya contestada"""
+
+    def __init__(self, inner: Any, cache: SemanticCache, default_model_id: str, embeddings: Any = None,
+                 default_temperature: Optional[float] = None):
+        super().__init__(inner)
+        self.cache = cache
+        self.default_model_id = default_model_id
+        # EmbeddingService opcional: agrupa los embeddings de peticiones concurrentes
+        self.embeddings = embeddings
+        self.default_temperature = default_temperature
+
+    async def generate_text(self, request: LLMRequest) -> LLMResponse:
+        if request.bypass_cache:
+            return await self.inner.generate_text(request)
+
+        model_id = request.model_id or self.default_model_id
+        temperature = request.temperature if request.temperature is not None else self.default_temperature
+        vector = None
+        if self.embeddings is not None:
+            vector = await self.embeddings.embed(self.cache.embedding_text(request.prompt))
+        found = self.cache.lookup(request.prompt, model_id, request.max_tokens, vector, temperature, request.top_k)
+        if found is not None:
+            cached, similarity = found
+            response = LLMResponse.model_validate_json(cached)
+            response.usage["cache"] = "semantic_hit"
+            response.usage["semantic_similarity"] = round(similarity, 4)
+            return response
+
+        response = await self.inner.generate_text(request)
+        if not is_degraded(response.usage):
+            self.cache.store(request.prompt, model_id, request.max_tokens, response.model_dump_json(), vector,
+                             temperature, request.top_k)
+        return response
@@ -0,0 +1,231 @@
+"""
+Sesiones de chat en el servidor: el cliente envia solo el turno nuevo
+"""
+import asyncio
+import hashlib
+import hmac
+import logging
+import secrets
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from ..models.llm import ChatMessage, ChatRequest, ChatResponse
+from .layers import ServiceLayer, is_degraded
+
+
+logger = logging.getLogger(__name__)
+
+
+class SqlSessionBackend:
+    """
+    Tier frio en SQLAlchemy (Postgres en produccion, SQLite en tests).
+
+    Los mensajes se guardan como filas append-only, asi cada turno solo
+    inserta lo nuevo. El engine es sincrono y se usa desde un thread.
+    """
+
+    def __init__(self, database_url: str):
+        from sqlalchemy import Column, Float, Integer, MetaData, String, Table, Text, create_engine
+
+        self.engine = create_engine(database_url, pool_pre_ping=True, future=True)
+        self.metadata = MetaData()
+        self.messages = Table(
+            "chat_session_messages", self.metadata,
+            Column("id", Integer, primary_key=True, autoincrement=True),
+            Column("session_id", String(128), nullable=False, index=True),
+            Column("role", String(16), nullable=False),
+            Column("content", Text, nullable=False),
+            Column("created_at", Float, nullable=False)
+        )
+        self._ready = False
+
+    def _ensure_schema(self) -> None:
+        if not self._ready:
+            self.metadata.create_all(self.engine)
+            self._ready = True
+
+    def load(self, session_id: str, limit: int) -> List[ChatMessage]:
+        from sqlalchemy import select
+
+        self._ensure_schema()
+        query = (
+            select(self.messages.c.role, self.messages.c.content)
+            .where(self.messages.c.session_id == session_id)
+            .order_by(self.messages.c.id.desc())
+            .limit(limit)
+        )
+        with self.engine.connect() as conn:
+            rows = conn.execute(query).all()
+        return [ChatMessage(role=role, content=content) for role, content in reversed(rows)]
+
+    def append(self, session_id: str, messages: List[ChatMessage]) -> None:
+        self._ensure_schema()
+        now = time.time()
+        with self.engine.begin() as conn:
+            conn.execute(self.messages.insert(), [
+                {"session_id": session_id, "role": m.role, "content": m.content, "created_at": now}
+                for m in messages
+            ])
+
+    def delete(self, session_id: str) -> None:
+        self._ensure_schema()
+        with self.engine.begin() as conn:
+            conn.execute(self.messages.delete().where(self.messages.c.session_id == session_id))
+
+
+class SessionStore:
+    """
+    Historial por ``session_id`` con dos tiers.
+
+    El tier caliente es un LRU en memoria; el frio (opcional) es SQL y se
+    escribe en cada turno. Si una sesion no esta en memoria se recupera del
+    tier frio. Los errores del tier frio se registran y no rompen el chat.
+
+    Los ``session_id`` los emite el servidor (``issue_id``): un token
+    aleatorio firmado con ``secret``. Quien lo tiene es el dueño de la
+    sesion; un id inventado o adivinado no pasa ``is_issued``.
+
+    Con ``max_hot_sessions=0`` no hay tier caliente y cada turno se lee del
+    frio: es lo necesario con varios workers, donde el LRU de un proceso no
+    ve los turnos que añade otro.
+    """
+
+    def __init__(self, cold: Optional[SqlSessionBackend] = None, max_hot_sessions: int = 10000,
+                 max_messages: int = 200, secret: str = ""):
+        self.cold = cold
+        # Sin secreto configurado los ids solo valen para este proceso
+        self._secret = (secret or secrets.token_urlsafe(32)).encode("utf-8")
+        self.max_hot_sessions = max_hot_sessions
+        self.max_messages = max_messages
+        self._hot: "OrderedDict[str, List[ChatMessage]]" = OrderedDict()
+        self.hot_hits = 0
+        self.cold_hits = 0
+        self.misses = 0
+        self.cold_errors = 0
+        self.appended_messages = 0
+
+    def _sign(self, token: str) -> str:
+        return hmac.new(self._secret, token.encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+
+    def issue_id(self) -> str:
+        """Nuevo ``session_id`` no adivinable"""
+        token = secrets.token_urlsafe(24)
+        return f"{token}.{self._sign(token)}"
+
+    def is_issued(self, session_id: str) -> bool:
+        token, _, signature = session_id.rpartition(".")
+        return bool(token) and hmac.compare_digest(signature, self._sign(token))
+
+    async def load(self, session_id: str) -> List[ChatMessage]:
+        """Historial de la sesion (vacio si no existe)"""
+        messages = self._hot.get(session_id)
+        if messages is not None:
+            self._hot.move_to_end(session_id)
+            self.hot_hits += 1
+            return list(messages)
+
+        if self.cold is not None:
+            try:
+                messages = await asyncio.to_thread(self.cold.load, session_id, self.max_messages)
+            except Exception as e:
+                self.cold_errors += 1
+                logger.warning(f"Session store read failed: {e}")
+                messages = []
+            if messages:
+                self.cold_hits += 1
+                self._put(session_id, messages)
+                return list(messages)
+
+        self.misses += 1
+        return []
+
+    async def append(self, session_id: str, messages: List[ChatMessage]) -> None:
+        """Añade los mensajes del turno a ambos tiers"""
+        history = self._hot.get(session_id, []) + list(messages)
+        self._put(session_id, history)
+        self.appended_messages += len(messages)
+        if self.cold is not None:
+            try:
+                await asyncio.to_thread(self.cold.append, session_id, list(messages))
+            except Exception as e:
+                self.cold_errors += 1
+                logger.warning(f"Session store write failed: {e}")
+
+    async def delete(self, session_id: str) -> None:
+        self._hot.pop(session_id, None)
+        if self.cold is not None:
+            try:
+                await asyncio.to_thread(self.cold.delete, session_id)
+            except Exception as e:
+                self.cold_errors += 1
+                logger.warning(f"Session store delete failed: {e}")
+
+    def _put(self, session_id: str, messages: List[ChatMessage]) -> None:
+        if not self.max_hot_sessions:
+            return
+        self._hot[session_id] = messages[-self.max_messages:]
+        self._hot.move_to_end(session_id)
+        while len(self._hot) > self.max_hot_sessions:
+            self._hot.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cold_tier": self.cold is not None,
+            "hot_sessions": len(self._hot),
+            "hot_hits": self.hot_hits,
+            "cold_hits": self.cold_hits,
+            "misses": self.misses,
+            "cold_errors": self.cold_errors,
+            "appended_messages": self.appended_messages
+        }
+
+
+class SessionLayer(ServiceLayer):
+    """Reconstruye el historial de /chat a partir de ``session_id``"""
+
+    def __init__(self, inner: Any, store: SessionStore):
+        super().__init__(inner)
+        self.store = store
+
+    async def _with_history(self, request: ChatRequest) -> ChatRequest:
+        history = await self.store.load(request.session_id)
+        if not history:
+            return request
+        return request.model_copy(update={"messages": history + list(request.messages)})
+
+    async def chat(self, request: ChatRequest) -> ChatResponse:
+        if not request.session_id:
+            return await self.inner.chat(request)
+
+        full = await self._with_history(request)
+        response = await self.inner.chat(full)
+        if not is_degraded(response.usage):
+            await self.store.append(request.session_id, list(request.messages) + [response.message])
+        response.usage["session"] = {
+            "session_id": request.session_id,
+            "history_messages": len(full.messages) - len(request.messages)
+        }
+        return response
+
+    async def chat_stream(self, request: ChatRequest) -> AsyncIterator[Dict[str, Any]]:
+        if not request.session_id:
+            async for event in self.inner.chat_stream(request):
+                yield event
+            return
+
+        full = await self._with_history(request)
+        parts: List[str] = []
+        async for event in self.inner.chat_stream(full):
+            if event["event"] == "delta":
+                parts.append(event["data"]["text"])
+            elif event["event"] == "usage":
+                # El turno solo se guarda si el stream termina bien (y no es un respaldo)
+                if not is_degraded(event["data"]["usage"]):
+                    reply = ChatMessage(role="assistant", content="".join(parts))
+                    await self.store.append(request.session_id, list(request.messages) + [reply])
+                event["data"]["usage"]["session"] = {
+                    "session_id": request.session_id,
+                    "history_messages": len(full.messages) - len(request.messages)
+                }
+            yield event
@@ -0,0 +1,133 @@
+"""
+Almacen de arrays compartido entre los workers de un mismo host (mmap)
+"""
+import fcntl
+import json
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+from ..core.config import settings
+
+
+class SharedArrayStore:
+    """
+    Directorio (idealmente en ``/dev/shm``) donde un proceso publica
+    conjuntos de arrays NumPy y el resto los abre con ``mmap_mode="r"``:
+    todos los workers comparten las mismas paginas en lugar de tener cada
+    uno su copia.
+
+    Cada publicacion es una generacion nueva (``<name>/gen-<n>``) escrita en
+    un directorio temporal y activada al reemplazar ``<name>/CURRENT`` de
+    forma atomica; los lectores nunca ven una generacion a medias. Las
+    generaciones viejas se borran, pero quien ya las tenga mapeadas sigue
+    leyendolas hasta soltarlas. Un solo proceso publica cada nombre: el que
+    gana el lock de ``try_lead``.
+    """
+
+    def __init__(self, root: str, keep_generations: int = 2):
+        self.root = root
+        self.keep_generations = keep_generations
+        self._leases: Dict[str, int] = {}
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, name: str, *parts: str) -> str:
+        return os.path.join(self.root, name, *parts)
+
+    def generation(self, name: str) -> int:
+        """Ultima generacion publicada (0 = ninguna); solo lee un fichero pequeno"""
+        try:
+            with open(self._path(name, "CURRENT")) as f:
+                return int(f.read())
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def publish(self, name: str, arrays: Dict[str, np.ndarray], meta: Optional[Dict[str, Any]] = None) -> int:
+        """Escribe una generacion nueva y la activa; devuelve su numero"""
+        base = self._path(name)
+        os.makedirs(base, exist_ok=True)
+        generation = self.generation(name) + 1
+        staging = tempfile.mkdtemp(dir=base, prefix=".staging-")
+        for key, array in arrays.items():
+            np.save(os.path.join(staging, f"{key}.npy"), np.ascontiguousarray(array))
+        with open(os.path.join(staging, "meta.json"), "w") as f:
+            json.dump(meta or {}, f)
+        os.rename(staging, self._path(name, f"gen-{generation}"))
+
+        pointer = self._path(name, f".CURRENT-{os.getpid()}")
+        with open(pointer, "w") as f:
+            f.write(str(generation))
+        os.replace(pointer, self._path(name, "CURRENT"))
+        self._cleanup(name, generation)
+        return generation
+
+    def _cleanup(self, name: str, current: int) -> None:
+        for entry in os.listdir(self._path(name)):
+            if entry.startswith("gen-") and int(entry[4:]) <= current - self.keep_generations:
+                shutil.rmtree(self._path(name, entry), ignore_errors=True)
+
+    def load(self, name: str) -> Optional[Tuple[int, Dict[str, np.ndarray], Dict[str, Any]]]:
+        """``(generacion, arrays mapeados, meta)`` de la generacion actual, o None"""
+        generation = self.generation(name)
+        if not generation:
+            return None
+        directory = self._path(name, f"gen-{generation}")
+        try:
+            with open(os.path.join(directory, "meta.json")) as f:
+                meta = json.load(f)
+            arrays = {
+                entry[:-4]: np.load(os.path.join(directory, entry), mmap_mode="r")
+                for entry in os.listdir(directory) if entry.endswith(".npy")
+            }
+        except FileNotFoundError:
+            # Borrada por una publicacion posterior; se leera la siguiente vez
+            return None
+        return generation, arrays, meta
+
+    def _open_lock(self, name: str) -> int:
+        return os.open(os.path.join(self.root, f"{name}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+
+    def try_lead(self, name: str) -> bool:
+        """
+        Intenta ser el publicador de ``name`` (lock exclusivo sin esperar).
+        El lock se retiene mientras viva el proceso; si el lider muere, el
+        sistema lo libera y otro worker lo obtiene en su siguiente intento.
+        """
+        if name in self._leases:
+            return True
+        fd = self._open_lock(name)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._leases[name] = fd
+        return True
+
+    @contextmanager
+    def lock(self, name: str) -> Iterator[None]:
+        """Lock exclusivo bloqueante, para construcciones de una sola vez"""
+        fd = self._open_lock(name)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def stats(self) -> Dict[str, Any]:
+        names = [entry for entry in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, entry))]
+        return {
+            "root": self.root,
+            "pid": os.getpid(),
+            "leading": sorted(self._leases),
+            "generations": {name: self.generation(name) for name in sorted(names)}
+        }
+
+
+# Instancia global (None = cada worker carga sus propios datos)
+shared_store = SharedArrayStore(settings.shared_store_dir) if settings.shared_store_dir else None
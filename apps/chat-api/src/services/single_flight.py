@@ -0,0 +1,191 @@
+"""
+Single-flight: peticiones identicas en vuelo comparten una sola llamada al LLM
+"""
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from ..models.llm import LLMRequest, LLMResponse, ChatRequest, ChatResponse
+from .layers import ServiceLayer
+from .response_cache import request_cache_key
+
+
+class _Flight:
+    """Llamada compartida y numero de peticiones que la esperan"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class _SharedStream:
+    """
+    Stream compartido: una tarea consume el stream original y guarda los
+    eventos; cada suscriptor los reproduce desde el principio, asi que quien
+    llega tarde no pierde los primeros tokens.
+    """
+
+    def __init__(self, source: AsyncIterator[Dict[str, Any]]):
+        self.events: List[Dict[str, Any]] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self._changed = asyncio.Event()
+        self.task = asyncio.ensure_future(self._produce(source))
+
+    def _wake(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def _produce(self, source: AsyncIterator[Dict[str, Any]]) -> None:
+        try:
+            async for event in source:
+                self.events.append(event)
+                self._wake()
+        except asyncio.CancelledError:
+            self.error = asyncio.CancelledError()
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._wake()
+            aclose = getattr(source, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    async def subscribe(self, coalesced: bool) -> AsyncIterator[Dict[str, Any]]:
+        index = 0
+        while True:
+            changed = self._changed
+            while index < len(self.events):
+                event = self.events[index]
+                index += 1
+                if coalesced and event["event"] == "usage":
+                    event = {"event": "usage", "data": {**event["data"], "usage": {**event["data"]["usage"], "coalesced": True}}}
+                yield event
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await changed.wait()
+
+
+class SingleFlight:
+    """
+    Agrupa llamadas concurrentes con la misma clave.
+
+    La llamada real corre en su propia tarea, no en la de quien llego primero:
+    si ese cliente se desconecta los demas siguen esperando el resultado. La
+    tarea solo se cancela cuando ya no queda nadie esperandola.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self._streams: Dict[str, _SharedStream] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.stream_leaders = 0
+        self.stream_coalesced = 0
+        self.cancelled = 0
+
+    async def do(self, key: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Ejecuta ``call`` o se une a la ejecucion en curso con la misma clave"""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(call()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(self._flights, key, flight))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Fuera del registro antes de cancelar: nadie debe unirse a una tarea cancelada
+                self._forget(self._flights, key, flight)
+                flight.task.cancel()
+                self.cancelled += 1
+
+    async def stream(self, key: str, open_stream: Callable[[], AsyncIterator[Dict[str, Any]]]) -> AsyncIterator[Dict[str, Any]]:
+        """Suscribe al stream en curso con la misma clave o abre uno nuevo"""
+        shared = self._streams.get(key)
+        coalesced = shared is not None
+        if shared is None:
+            shared = _SharedStream(open_stream())
+            self._streams[key] = shared
+            shared.task.add_done_callback(lambda _: self._forget(self._streams, key, shared))
+            self.stream_leaders += 1
+        else:
+            self.stream_coalesced += 1
+
+        shared.subscribers += 1
+        try:
+            async for event in shared.subscribe(coalesced):
+                yield event
+        finally:
+            shared.subscribers -= 1
+            if shared.subscribers == 0 and not shared.task.done():
+                self._forget(self._streams, key, shared)
+                shared.task.cancel()
+                self.cancelled += 1
+
+    def is_in_flight(self, key: str) -> bool:
+        """Indica si ya hay una llamada en curso con esta clave"""
+        return key in self._flights
+
+    @staticmethod
+    def _forget(registry: Dict[str, Any], key: str, entry: Any) -> None:
+        if registry.get(key) is entry:
+            del registry[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "stream_leaders": self.stream_leaders,
+            "stream_coalesced": self.stream_coalesced,
+            "in_flight": len(self._flights) + len(self._streams),
+            "cancelled_upstream": self.cancelled
+        }
+
+
+class SingleFlightLayer(ServiceLayer):
+    """Deduplica peticiones /generate y /chat identicas que estan en vuelo"""
+
+    def __init__(self, inner: Any, group: SingleFlight, default_model_id: str, default_temperature: float):
+        super().__init__(inner)
+        self.group = group
+        self.default_model_id = default_model_id
+        self.default_temperature = default_temperature
+
+    def _key(self, kind: str, request: Any) -> str:
+        return kind + ":" + request_cache_key(request, self.default_model_id, self.default_temperature)
+
+    async def generate_text(self, request: LLMRequest) -> LLMResponse:
+        return await self._shared(self._key("generate", request), lambda: self.inner.generate_text(request))
+
+    async def chat(self, request: ChatRequest) -> ChatResponse:
+        return await self._shared(self._key("chat", request), lambda: self.inner.chat(request))
+
+    async def _shared(self, key: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        coalesced = self.group.is_in_flight(key)
+        response = await self.group.do(key, call)
+        # Cada peticion recibe su propia copia: las capas externas modifican ``usage``
+        response = response.model_copy(deep=True)
+        if coalesced:
+            response.usage["coalesced"] = True
+        return response
+
+    async def generate_text_stream(self, request: LLMRequest) -> AsyncIterator[Dict[str, Any]]:
+        key = self._key("generate_stream", request)
+        async for event in self.group.stream(key, lambda: self.inner.generate_text_stream(request)):
+            yield event
+
+    async def chat_stream(self, request: ChatRequest) -> AsyncIterator[Dict[str, Any]]:
+        key = self._key("chat_stream", request)
+        async for event in self.group.stream(key, lambda: self.inner.chat_stream(request)):
+            yield event
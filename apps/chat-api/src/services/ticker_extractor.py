@@ -0,0 +1,406 @@
+"""
+Deteccion de tickers y nombres de empresa en el texto del usuario.
+
+Un automata Aho-Corasick compilado a DFA denso recorre el prompt una sola
+vez, sin importar cuantos simbolos haya en el diccionario. El DFA se guarda
+en disco (``.npy``) para arrancar sin reconstruirlo.
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import re
+import sys
+from collections import deque
+from typing import Any, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..core.config import settings
+from .shared_store import shared_store
+
+
+logger = logging.getLogger(__name__)
+
+
+# Simbolos en mayusculas (opcionalmente con $); se descartan siglas comunes.
+# Solo se usa si no hay diccionario de simbolos configurado.
+_TICKER_PATTERN = re.compile(r"\$?\b([A-Z]{1,5})\b")
+_NOT_TICKERS = frozenset(
+    "A I P E S CEO CFO ETF IPO EPS USD US UK EU GDP AI API SEC YOY QOQ ROE ROA PE".split()
+)
+
+# Simbolos que tambien son palabras o siglas habituales: solo cuentan con ``$``
+AMBIGUOUS_SYMBOLS = _NOT_TICKERS | frozenset("""
+    IT ON ALL ARE CAN NOW SO GO BE AN AT BY OR UP ME HE DO ONE TWO OUT NEW BIG LOW KEY RUN SEE WELL REAL OPEN
+    LOVE FAST TRUE CASH PLAY HAS FOR AND ANY DAY FUN MAIN MOST NEXT PAY PEAK PLUS POST SAFE TELL WIN WISH YOU
+    HOPE GOOD BEST LIFE LIVE MIND KIND CAR CORE FREE HEAR HAIL JOB NICE ROAD SAVE SHOP TECH TEAM WORK
+""".split())
+
+# Nombres de empresa que son palabras comunes: solo cuentan con mayuscula inicial
+AMBIGUOUS_NAMES = frozenset("""
+    target gap snap block square match zoom shell visa chase best progressive general united meta
+""".split()) | frozenset(symbol.lower() for symbol in AMBIGUOUS_SYMBOLS)
+
+# Nombres habituales que no coinciden con la razon social
+DEFAULT_ALIASES = {
+    "GOOGL": ["Google", "Alphabet"],
+    "META": ["Facebook", "Meta"],
+    "AMZN": ["Amazon"],
+    "MSFT": ["Microsoft"],
+    "AAPL": ["Apple"],
+    "NVDA": ["Nvidia"],
+    "TSLA": ["Tesla"],
+    "NFLX": ["Netflix"],
+}
+
+# Sufijos societarios que se quitan del nombre ("Apple Inc. - Common Stock" -> "Apple")
+_NAME_SUFFIX = re.compile(
+    r"[\s,]+(inc|incorporated|corp|corporation|co|company|ltd|limited|plc|llc|lp|n\.?v|s\.?a|ag|se|"
+    r"holdings?|group|class [a-c]|common stock|ordinary shares|american depositary shares)\.?$",
+    re.IGNORECASE
+)
+
+KIND_SYMBOL = 0
+KIND_NAME = 1
+
+# Alfabeto reducido: 0 = separador, letras sin distinguir mayusculas, digitos, "." "&" "-"
+_ALPHABET = "abcdefghijklmnopqrstuvwxyz0123456789.&-"
+N_CLASSES = len(_ALPHABET) + 1
+_CLASSES = bytearray(256)
+for _code, _char in enumerate(_ALPHABET, start=1):
+    _CLASSES[ord(_char)] = _code
+    _CLASSES[ord(_char.upper())] = _code
+_CLASSES = bytes(_CLASSES)
+
+
+class TickerMatch(NamedTuple):
+    symbol: str
+    start: int
+    end: int
+    kind: int
+
+
+def encode(text: str) -> bytes:
+    """Clase de cada caracter (misma longitud que ``text``)"""
+    return text.encode("ascii", "replace").translate(_CLASSES)
+
+
+def _pattern(text: str) -> bytes:
+    # Sin separadores en los extremos y como mucho uno seguido
+    return re.sub(rb"\x00+", b"\x00", encode(text)).strip(b"\x00")
+
+
+def company_name(name: str) -> str:
+    """Nombre comun de la empresa sin sufijos societarios"""
+    name = name.split(" - ")[0].strip()
+    while True:
+        stripped = _NAME_SUFFIX.sub("", name).strip(" ,.")
+        if stripped == name:
+            break
+        name = stripped
+    return re.sub(r"^the\s+", "", name, flags=re.IGNORECASE)
+
+
+def read_symbols(path: str) -> List[Tuple[str, str, List[str]]]:
+    """CSV ``symbol,name[,aliases]`` (alias separados por ``|``)"""
+    entries = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            symbol = (row.get("symbol") or "").strip().upper()
+            if not symbol:
+                continue
+            aliases = [a.strip() for a in (row.get("aliases") or "").split("|") if a.strip()]
+            entries.append((symbol, (row.get("name") or "").strip(), aliases))
+    return entries
+
+
+class TickerExtractor:
+    """
+    DFA Aho-Corasick sobre el alfabeto reducido.
+
+    ``delta`` guarda, para cada estado y clase, el desplazamiento de la fila
+    del siguiente estado (``estado * N_CLASSES``), asi el bucle de busqueda es
+    una suma y un acceso por caracter. Las coincidencias se validan despues:
+    limites de palabra, y para simbolos mayusculas o ``$``.
+    """
+
+    def __init__(self, symbols: Sequence[str], delta: np.ndarray, out_offsets: np.ndarray, out_ids: np.ndarray,
+                 pattern_symbol: np.ndarray, pattern_length: np.ndarray, pattern_kind: np.ndarray,
+                 pattern_ambiguous: np.ndarray):
+        self.symbols = list(symbols)
+        self.delta = delta
+        self.out_offsets = out_offsets
+        self.out_ids = out_ids
+        self.pattern_symbol = pattern_symbol.tolist()
+        self.pattern_length = pattern_length.tolist()
+        self.pattern_kind = pattern_kind.tolist()
+        self.pattern_ambiguous = pattern_ambiguous.tolist()
+        # memoryview: acceso por indice a int sin copiar el memmap
+        self._delta = memoryview(np.ascontiguousarray(delta).reshape(-1))
+        offsets = out_offsets.tolist()
+        ids = out_ids.tolist()
+        self._outputs = {
+            state * N_CLASSES: tuple(ids[offsets[state]:offsets[state + 1]])
+            for state in np.flatnonzero(np.diff(out_offsets)).tolist()
+        }
+
+    @property
+    def states(self) -> int:
+        return len(self.delta) // N_CLASSES
+
+    @classmethod
+    def build(cls, entries: Iterable[Tuple[str, str, Iterable[str]]],
+              aliases: Optional[Dict[str, List[str]]] = None) -> "TickerExtractor":
+        """Compila el automata a partir de ``(simbolo, nombre, alias)``"""
+        entries = list(entries)
+        known = {symbol for symbol, _, _ in entries}
+        symbols: List[str] = []
+        symbol_index: Dict[str, int] = {}
+        # (patron, tipo) -> (simbolo, tipo, ambiguo); "META" y "Meta" conviven
+        patterns: Dict[Tuple[bytes, int], Tuple[int, int, bool]] = {}
+
+        def add(symbol: str, text: str, kind: int) -> None:
+            pattern = _pattern(text)
+            if len(pattern) < (1 if kind == KIND_SYMBOL else 3) or (pattern, kind) in patterns:
+                return
+            if symbol not in symbol_index:
+                symbol_index[symbol] = len(symbols)
+                symbols.append(symbol)
+            if kind == KIND_SYMBOL:
+                ambiguous = len(symbol) == 1 or symbol in AMBIGUOUS_SYMBOLS
+            else:
+                ambiguous = text.lower() in AMBIGUOUS_NAMES
+            patterns[(pattern, kind)] = (symbol_index[symbol], kind, ambiguous)
+
+        # Alias primero: deciden a que simbolo va un nombre compartido (GOOG/GOOGL)
+        for symbol, names in (aliases if aliases is not None else DEFAULT_ALIASES).items():
+            if symbol in known:
+                for alias in names:
+                    add(symbol, alias, KIND_NAME)
+        for symbol, name, extra in entries:
+            add(symbol, symbol, KIND_SYMBOL)
+            for alias in extra:
+                add(symbol, alias, KIND_NAME)
+            if name:
+                add(symbol, company_name(name), KIND_NAME)
+
+        # Trie
+        children: List[Dict[int, int]] = [{}]
+        own: List[List[int]] = [[]]
+        pattern_list = list(patterns.items())
+        for pattern_id, ((pattern, _), _) in enumerate(pattern_list):
+            state = 0
+            for code in pattern:
+                nxt = children[state].get(code)
+                if nxt is None:
+                    nxt = len(children)
+                    children[state][code] = nxt
+                    children.append({})
+                    own.append([])
+                state = nxt
+            own[state].append(pattern_id)
+
+        # Enlaces de fallo en anchura -> DFA completo
+        n_states = len(children)
+        delta = np.zeros((n_states, N_CLASSES), dtype=np.int32)
+        outputs: List[List[int]] = [list(ids) for ids in own]
+        fail = [0] * n_states
+        queue = deque()
+        for code, child in children[0].items():
+            delta[0, code] = child
+            queue.append(child)
+        while queue:
+            state = queue.popleft()
+            delta[state] = delta[fail[state]]
+            outputs[state].extend(outputs[fail[state]])
+            for code, child in children[state].items():
+                fail[child] = int(delta[fail[state], code])
+                delta[state, code] = child
+                queue.append(child)
+
+        out_offsets = np.zeros(n_states + 1, dtype=np.int64)
+        out_offsets[1:] = np.cumsum([len(ids) for ids in outputs])
+        out_ids = np.asarray([i for ids in outputs for i in ids], dtype=np.int32)
+        meta = [value for _, value in pattern_list]
+        return cls(
+            symbols,
+            (delta * N_CLASSES).reshape(-1),
+            out_offsets,
+            out_ids,
+            np.asarray([m[0] for m in meta], dtype=np.int32),
+            np.asarray([len(p) for (p, _), _ in pattern_list], dtype=np.int32),
+            np.asarray([m[1] for m in meta], dtype=np.int8),
+            np.asarray([m[2] for m in meta], dtype=np.bool_)
+        )
+
+    def save(self, directory: str, source: Optional[Dict[str, Any]] = None) -> None:
+        os.makedirs(directory, exist_ok=True)
+
+        def write(name: str, array: np.ndarray) -> None:
+            # Fichero nuevo + rename: otro proceso puede tener el anterior mapeado
+            path = os.path.join(directory, f"{name}.npy")
+            with open(f"{path}.{os.getpid()}.tmp", "wb") as f:
+                np.save(f, array)
+            os.replace(f"{path}.{os.getpid()}.tmp", path)
+
+        write("delta", np.asarray(self.delta, dtype=np.int32))
+        write("out_offsets", self.out_offsets)
+        write("out_ids", self.out_ids)
+        write("pattern_symbol", np.asarray(self.pattern_symbol, dtype=np.int32))
+        write("pattern_length", np.asarray(self.pattern_length, dtype=np.int32))
+        write("pattern_kind", np.asarray(self.pattern_kind, dtype=np.int8))
+        write("pattern_ambiguous", np.asarray(self.pattern_ambiguous, dtype=np.bool_))
+        # El manifiesto al final: sin el, el directorio no se considera valido
+        manifest = {"alphabet": _ALPHABET, "symbols": self.symbols, "source": source or {}}
+        with open(os.path.join(directory, "tickers.json"), "w") as f:
+            json.dump(manifest, f)
+
+    @classmethod
+    def load(cls, directory: str) -> "TickerExtractor":
+        with open(os.path.join(directory, "tickers.json")) as f:
+            manifest = json.load(f)
+        if manifest["alphabet"] != _ALPHABET:
+            raise ValueError("Ticker automaton was built with a different alphabet")
+
+        def array(name: str, mmap: bool = False) -> np.ndarray:
+            return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r" if mmap else None)
+
+        return cls(
+            manifest["symbols"], array("delta", mmap=True), array("out_offsets"), array("out_ids"),
+            array("pattern_symbol"), array("pattern_length"), array("pattern_kind"), array("pattern_ambiguous")
+        )
+
+    def find(self, text: str) -> List[TickerMatch]:
+        """Coincidencias validas en orden de aparicion (una pasada)"""
+        delta = self._delta
+        outputs = self._outputs
+        matches: List[TickerMatch] = []
+        state = 0
+        for end, code in enumerate(encode(text)):
+            state = delta[state + code]
+            if state in outputs:
+                for pattern_id in outputs[state]:
+                    match = self._accept(text, pattern_id, end + 1)
+                    if match is not None:
+                        matches.append(match)
+        return matches
+
+    def _accept(self, text: str, pattern_id: int, end: int) -> Optional[TickerMatch]:
+        start = end - self.pattern_length[pattern_id]
+        if (start > 0 and text[start - 1].isalnum()) or (end < len(text) and text[end].isalnum()):
+            return None
+        kind = self.pattern_kind[pattern_id]
+        if kind == KIND_SYMBOL:
+            # "$aapl" siempre; si no, en mayusculas y sin ser una palabra comun
+            cashtag = start > 0 and text[start - 1] == "$"
+            if not cashtag and (self.pattern_ambiguous[pattern_id] or not text[start:end].isupper()):
+                return None
+        elif self.pattern_ambiguous[pattern_id] and not text[start].isupper():
+            return None
+        return TickerMatch(self.symbols[self.pattern_symbol[pattern_id]], start, end, kind)
+
+    def extract(self, text: str) -> FrozenSet[str]:
+        return frozenset(match.symbol for match in self.find(text))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "symbols": len(self.symbols),
+            "patterns": len(self.pattern_length),
+            "states": self.states,
+            "dfa_bytes": int(self.states * N_CLASSES * 4)
+        }
+
+
+def _build_ticker_extractor() -> Optional[TickerExtractor]:
+    """
+    Carga el automata de ``ticker_automaton_dir``; si falta o es mas viejo que
+    ``ticker_symbols_csv`` lo reconstruye desde el CSV (y lo guarda).
+    """
+    directory = settings.ticker_automaton_dir
+    csv_path = settings.ticker_symbols_csv
+    if shared_store is None:
+        return _load_or_build(directory, csv_path)
+    # Varios workers: el primero construye en memoria compartida y el resto
+    # espera al lock y mapea el mismo automata
+    with shared_store.lock("tickers"):
+        return _load_or_build(directory or os.path.join(shared_store.root, "tickers"), csv_path)
+
+
+def _load_or_build(directory: str, csv_path: str) -> Optional[TickerExtractor]:
+    try:
+        if directory and os.path.exists(os.path.join(directory, "tickers.json")):
+            manifest_mtime = os.path.getmtime(os.path.join(directory, "tickers.json"))
+            if not csv_path or os.path.getmtime(csv_path) <= manifest_mtime:
+                return TickerExtractor.load(directory)
+        if not csv_path:
+            return None
+        extractor = TickerExtractor.build(read_symbols(csv_path))
+        if directory:
+            extractor.save(directory, source={"csv": csv_path})
+        logger.info(f"Ticker automaton built: {extractor.stats()}")
+        return extractor
+    except Exception as e:
+        logger.error(f"Error loading ticker automaton: {e}")
+        return None
+
+
+# Instancia global (None = deteccion por expresion regular)
+ticker_extractor = _build_ticker_extractor()
+
+
+# Sin diccionario: los alias por defecto siguen resolviendo nombres a simbolos
+_ALIAS_SYMBOLS = {alias.casefold(): symbol for symbol, names in DEFAULT_ALIASES.items() for alias in names}
+_ALIAS_PATTERN = re.compile(
+    r"\b(" + "|".join(re.escape(alias) for alias in sorted(_ALIAS_SYMBOLS, key=len, reverse=True)) + r")\b",
+    re.IGNORECASE
+)
+
+
+def _find_names(text: str) -> List[TickerMatch]:
+    """Nombres de empresa en el texto, sin solapes (el mas largo primero)"""
+    if ticker_extractor is not None:
+        found = [match for match in ticker_extractor.find(text) if match.kind == KIND_NAME]
+    else:
+        found = [
+            TickerMatch(_ALIAS_SYMBOLS[m.group(1).casefold()], m.start(), m.end(), KIND_NAME)
+            for m in _ALIAS_PATTERN.finditer(text)
+            if m.group(1).casefold() not in AMBIGUOUS_NAMES or m.group(1)[0].isupper()
+        ]
+    names: List[TickerMatch] = []
+    for match in sorted(found, key=lambda m: (m.start, m.start - m.end)):
+        if not names or match.start >= names[-1].end:
+            names.append(match)
+    return names
+
+
+def extract_tickers(text: str) -> FrozenSet[str]:
+    """Tickers mencionados en el texto (por simbolo, nombre o alias)"""
+    if ticker_extractor is not None:
+        return ticker_extractor.extract(text)
+    symbols = frozenset(match for match in _TICKER_PATTERN.findall(text) if match not in _NOT_TICKERS)
+    return symbols | frozenset(match.symbol for match in _find_names(text))
+
+
+def resolve_company_names(text: str) -> str:
+    """Sustituye los nombres de empresa por su simbolo ("Apple's P/E" -> "AAPL's P/E")"""
+    for match in reversed(_find_names(text)):
+        text = text[:match.start] + match.symbol + text[match.end:]
+    return text
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build the ticker automaton from a symbols CSV")
+    parser.add_argument("--symbols", required=True, help="CSV con columnas symbol,name[,aliases]")
+    parser.add_argument("--output", default=settings.ticker_automaton_dir or "data/tickers")
+    args = parser.parse_args(argv)
+
+    extractor = TickerExtractor.build(read_symbols(args.symbols))
+    extractor.save(args.output, source={"csv": args.symbols})
+    print(json.dumps(extractor.stats(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
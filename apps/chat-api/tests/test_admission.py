@@ -0,0 +1,129 @@
+"""
+Tests for priority admission control and load shedding
+"""
+import asyncio
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+
+from src.main import app
+from src.core.config import settings
+from src.services.admission import (
+    AdmissionController, AdmissionRejected, Priority, parse_priority
+)
+
+
+client = TestClient(app)
+
+
+def _controller(max_concurrency=1, max_queue=4, deadline=5.0, service_time=0.1):
+    deadlines = {p: deadline for p in Priority}
+    return AdmissionController(max_concurrency, max_queue, deadlines, initial_service_time=service_time)
+
+
+@pytest.mark.asyncio
+async def test_slots_are_capped_and_released():
+    """Only max_concurrency callers hold a slot at once"""
+    controller = _controller(max_concurrency=2)
+    first = await controller.acquire()
+    second = await controller.acquire()
+    waiter = asyncio.create_task(controller.acquire())
+    await asyncio.sleep(0.01)
+
+    assert controller.stats()["active"] == 2
+    assert controller.stats()["queued"] == 1
+    assert not waiter.done()
+
+    first.release()
+    third = await waiter
+    assert controller.stats()["active"] == 2
+    second.release()
+    third.release()
+    third.release()  # idempotent
+    assert controller.stats()["active"] == 0
+
+
+@pytest.mark.asyncio
+async def test_interactive_requests_jump_the_queue():
+    """Queued interactive work is admitted before bulk work"""
+    controller = _controller(max_concurrency=1)
+    holder = await controller.acquire()
+    order = []
+
+    async def wait(priority, name):
+        slot = await controller.acquire(priority)
+        order.append(name)
+        slot.release()
+
+    bulk = asyncio.create_task(wait(Priority.BULK, "bulk"))
+    await asyncio.sleep(0.01)
+    chat = asyncio.create_task(wait(Priority.INTERACTIVE, "chat"))
+    await asyncio.sleep(0.01)
+    holder.release()
+    await asyncio.gather(bulk, chat)
+
+    assert order == ["chat", "bulk"]
+
+
+@pytest.mark.asyncio
+async def test_shed_when_queue_full_or_deadline_exceeded():
+    """Requests are rejected immediately instead of waiting to time out"""
+    controller = _controller(max_concurrency=1, max_queue=1, deadline=5.0, service_time=1.0)
+    holder = await controller.acquire()
+    queued = asyncio.create_task(controller.acquire())
+    await asyncio.sleep(0.01)
+
+    with pytest.raises(AdmissionRejected) as full:
+        await controller.acquire()
+    assert full.value.reason == "queue_full"
+    assert full.value.retry_after >= 1
+
+    slow = _controller(max_concurrency=1, deadline=0.5, service_time=2.0)
+    await slow.acquire()
+    with pytest.raises(AdmissionRejected) as late:
+        await slow.acquire()
+    assert late.value.reason == "deadline"
+
+    holder.release()
+    (await queued).release()
+
+
+@pytest.mark.asyncio
+async def test_queue_wait_timeout_and_cancellation():
+    """Waiters that time out or disconnect leave the queue cleanly"""
+    controller = _controller(max_concurrency=1, deadline=0.05, service_time=0.01)
+    holder = await controller.acquire()
+
+    with pytest.raises(AdmissionRejected) as timeout:
+        await controller.acquire()
+    assert timeout.value.reason == "timeout"
+
+    waiter = asyncio.create_task(controller.acquire())
+    await asyncio.sleep(0.01)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    assert controller.stats()["queued"] == 0
+    holder.release()
+    assert controller.stats()["active"] == 0
+
+
+def test_priority_header_can_only_lower_priority():
+    """Clients may downgrade to bulk but never upgrade"""
+    assert parse_priority("bulk", Priority.INTERACTIVE) == Priority.BULK
+    assert parse_priority("interactive", Priority.DEFAULT) == Priority.DEFAULT
+    assert parse_priority("nonsense", Priority.DEFAULT) == Priority.DEFAULT
+
+
+def test_overloaded_endpoint_returns_429_with_retry_after():
+    """A rejected admission becomes 429 + Retry-After"""
+    async def reject(priority):
+        raise AdmissionRejected("queue_full", 3)
+
+    with patch.object(settings, "llm_mode", "dummy"):
+        with patch("src.api.routes.admission_controller.acquire", side_effect=reject):
+            response = client.post("/api/v1/chat", json={"messages": [{"role": "user", "content": "Hi"}]})
+
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "3"
@@ -68,7 +68,7 @@ async def test_bedrock_generate_text():
     }
     
     with patch.object(service, 'client') as mock_client:
-        with patch('asyncio.to_thread', new_callable=AsyncMock) as mock_thread:
+        with patch('src.services.bedrock_service.BedrockExecutor.run', new_callable=AsyncMock) as mock_thread:
             mock_thread.return_value = mock_response
             
             request = LLMRequest(prompt="Test prompt")
@@ -96,7 +96,7 @@ async def test_bedrock_chat():
     }
     
     with patch.object(service, 'client') as mock_client:
-        with patch('asyncio.to_thread', new_callable=AsyncMock) as mock_thread:
+        with patch('src.services.bedrock_service.BedrockExecutor.run', new_callable=AsyncMock) as mock_thread:
             mock_thread.return_value = mock_response
             
             request = ChatRequest(
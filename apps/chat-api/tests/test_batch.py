@@ -0,0 +1,153 @@
+"""
+Tests for batch generation with bounded parallelism
+"""
+import asyncio
+import json
+import time
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.main import app
+from src.models.llm import LLMRequest, LLMResponse
+from src.services.admission import AdmissionController, Priority
+from src.services.batch_runner import BatchRunner
+
+
+class FakeService:
+    """Answers after ``delays[prompt]`` seconds; prompts containing 'fail' raise"""
+
+    def __init__(self, delays=None, default_delay=0.01):
+        self.delays = delays or {}
+        self.default_delay = default_delay
+        self.in_flight = 0
+        self.peak = 0
+
+    async def generate_text(self, request):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delays.get(request.prompt, self.default_delay))
+            if "fail" in request.prompt:
+                raise Exception("Bedrock API error [ValidationException]: bad prompt")
+            return LLMResponse(text=f"answer to {request.prompt}", model_id="m",
+                               usage={"input_tokens": 3, "output_tokens": 7, "total_tokens": 10})
+        finally:
+            self.in_flight -= 1
+
+
+async def _collect(runner, service, prompts, **kwargs):
+    return [e async for e in runner.run(service, [LLMRequest(prompt=p) for p in prompts], **kwargs)]
+
+
+@pytest.mark.asyncio
+async def test_results_stream_as_they_complete():
+    """Fast items are emitted before slow ones and the summary aggregates usage"""
+    service = FakeService({"slow": 0.2, "fast": 0.01})
+    events = await _collect(BatchRunner(max_concurrency=4), service, ["slow", "fast"], labels=["AAPL", "MSFT"])
+
+    assert [(e["event"], e["data"].get("ticker")) for e in events] == [
+        ("result", "MSFT"), ("result", "AAPL"), ("summary", None)
+    ]
+    summary = events[-1]["data"]
+    assert summary["succeeded"] == 2 and summary["failed"] == 0
+    assert summary["usage"] == {"input_tokens": 6, "output_tokens": 14, "total_tokens": 20}
+
+
+@pytest.mark.asyncio
+async def test_item_errors_do_not_fail_the_batch():
+    """A failing item becomes an error line; the others still succeed"""
+    events = await _collect(BatchRunner(max_concurrency=2), FakeService(), ["a", "fail", "c"])
+
+    errors = [e["data"] for e in events if e["event"] == "error"]
+    assert errors == [{"index": 1, "status": 500, "detail": "Bedrock API error [ValidationException]: bad prompt"}]
+    assert events[-1]["data"]["succeeded"] == 2
+
+
+@pytest.mark.asyncio
+async def test_deadline_cancels_pending_items():
+    """Items still running at the deadline are reported as 504 and cancelled"""
+    service = FakeService({"stuck": 5.0})
+    started = time.monotonic()
+    events = await _collect(BatchRunner(max_concurrency=2, deadline=10.0), service, ["ok", "stuck"], deadline=0.2)
+
+    assert time.monotonic() - started < 1.0
+    assert events[1]["event"] == "error" and events[1]["data"]["status"] == 504
+    assert events[-1]["data"]["timed_out"] == 1
+    await asyncio.sleep(0)
+    assert service.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_throughput_scales_with_concurrency():
+    """Parallelism is bounded by the setting and the client can only lower it"""
+    async def elapsed(concurrency):
+        service = FakeService(default_delay=0.05)
+        started = time.monotonic()
+        await _collect(BatchRunner(max_concurrency=8), service, [str(i) for i in range(16)],
+                       max_concurrency=concurrency)
+        return time.monotonic() - started, service.peak
+
+    serial, serial_peak = await elapsed(1)
+    parallel, parallel_peak = await elapsed(100)
+
+    assert (serial_peak, parallel_peak) == (1, 8)
+    assert parallel < serial / 4
+
+
+@pytest.mark.asyncio
+async def test_items_are_admitted_as_bulk():
+    """Each item takes an admission slot at BULK priority"""
+    admission = AdmissionController(4, 16, {p: 10.0 for p in Priority})
+    await _collect(BatchRunner(max_concurrency=3, admission=admission), FakeService(), ["a", "b", "c"])
+
+    assert admission.admitted == 3
+    assert len(admission._waits[Priority.BULK]) == 3
+    assert admission.stats()["active"] == 0
+
+
+@pytest.mark.asyncio
+async def test_rejected_items_retry_admission_until_the_deadline():
+    """Admission rejections back off and retry instead of failing the item with 429"""
+    admission = AdmissionController(2, 2, {p: 10.0 for p in Priority})
+    with patch.object(admission, "_retry_after", return_value=0):
+        events = await _collect(BatchRunner(max_concurrency=20, admission=admission, retry_backoff=0.01),
+                                FakeService(), [str(i) for i in range(40)])
+        summary = events[-1]["data"]
+        assert summary["succeeded"] == 40 and summary["failed"] == 0
+
+        # Sin deadline para esperar, el rechazo se reporta como 429
+        events = await _collect(BatchRunner(max_concurrency=20, admission=admission, retry_backoff=1.0),
+                                FakeService(default_delay=0.05), [str(i) for i in range(10)], deadline=0.5)
+    errors = [e["data"] for e in events if e["event"] == "error"]
+    assert errors and {e["status"] for e in errors} == {429}
+
+
+def test_batch_endpoint_streams_ndjson():
+    """Template + tickers fan out and come back as NDJSON lines ending in a summary"""
+    client = TestClient(app)
+    with patch("src.api.routes.get_llm_service", return_value=FakeService()):
+        response = client.post("/api/v1/generate/batch", json={
+            "template": {"prompt": "Summarize {ticker} risks"},
+            "tickers": ["AAPL", "NVDA", "TSLA"]
+        })
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(l["ticker"] for l in lines if l["event"] == "result") == ["AAPL", "NVDA", "TSLA"]
+    assert {l["text"] for l in lines if l["event"] == "result"} == {
+        "answer to Summarize AAPL risks", "answer to Summarize NVDA risks", "answer to Summarize TSLA risks"
+    }
+    assert lines[-1]["event"] == "summary" and lines[-1]["items"] == 3
+
+
+def test_batch_endpoint_validates_shape():
+    """Either items or template + tickers, and no more than the configured maximum"""
+    client = TestClient(app)
+    assert client.post("/api/v1/generate/batch", json={"template": {"prompt": "x"}}).status_code == 422
+    assert client.post("/api/v1/generate/batch", json={"items": []}).status_code == 422
+    with patch("src.api.routes.settings.batch_max_items", 2):
+        response = client.post("/api/v1/generate/batch", json={"items": [{"prompt": "a"}] * 3})
+    assert response.status_code == 400
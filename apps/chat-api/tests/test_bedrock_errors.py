@@ -21,7 +21,7 @@ async def test_bedrock_empty_response(mock_bedrock_client, mock_bedrock_stream_r
     
     mock_response = mock_bedrock_stream_response(response_data)
     
-    with patch('src.services.bedrock_service.asyncio.to_thread', new_callable=AsyncMock) as mock_thread:
+    with patch('src.services.bedrock_service.BedrockExecutor.run', new_callable=AsyncMock) as mock_thread:
         mock_thread.return_value = mock_response
         
         service = BedrockService()
@@ -40,7 +40,7 @@ async def test_bedrock_malformed_response(mock_bedrock_client):
     mock_body = io.BytesIO(b'invalid json')
     mock_response = {'body': mock_body}
     
-    with patch('src.services.bedrock_service.asyncio.to_thread', new_callable=AsyncMock) as mock_thread:
+    with patch('src.services.bedrock_service.BedrockExecutor.run', new_callable=AsyncMock) as mock_thread:
         mock_thread.return_value = mock_response
         
         service = BedrockService()
@@ -77,7 +77,7 @@ async def test_bedrock_api_error(mock_bedrock_client):
     """Test handling of Bedrock API errors"""
     
     # Simulate Bedrock error
-    with patch('src.services.bedrock_service.asyncio.to_thread', new_callable=AsyncMock) as mock_thread:
+    with patch('src.services.bedrock_service.BedrockExecutor.run', new_callable=AsyncMock) as mock_thread:
         error_response = {
             'Error': {
                 'Code': 'ValidationException', 
@@ -100,7 +100,7 @@ async def test_bedrock_api_error(mock_bedrock_client):
 async def test_bedrock_timeout(mock_bedrock_client):
     """Test timeout handling"""
     
-    with patch('src.services.bedrock_service.asyncio.to_thread', new_callable=AsyncMock) as mock_thread:
+    with patch('src.services.bedrock_service.BedrockExecutor.run', new_callable=AsyncMock) as mock_thread:
         mock_thread.side_effect = asyncio.TimeoutError("Request timeout")
         
         service = BedrockService()
@@ -117,7 +117,7 @@ async def test_bedrock_invalid_model_parameters():
     with patch('src.services.bedrock_service.boto3.client') as mock_boto_client:
         mock_client_instance = mock_boto_client.return_value
         
-        with patch('src.services.bedrock_service.asyncio.to_thread', new_callable=AsyncMock) as mock_thread:
+        with patch('src.services.bedrock_service.BedrockExecutor.run', new_callable=AsyncMock) as mock_thread:
             error_response = {
                 'Error': {
                     'Code': 'ValidationException',
@@ -142,7 +142,7 @@ async def test_bedrock_network_error(mock_bedrock_client):
     """Test network connectivity issues"""
     from botocore.exceptions import EndpointConnectionError
     
-    with patch('src.services.bedrock_service.asyncio.to_thread', new_callable=AsyncMock) as mock_thread:
+    with patch('src.services.bedrock_service.BedrockExecutor.run', new_callable=AsyncMock) as mock_thread:
         mock_thread.side_effect = EndpointConnectionError(
             endpoint_url="https://bedrock-runtime.us-east-1.amazonaws.com"
         )
@@ -0,0 +1,92 @@
+"""
+Tests for the dedicated Bedrock execution pool
+"""
+import asyncio
+import threading
+import pytest
+from unittest.mock import patch
+
+from src.core.config import settings
+from src.services.bedrock_executor import BedrockExecutor
+from src.services.bedrock_service import BedrockService
+
+
+@pytest.mark.asyncio
+async def test_executor_runs_calls_and_tracks_stats():
+    """Completed calls are counted with wait and run times"""
+    executor = BedrockExecutor(max_workers=2)
+
+    results = await asyncio.gather(*(executor.run(lambda x=i: x * 2) for i in range(5)))
+
+    assert results == [0, 2, 4, 6, 8]
+    stats = executor.stats()
+    assert stats["completed"] == 5
+    assert stats["queued"] == 0
+    assert stats["running"] == 0
+    assert stats["max_workers"] == 2
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_executor_reports_queue_depth():
+    """Calls beyond the worker count wait in the queue"""
+    executor = BedrockExecutor(max_workers=1)
+    release = threading.Event()
+
+    tasks = [asyncio.create_task(executor.run(release.wait)) for _ in range(3)]
+    await asyncio.sleep(0.05)
+
+    stats = executor.stats()
+    assert stats["running"] == 1
+    assert stats["queued"] == 2
+
+    release.set()
+    await asyncio.gather(*tasks)
+    assert executor.stats()["queued"] == 0
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_executor_cancelled_waiter_leaves_queue():
+    """Cancelling a queued call removes it from the queue depth"""
+    executor = BedrockExecutor(max_workers=1)
+    release = threading.Event()
+
+    running = asyncio.create_task(executor.run(release.wait))
+    queued = asyncio.create_task(executor.run(lambda: "never"))
+    await asyncio.sleep(0.05)
+    queued.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await queued
+
+    assert executor.stats()["queued"] == 0
+    release.set()
+    await running
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_executor_counts_failures():
+    """Exceptions propagate and are counted as failed calls"""
+    executor = BedrockExecutor(max_workers=1)
+
+    def boom():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        await executor.run(boom)
+
+    assert executor.stats()["failed"] == 1
+    executor.shutdown()
+
+
+def test_client_pool_matches_worker_count():
+    """The botocore connection pool is sized to the worker count"""
+    with patch.object(settings, "bedrock_max_workers", 7):
+        with patch('src.services.bedrock_service.boto3.client') as mock_boto_client:
+            service = BedrockService()
+
+    config = mock_boto_client.call_args[1]["config"]
+    assert config.max_pool_connections == 7
+    assert config.tcp_keepalive is True
+    assert service.executor.max_workers == 7
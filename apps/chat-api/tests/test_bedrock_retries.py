@@ -0,0 +1,153 @@
+"""
+Tests for Bedrock retries, backoff deadlines and hedged requests
+"""
+import asyncio
+import random
+import pytest
+from unittest.mock import patch, AsyncMock
+from botocore.exceptions import ClientError, EndpointConnectionError
+
+from src.services.bedrock_service import BedrockService
+from src.services.retry_policy import RetryPolicy, error_code
+from src.models.llm import LLMRequest
+
+
+def _client_error(code):
+    return ClientError({'Error': {'Code': code, 'Message': f'{code} happened'}}, 'InvokeModel')
+
+
+def _fast_policy(**overrides):
+    options = dict(base_delay=0.001, max_delay=0.005, deadline=5.0, rng=random.Random(7))
+    options.update(overrides)
+    return RetryPolicy(**options)
+
+
+def test_error_code_resolution():
+    """Codes come from ClientError responses or botocore connection errors"""
+    assert error_code(_client_error("ThrottlingException")) == "ThrottlingException"
+    assert error_code(EndpointConnectionError(endpoint_url="https://x")) == "EndpointConnectionError"
+    assert error_code(ValueError("nope")) is None
+
+
+@pytest.mark.asyncio
+async def test_throttling_is_retried_until_success(mock_bedrock_client, mock_bedrock_response,
+                                                   mock_bedrock_stream_response):
+    """A throttled call succeeds on a later attempt"""
+    with patch('src.services.bedrock_service.BedrockExecutor.run', new_callable=AsyncMock) as mock_run:
+        mock_run.side_effect = [
+            _client_error("ThrottlingException"),
+            _client_error("ModelNotReadyException"),
+            mock_bedrock_stream_response(mock_bedrock_response)
+        ]
+
+        service = BedrockService()
+        service.retry_policy = _fast_policy()
+        response = await service.generate_text(LLMRequest(prompt="Test"))
+
+        assert response.text == "Test response"
+        assert mock_run.await_count == 3
+        stats = service.retry_policy.stats()
+        assert stats["retries"] == {"ThrottlingException": 1, "ModelNotReadyException": 1}
+
+
+@pytest.mark.asyncio
+async def test_retry_budget_is_per_error_code(mock_bedrock_client):
+    """Exhausting a code's budget surfaces the Bedrock error"""
+    with patch('src.services.bedrock_service.BedrockExecutor.run', new_callable=AsyncMock) as mock_run:
+        mock_run.side_effect = _client_error("ThrottlingException")
+
+        service = BedrockService()
+        service.retry_policy = _fast_policy(budgets={"ThrottlingException": 2})
+
+        with pytest.raises(Exception, match=r"Bedrock API error \[ThrottlingException\]"):
+            await service.generate_text(LLMRequest(prompt="Test"))
+
+        assert mock_run.await_count == 3
+        assert service.retry_policy.stats()["exhausted"] == {"ThrottlingException": 1}
+
+
+@pytest.mark.asyncio
+async def test_non_retryable_errors_fail_fast(mock_bedrock_client):
+    """Validation errors are not retried"""
+    with patch('src.services.bedrock_service.BedrockExecutor.run', new_callable=AsyncMock) as mock_run:
+        mock_run.side_effect = _client_error("ValidationException")
+
+        service = BedrockService()
+        service.retry_policy = _fast_policy()
+
+        with pytest.raises(Exception, match="Bedrock API error"):
+            await service.generate_text(LLMRequest(prompt="Test"))
+
+        assert mock_run.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_backoff_respects_total_deadline(mock_bedrock_client):
+    """No retry is attempted when the next backoff would overrun the deadline"""
+    with patch('src.services.bedrock_service.BedrockExecutor.run', new_callable=AsyncMock) as mock_run:
+        mock_run.side_effect = _client_error("ThrottlingException")
+
+        service = BedrockService()
+        service.retry_policy = _fast_policy(base_delay=1.0, max_delay=5.0, deadline=0.5)
+
+        with pytest.raises(Exception, match="ThrottlingException"):
+            await service.generate_text(LLMRequest(prompt="Test"))
+
+        assert mock_run.await_count == 1
+        assert service.retry_policy.stats()["deadline_exceeded"] == 1
+
+
+@pytest.mark.asyncio
+async def test_slow_attempt_times_out_at_deadline():
+    """A hanging attempt is abandoned when the deadline passes"""
+    policy = _fast_policy(deadline=0.05)
+
+    async def hang():
+        await asyncio.sleep(1)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await policy.call(hang)
+    assert policy.stats()["deadline_exceeded"] == 1
+
+
+@pytest.mark.asyncio
+async def test_hedged_request_wins_over_slow_primary():
+    """After the p95 delay a duplicate is sent and the faster one is used"""
+    policy = _fast_policy(hedging=True, hedge_min_samples=5)
+    for _ in range(5):
+        await policy.call(lambda: asyncio.sleep(0.01, result="warm"))
+
+    delays = iter([0.5, 0.01])
+    cancelled = []
+
+    async def attempt():
+        delay = next(delays)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled.append(delay)
+            raise
+        return f"slept {delay}"
+
+    result = await policy.call(attempt)
+
+    assert result == "slept 0.01"
+    assert cancelled == [0.5]
+    assert policy.stats()["hedges_sent"] == 1
+    assert policy.stats()["hedges_won"] == 1
+
+
+@pytest.mark.asyncio
+async def test_no_hedge_before_enough_samples():
+    """Hedging stays off until the latency distribution is known"""
+    policy = _fast_policy(hedging=True, hedge_min_samples=50)
+    calls = []
+
+    async def attempt():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return "ok"
+
+    assert await policy.call(attempt) == "ok"
+    assert len(calls) == 1
+    assert policy.stats()["hedges_sent"] == 0
@@ -15,7 +15,7 @@ async def test_bedrock_generate_text_success(mock_bedrock_client, mock_bedrock_r
     
     mock_response = mock_bedrock_stream_response(mock_bedrock_response)
     
-    with patch('src.services.bedrock_service.asyncio.to_thread', new_callable=AsyncMock) as mock_thread:
+    with patch('src.services.bedrock_service.BedrockExecutor.run', new_callable=AsyncMock) as mock_thread:
         mock_thread.return_value = mock_response
         
         service = BedrockService()
@@ -54,7 +54,7 @@ async def test_bedrock_chat_success(mock_bedrock_client, sample_chat_request,
     
     mock_response = mock_bedrock_stream_response(response_data)
     
-    with patch('src.services.bedrock_service.asyncio.to_thread', new_callable=AsyncMock) as mock_thread:
+    with patch('src.services.bedrock_service.BedrockExecutor.run', new_callable=AsyncMock) as mock_thread:
         mock_thread.return_value = mock_response
         
         service = BedrockService()
@@ -81,7 +81,7 @@ async def test_bedrock_multiple_messages_chat(mock_bedrock_client, mock_bedrock_
     
     mock_response = mock_bedrock_stream_response(response_data)
     
-    with patch('src.services.bedrock_service.asyncio.to_thread', new_callable=AsyncMock) as mock_thread:
+    with patch('src.services.bedrock_service.BedrockExecutor.run', new_callable=AsyncMock) as mock_thread:
         mock_thread.return_value = mock_response
         
         service = BedrockService()
@@ -118,7 +118,7 @@ async def test_bedrock_different_models(mock_bedrock_client, mock_bedrock_respon
     
     mock_response = mock_bedrock_stream_response(mock_bedrock_response)
     
-    with patch('src.services.bedrock_service.asyncio.to_thread', new_callable=AsyncMock) as mock_thread:
+    with patch('src.services.bedrock_service.BedrockExecutor.run', new_callable=AsyncMock) as mock_thread:
         mock_thread.return_value = mock_response
         
         service = BedrockService()
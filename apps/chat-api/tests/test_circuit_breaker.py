@@ -0,0 +1,199 @@
+"""
+Tests for the per-model circuit breaker and its degraded-mode fallbacks
+"""
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+
+from src.main import app
+from src.models.llm import ChatMessage, ChatRequest, ChatResponse, LLMRequest, LLMResponse
+from src.services.circuit_breaker import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitBreakerLayer, CircuitBreakers
+)
+from src.services.dummy_llm_service import DummyLLMService, SimulationProfile
+from src.services.embeddings import HashingEmbedder
+from src.services.model_router import ModelRouter, ModelRouterLayer
+from src.services.response_cache import MemoryCacheBackend, ResponseCache, ResponseCacheLayer, request_cache_key
+from src.services.semantic_cache import SemanticCache, SemanticCacheLayer
+from src.services.session_store import SessionLayer, SessionStore
+
+HAIKU = "anthropic.claude-3-haiku-20240307-v1:0"
+SONNET = "anthropic.claude-3-sonnet-20240229-v1:0"
+
+
+class FlakyService:
+    """Falla (error del servicio) para los modelos en ``down``; sin model_id usa HAIKU"""
+
+    def __init__(self, down=()):
+        self.down = set(down)
+        self.calls = []
+
+    async def generate_text(self, request):
+        model_id = request.model_id or HAIKU
+        self.calls.append(model_id)
+        if model_id in self.down:
+            raise Exception("Bedrock API error [ServiceUnavailableException]: unavailable")
+        return LLMResponse(text=f"from {model_id}", model_id=model_id, usage={})
+
+    async def chat(self, request):
+        response = await self.generate_text(LLMRequest(prompt=request.messages[-1].content, model_id=request.model_id))
+        return ChatResponse(message=ChatMessage(role="assistant", content=response.text), model_id=response.model_id)
+
+    async def generate_text_stream(self, request):
+        model_id = request.model_id or HAIKU
+        self.calls.append(model_id)
+        if model_id in self.down:
+            raise Exception("Bedrock API error [ServiceUnavailableException]: unavailable")
+        yield {"event": "delta", "data": {"text": "hi"}}
+        yield {"event": "usage", "data": {"model_id": model_id, "usage": {}}}
+
+
+def _breakers():
+    return CircuitBreakers(window=4, min_calls=4, error_threshold=0.5, open_seconds=30.0)
+
+
+def _open(breakers, model_id):
+    for _ in range(4):
+        breakers.get(model_id).record(0.1, ok=False)
+    assert breakers.get(model_id).state == OPEN
+
+
+def test_opens_on_errors_and_recovers_through_half_open():
+    """Closed -> open on the error rate, half-open after the cooldown, then closed or re-opened"""
+    breaker = CircuitBreaker("m", window=4, min_calls=4, error_threshold=0.5, open_seconds=30.0)
+    for ok in (True, False, True):
+        breaker.record(0.1, ok=ok)
+    assert breaker.state == CLOSED  # menos de min_calls
+    breaker.record(0.1, ok=False)
+    assert breaker.state == OPEN and not breaker.allow()
+
+    with patch("src.services.circuit_breaker.time.monotonic", return_value=breaker._opened_at + 31):
+        assert breaker.state == HALF_OPEN
+        assert breaker.allow() and not breaker.allow()  # una sola sonda
+        breaker.record(0.1, ok=False)
+        assert breaker.state == OPEN
+
+    with patch("src.services.circuit_breaker.time.monotonic", return_value=breaker._opened_at + 31):
+        assert breaker.allow()
+        breaker.record(0.1, ok=True)
+    assert breaker.state == CLOSED and breaker.stats()["calls_in_window"] == 0
+    assert breaker.transitions == {CLOSED: 1, OPEN: 2, HALF_OPEN: 2}
+
+
+def test_slow_calls_open_the_circuit():
+    """Mostly slow calls open the circuit even without errors"""
+    breaker = CircuitBreaker("m", window=4, min_calls=4, slow_call_seconds=1.0, slow_call_threshold=0.75)
+    for latency in (2.0, 2.0, 0.1, 2.0):
+        breaker.record(latency, ok=True)
+    assert breaker.state == OPEN
+
+
+@pytest.mark.asyncio
+async def test_client_errors_do_not_trip_the_circuit():
+    """Request errors (ValidationException) propagate without counting against the model"""
+    class Invalid:
+        async def generate_text(self, request):
+            raise Exception("Bedrock API error [ValidationException]: bad request")
+
+    breakers = _breakers()
+    layer = CircuitBreakerLayer(Invalid(), breakers, HAIKU, fallback_models=[SONNET])
+    for _ in range(5):
+        with pytest.raises(Exception, match="ValidationException"):
+            await layer.generate_text(LLMRequest(prompt="hi"))
+
+    assert breakers.get(HAIKU).state == CLOSED
+    assert breakers.get(HAIKU).stats()["calls_in_window"] == 0
+
+
+@pytest.mark.asyncio
+async def test_falls_back_to_another_model():
+    """A failing model is answered by the next model with a closed circuit"""
+    inner = FlakyService(down={HAIKU})
+    layer = CircuitBreakerLayer(inner, _breakers(), HAIKU, fallback_models=[HAIKU, SONNET])
+
+    response = await layer.generate_text(LLMRequest(prompt="hi"))
+
+    assert response.text == f"from {SONNET}"
+    assert response.usage["degraded"] == {"reason": "error", "model_id": HAIKU, "fallback": f"model:{SONNET}"}
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_uses_cache_then_dummy():
+    """With every model open: a cached answer if there is one, otherwise the dummy service"""
+    breakers = _breakers()
+    _open(breakers, HAIKU)
+    _open(breakers, SONNET)
+    cache = ResponseCache(MemoryCacheBackend(10), ttl_seconds=60, max_temperature=0.3)
+    inner = FlakyService()
+    dummy = DummyLLMService(SimulationProfile(ttft_median_ms=0.0, ttft_sigma=0.0, tokens_per_second=0.0))
+    layer = CircuitBreakerLayer(inner, breakers, HAIKU, fallback_models=[SONNET], cache=cache, dummy=dummy)
+
+    cached = LLMResponse(text="cached answer", model_id=HAIKU, usage={})
+    await cache.backend.set(request_cache_key(LLMRequest(prompt="AAPL"), HAIKU, 0.7), cached.model_dump_json(), 60)
+
+    response = await layer.generate_text(LLMRequest(prompt="AAPL"))
+    assert response.text == "cached answer"
+    assert response.usage["degraded"]["fallback"] == "cache"
+    assert response.usage["degraded"]["reason"] == "circuit_open"
+
+    response = await layer.generate_text(LLMRequest(prompt="MSFT"))
+    assert response.usage["degraded"]["fallback"] == "dummy"
+    assert response.model_id == "dummy-claude-3-haiku"  # los tokens no se cargan al modelo caido
+    assert inner.calls == []  # los circuitos abiertos no llegan al modelo
+
+
+@pytest.mark.asyncio
+async def test_stream_falls_back_before_the_first_event():
+    """A stream that fails to open is served by the fallback model, marked in the usage event"""
+    breakers = _breakers()
+    inner = FlakyService(down={HAIKU})
+    layer = CircuitBreakerLayer(inner, breakers, HAIKU, fallback_models=[SONNET])
+
+    events = [event async for event in layer.generate_text_stream(LLMRequest(prompt="hi"))]
+
+    assert events[0] == {"event": "delta", "data": {"text": "hi"}}
+    assert events[-1]["data"]["model_id"] == SONNET
+    assert events[-1]["data"]["usage"]["degraded"]["fallback"] == f"model:{SONNET}"
+    assert breakers.get(SONNET).stats()["calls_in_window"] == 1
+
+
+def test_health_reports_open_circuits():
+    """/health lists the circuits and turns degraded while one is open"""
+    breakers = _breakers()
+    with patch("src.api.routes.circuit_breakers", breakers):
+        client = TestClient(app)
+        breakers.get(HAIKU).record(0.1, ok=True)
+        assert client.get("/api/v1/health").json()["status"] == "healthy"
+
+        _open(breakers, SONNET)
+        body = client.get("/api/v1/health").json()
+
+    assert body["status"] == "degraded"
+    assert body["circuits"] == {HAIKU: CLOSED, SONNET: OPEN}
+
+
+@pytest.mark.asyncio
+async def test_degraded_answers_are_not_stored_and_count_as_router_failures():
+    """Caches and sessions skip fallback answers; the router records its chosen model as failed"""
+    inner = FlakyService(down={HAIKU})
+    router = ModelRouter(HAIKU, SONNET)
+    dummy = DummyLLMService(SimulationProfile(ttft_median_ms=0.0, ttft_sigma=0.0, tokens_per_second=0.0))
+    service = ModelRouterLayer(CircuitBreakerLayer(inner, _breakers(), HAIKU, dummy=dummy), router)
+    service = ResponseCacheLayer(service, ResponseCache(MemoryCacheBackend(10), 60, 1.0), HAIKU, 0.0)
+    service = SemanticCacheLayer(service, SemanticCache(HashingEmbedder(256), 10, 0.85, 600, 60), HAIKU)
+    sessions = SessionStore()
+    service = SessionLayer(service, sessions)
+
+    response = await service.generate_text(LLMRequest(prompt="AAPL quote"))
+    assert response.usage["degraded"]["fallback"] == "dummy"
+    assert response.usage["routing"]["estimated_cost_usd"] is None
+    assert router.health[HAIKU].error_rate > 0
+
+    reply = await service.chat(ChatRequest(messages=[ChatMessage(role="user", content="AAPL quote")], session_id="s1"))
+    assert "degraded" in reply.usage
+    assert await sessions.load("s1") == []
+
+    inner.down.clear()  # el modelo se recupera: nada del respaldo se vuelve a servir
+    response = await service.generate_text(LLMRequest(prompt="AAPL quote"))
+    assert response.text in (f"from {HAIKU}", f"from {SONNET}") and "degraded" not in response.usage
+    assert response.usage["cache"] == "miss"
@@ -0,0 +1,97 @@
+"""
+Tests for the simulated Bedrock behaviour of DummyLLMService
+"""
+import asyncio
+import statistics
+
+import pytest
+from botocore.exceptions import ClientError, ReadTimeoutError
+
+from src.models.llm import ChatMessage, ChatRequest, LLMRequest
+from src.services.dummy_llm_service import DummyLLMService, SimulationProfile
+from src.services.retry_policy import error_code
+
+
+def _fast(**overrides):
+    params = {"ttft_median_ms": 1.0, "tokens_per_second": 20000.0}
+    params.update(overrides)
+    return SimulationProfile(**params)
+
+
+@pytest.mark.asyncio
+async def test_same_seed_same_run():
+    """A fixed seed reproduces answers, lengths and failures"""
+    async def run(seed):
+        service = DummyLLMService(_fast(throttle_rate=0.3), seed=seed)
+        results = []
+        for i in range(10):
+            try:
+                response = await service.generate_text(LLMRequest(prompt=f"question {i}"))
+                results.append((response.text, response.usage["output_tokens"]))
+            except ClientError as e:
+                results.append(error_code(e))
+        return results
+
+    first = await run(7)
+    assert first == await run(7)
+    assert first != await run(8)
+    assert "ThrottlingException" in first
+
+
+def test_latency_and_length_distributions():
+    """TTFT and output length follow the configured log-normal medians"""
+    service = DummyLLMService(SimulationProfile(ttft_median_ms=400, output_tokens_median=150), seed=1)
+    plans = [service._plan(None) for _ in range(3000)]
+
+    assert statistics.median(p.ttft for p in plans) == pytest.approx(0.4, rel=0.05)
+    assert statistics.median(p.output_tokens for p in plans) == pytest.approx(150, rel=0.05)
+    assert max(p.ttft for p in plans) > 3 * 0.4  # cola larga
+    assert max(service._plan(20).output_tokens for _ in range(100)) == 20
+
+
+@pytest.mark.asyncio
+async def test_stream_is_token_by_token():
+    """Streaming emits one delta per token, bounded by max_tokens"""
+    service = DummyLLMService(_fast(output_tokens_median=500), seed=3)
+    request = ChatRequest(messages=[ChatMessage(role="user", content="Analyze NVDA")], max_tokens=40)
+
+    events = [event async for event in service.chat_stream(request)]
+
+    deltas = [e for e in events if e["event"] == "delta"]
+    assert len(deltas) == 40
+    assert events[-1]["data"]["usage"]["output_tokens"] == 40
+    assert service.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_injected_errors_look_like_bedrock():
+    """Throttles and timeouts are raised as the botocore errors Bedrock produces"""
+    throttled = DummyLLMService(_fast(throttle_rate=1.0), seed=1)
+    with pytest.raises(ClientError) as info:
+        await throttled.generate_text(LLMRequest(prompt="hi"))
+    assert error_code(info.value) == "ThrottlingException"
+
+    timing_out = DummyLLMService(_fast(timeout_rate=1.0, timeout_seconds=0.01), seed=1)
+    with pytest.raises(ReadTimeoutError):
+        async for _ in timing_out.generate_text_stream(LLMRequest(prompt="hi")):
+            pass
+    assert timing_out.stats()["timeouts"] == 1
+    assert timing_out.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_quotas_throttle_instead_of_queueing():
+    """Calls over the concurrency or per-minute quota are rejected immediately"""
+    service = DummyLLMService(_fast(ttft_median_ms=50, max_concurrency=2), seed=1)
+    results = await asyncio.gather(
+        *(service.generate_text(LLMRequest(prompt=str(i))) for i in range(3)), return_exceptions=True
+    )
+    assert sum(isinstance(r, ClientError) for r in results) == 1
+    assert service.stats()["peak_in_flight"] == 2
+
+    limited = DummyLLMService(_fast(requests_per_minute=2), seed=1)
+    await limited.generate_text(LLMRequest(prompt="a"))
+    await limited.generate_text(LLMRequest(prompt="b"))
+    with pytest.raises(ClientError):
+        await limited.generate_text(LLMRequest(prompt="c"))
+    assert limited.stats()["throttled"] == 1
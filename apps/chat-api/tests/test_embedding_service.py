@@ -0,0 +1,137 @@
+"""
+Tests for the micro-batching embedding service
+"""
+import asyncio
+import io
+import json
+import numpy as np
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from src.core.metrics import registry
+from src.services.embedding_service import BedrockEmbeddingBackend, EmbeddingService, LocalEmbeddingBackend
+from src.services.embeddings import HashingEmbedder
+from src.services.retry_policy import RetryPolicy
+
+
+class CountingBackend(LocalEmbeddingBackend):
+    def __init__(self, fail=False):
+        super().__init__(HashingEmbedder(32))
+        self.batches = []
+        self.fail = fail
+
+    async def embed_batch(self, texts):
+        self.batches.append(list(texts))
+        await asyncio.sleep(0.001)
+        if self.fail:
+            raise RuntimeError("backend down")
+        return await super().embed_batch(texts)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_batch():
+    """Calls inside the wait window go out as a single backend call"""
+    backend = CountingBackend()
+    service = EmbeddingService(backend, max_batch_size=64, max_wait_ms=5, name="shared_batch_test")
+    texts = [f"question {i}" for i in range(10)]
+
+    vectors = await service.embed_many(texts)
+
+    assert len(backend.batches) == 1
+    assert sorted(backend.batches[0]) == sorted(texts)
+    np.testing.assert_allclose(vectors[3], HashingEmbedder(32).embed("question 3"))
+    stats = service.stats()
+    assert stats["batch_size"]["buckets"]["<=16"] == 1
+    assert stats["wait_ms"]["count"] == 10
+
+    body = registry.render()
+    assert 'chat_api_embedding_batch_size_bucket{service="shared_batch_test",le="16"} 1' in body
+    assert 'chat_api_embedding_wait_seconds_count{service="shared_batch_test"} 10' in body
+    assert 'chat_api_embedding_backend_duration_seconds_count{service="shared_batch_test"} 1' in body
+
+
+@pytest.mark.asyncio
+async def test_batches_are_bounded_by_size():
+    """A full batch is sent immediately without waiting for the timer"""
+    backend = CountingBackend()
+    service = EmbeddingService(backend, max_batch_size=4, max_wait_ms=1000)
+
+    await asyncio.wait_for(service.embed_many([f"t{i}" for i in range(8)]), timeout=0.5)
+
+    assert [len(batch) for batch in backend.batches] == [4, 4]
+
+
+@pytest.mark.asyncio
+async def test_repeated_texts_use_lru_and_dedupe():
+    """Duplicates in a batch are embedded once; later repeats hit the LRU"""
+    backend = CountingBackend()
+    service = EmbeddingService(backend, max_wait_ms=1, cache_size=2)
+
+    await service.embed_many(["AAPL price", "AAPL price", "MSFT price"])
+    await service.embed("AAPL price")
+
+    assert backend.batches == [["AAPL price", "MSFT price"]]
+    assert service.stats()["cache_hits"] == 1
+
+    await service.embed("NVDA price")
+    await service.embed("AAPL price")
+    assert len(backend.batches) == 2
+
+
+@pytest.mark.asyncio
+async def test_backend_errors_reach_every_caller():
+    """A failed batch fails all of its callers"""
+    service = EmbeddingService(CountingBackend(fail=True), max_wait_ms=1)
+
+    results = await asyncio.gather(service.embed("a"), service.embed("b"), return_exceptions=True)
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert service.stats()["errors"] == 1
+
+
+def _bedrock(payloads):
+    bedrock = MagicMock()
+    bedrock.retry_policy = RetryPolicy()
+    bedrock.executor.run = AsyncMock(side_effect=[{"body": io.BytesIO(json.dumps(p).encode())} for p in payloads])
+    bedrock._process_response = lambda response: json.loads(response["body"].read())
+    return lambda: bedrock
+
+
+@pytest.mark.asyncio
+async def test_bedrock_backends():
+    """Cohere gets one batched call; Titan one call per text"""
+    cohere = BedrockEmbeddingBackend(_bedrock([{"embeddings": [[1.0, 0.0], [0.0, 1.0]]}]), "cohere.embed-v4:0", 2)
+    vectors = await cohere.embed_batch(["a", "b"])
+    assert vectors.shape == (2, 2)
+    body = json.loads(cohere.bedrock.executor.run.await_args[1]["body"])
+    assert body["texts"] == ["a", "b"] and body["output_dimension"] == 2
+
+    titan = BedrockEmbeddingBackend(_bedrock([{"embedding": [1.0, 0.0]}, {"embedding": [0.0, 1.0]}]),
+                                    "amazon.titan-embed-text-v2:0", 2)
+    vectors = await titan.embed_batch(["a", "b"])
+    assert vectors.shape == (2, 2)
+    assert titan.bedrock.executor.run.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_bedrock_dimension_mismatch_is_rejected():
+    """Fixed-size models must match embedding_dim; wrongly sized responses fail loudly"""
+    with pytest.raises(ValueError, match="1024-dim"):
+        BedrockEmbeddingBackend(_bedrock([]), "cohere.embed-english-v3", 512)
+
+    titan = BedrockEmbeddingBackend(_bedrock([{"embedding": [1.0, 0.0, 0.0]}]), "amazon.titan-embed-text-v2:0", 2)
+    with pytest.raises(Exception, match="expected dim 2"):
+        await titan.embed_batch(["a"])
+
+
+@pytest.mark.asyncio
+async def test_flushed_batches_are_referenced_until_done():
+    """In-flight batch tasks are kept alive and dropped once finished"""
+    service = EmbeddingService(CountingBackend(), max_batch_size=2, max_wait_ms=50)
+    calls = [asyncio.ensure_future(service.embed(text)) for text in ("a", "b")]
+    await asyncio.sleep(0)
+
+    assert len(service._tasks) == 1
+    await asyncio.gather(*calls)
+    await asyncio.sleep(0)
+    assert not service._tasks
@@ -0,0 +1,110 @@
+"""
+Tests for the vectorized financial ratio engine
+"""
+import math
+
+import numpy as np
+import pytest
+
+from src.models.llm import LLMRequest
+from src.services.context_builder import ContextBuilder
+from src.services.financial_ratios import RATIOS, FinancialAnalysis, StatementStore, compute_ratios, format_ratios
+
+
+ROWS = [
+    {"symbol": "AAPL", "period": "2023", "revenue": "383e9", "cost_of_revenue": "214e9", "operating_income": "114e9",
+     "net_income": "97e9", "total_assets": "352e9", "total_liabilities": "290e9", "total_equity": "62e9",
+     "current_assets": "143e9", "current_liabilities": "145e9", "cash": "30e9", "inventory": "6e9",
+     "total_debt": "111e9", "operating_cash_flow": "110e9", "capital_expenditure": "-11e9", "interest_expense": "4e9"},
+    {"symbol": "AAPL", "period": "2024", "revenue": "391e9", "gross_profit": "180e9", "operating_income": "123e9",
+     "net_income": "94e9", "total_assets": "365e9", "total_liabilities": "308e9", "total_equity": "57e9",
+     "current_assets": "153e9", "current_liabilities": "176e9", "cash": "30e9", "inventory": "7e9",
+     "total_debt": "106e9", "operating_cash_flow": "118e9", "capital_expenditure": "-9e9"},
+    {"symbol": "NEWCO", "period": "2024", "revenue": "0", "net_income": "-5e6", "total_equity": "0"},
+]
+
+
+@pytest.fixture
+def analysis():
+    return FinancialAnalysis(StatementStore.from_rows(ROWS))
+
+
+def test_store_is_company_by_period_by_item():
+    """Rows land in one dense array; missing companies/periods stay NaN"""
+    store = StatementStore.from_rows(ROWS)
+
+    assert store.companies == ["AAPL", "NEWCO"]
+    assert store.periods == ["2023", "2024"]
+    assert store.item("revenue")[0].tolist() == [383e9, 391e9]
+    assert math.isnan(store.item("revenue")[1, 0])
+
+
+def test_ratios_match_hand_computed_values(analysis):
+    """Margins, liquidity, leverage and growth come out of one pass"""
+    r = analysis.ratios("AAPL")
+
+    assert r["period"] == "2024"
+    assert r["gross_margin"] == pytest.approx(180 / 391)
+    assert r["operating_margin"] == pytest.approx(123 / 391)
+    assert r["quick_ratio"] == pytest.approx((153 - 7) / 176)
+    assert r["debt_to_equity"] == pytest.approx(106 / 57)
+    assert r["free_cash_flow"] == pytest.approx(109e9)
+    assert r["revenue_growth"] == pytest.approx(391 / 383 - 1)
+    assert r["net_margin_change"] == pytest.approx(94 / 391 - 97 / 383)
+    assert r["interest_coverage"] is None
+
+    first = analysis.ratios("AAPL", "2023")
+    # Sin gross_profit se deriva de revenue - cost_of_revenue
+    assert first["gross_margin"] == pytest.approx((383 - 214) / 383)
+    assert first["revenue_growth"] is None
+
+
+def test_zero_denominators_are_missing_not_infinite(analysis):
+    """Division by zero yields missing values, never inf"""
+    values = compute_ratios(analysis.store)
+
+    assert not np.isinf(values).any()
+    assert analysis.ratios("NEWCO")["net_margin"] is None
+    assert analysis.ratios("NEWCO")["roe"] is None
+    assert analysis.ratios("ZZZZ") is None
+    assert values.shape == (2, 2, len(RATIOS))
+    assert analysis.ratios("AAPL", "1999") is None
+
+
+def test_growth_compares_periods_of_the_same_kind():
+    """Annual and quarterly periods are ordered by year/quarter and only compared with their own kind"""
+    rows = [
+        {"symbol": "ACME", "period": "2024", "revenue": "440"},
+        {"symbol": "ACME", "period": "2023Q4", "revenue": "100"},
+        {"symbol": "ACME", "period": "2023", "revenue": "400"},
+        {"symbol": "ACME", "period": "2024Q1", "revenue": "110"},
+    ]
+    analysis = FinancialAnalysis(StatementStore.from_rows(rows))
+
+    assert analysis.store.periods == ["2023Q4", "2023", "2024Q1", "2024"]
+    assert analysis.ratios("ACME")["period"] == "2024"
+    assert analysis.ratios("ACME")["revenue_growth"] == pytest.approx(0.10)
+    assert analysis.ratios("ACME", "2024Q1")["revenue_growth"] == pytest.approx(0.10)
+    assert analysis.ratios("ACME", "2023")["revenue_growth"] is None
+
+
+def test_summary_is_compact_and_exact(analysis):
+    """The prompt line carries formatted, precomputed figures"""
+    line = format_ratios(analysis.ratios("AAPL"))
+
+    assert line.startswith("AAPL 2024: revenue $391.0B, net income $94.0B, gross margin 46.0%")
+    assert "D/E 1.86" in line
+    assert "revenue growth 2.1%" in line
+    assert "net margin chg -1.3pp" in line
+
+
+@pytest.mark.asyncio
+async def test_context_includes_ratios_for_mentioned_tickers(analysis):
+    """generate_text context carries the ratio line for tickers in the prompt"""
+    builder = ContextBuilder(financials=analysis)
+
+    context, report = await builder.build(LLMRequest(prompt="How leveraged is AAPL?"))
+
+    assert "Financial ratios (precomputed" in context
+    assert "AAPL 2024:" in context
+    assert report["ratios"] == 1
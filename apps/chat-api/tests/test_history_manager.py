@@ -0,0 +1,127 @@
+"""
+Tests for token-budgeted chat history compaction
+"""
+import pytest
+from unittest.mock import AsyncMock
+
+from src.models.llm import ChatRequest, ChatResponse, ChatMessage
+from src.services.bedrock_service import BedrockService
+from src.services.history_manager import (
+    HistoryCompactionLayer, HistoryManager, SUMMARY_HEADER, message_tokens
+)
+
+
+def _conversation(turns, words=40):
+    messages = []
+    for i in range(turns):
+        messages.append(ChatMessage(role="user", content=f"Question {i} about AAPL. " + "detail " * words))
+        messages.append(ChatMessage(role="assistant", content=f"Answer {i} on margins. " + "context " * words))
+    return messages
+
+
+def _manager(**overrides):
+    options = dict(token_budget=300, keep_recent_messages=2, summary_max_tokens=120)
+    options.update(overrides)
+    return HistoryManager(**options)
+
+
+def test_short_history_is_untouched():
+    """Conversations inside the budget are sent as-is"""
+    request = ChatRequest(messages=_conversation(1, words=5))
+    compacted, report = _manager().compact(request)
+
+    assert compacted is request
+    assert report["tokens_saved"] == 0
+    assert report["summary_cache"] is None
+
+
+def test_old_turns_are_summarized_within_budget():
+    """Older turns become a system summary and recent ones stay verbatim"""
+    messages = _conversation(6)
+    manager = _manager()
+    compacted, report = manager.compact(ChatRequest(messages=messages))
+
+    sent = compacted.messages
+    assert sent[0].role == "system"
+    assert sent[0].content.startswith(SUMMARY_HEADER)
+    assert sent[1].role == "user"
+    assert sent[-2:] == messages[-2:]
+    assert sum(message_tokens(m) for m in sent) <= manager.token_budget
+    assert report["tokens_saved"] > 0
+    assert report["summary_cache"] == "miss"
+
+
+def test_summary_is_extended_incrementally():
+    """The next turn only summarizes the newly evicted messages"""
+    manager = _manager()
+    messages = _conversation(6)
+    first, _ = manager.compact(ChatRequest(messages=messages))
+
+    messages = messages + _conversation(1)
+    second, report = manager.compact(ChatRequest(messages=messages))
+
+    assert report["summary_cache"] == "extended"
+    old_lines = first.messages[0].content.splitlines()
+    new_lines = second.messages[0].content.splitlines()
+    assert new_lines[:len(old_lines)] == old_lines
+    assert manager.stats()["summary_misses"] == 1
+    assert manager.stats()["summary_extended"] == 1
+
+
+def test_edited_history_rebuilds_summary():
+    """A changed prefix invalidates the cached summary"""
+    manager = _manager()
+    messages = _conversation(6)
+    manager.compact(ChatRequest(messages=messages))
+
+    edited = [messages[0]] + [ChatMessage(role="assistant", content="Rewritten.")] + messages[2:]
+    _, report = manager.compact(ChatRequest(messages=edited))
+
+    assert report["summary_cache"] == "miss"
+
+
+def test_conversations_with_the_same_opening_keep_separate_summaries():
+    """Two chats that both start with "Hello" do not evict each other's summary"""
+    manager = _manager()
+    hello = [ChatMessage(role="user", content="Hello"), ChatMessage(role="assistant", content="Hi, how can I help?")]
+    first = hello + _conversation(6)
+    second = hello + [ChatMessage(role="user", content=m.content.replace("AAPL", "MSFT")) if m.role == "user" else m
+                      for m in _conversation(6)]
+
+    manager.compact(ChatRequest(messages=first))
+    manager.compact(ChatRequest(messages=second))
+    _, first_report = manager.compact(ChatRequest(messages=first + _conversation(1)))
+    _, second_report = manager.compact(ChatRequest(messages=second + _conversation(1)))
+
+    assert (first_report["summary_cache"], second_report["summary_cache"]) == ("extended", "extended")
+    assert manager.stats()["conversations"] == 2
+
+
+def test_bedrock_body_moves_system_messages():
+    """System messages (e.g. the summary) go into Claude's system field"""
+    service = BedrockService.__new__(BedrockService)
+    request = ChatRequest(messages=[
+        ChatMessage(role="system", content="Summary"),
+        ChatMessage(role="user", content="Hi")
+    ])
+
+    body = service._build_chat_body(request)
+
+    assert body["system"] == "Summary"
+    assert body["messages"] == [{"role": "user", "content": "Hi"}]
+
+
+@pytest.mark.asyncio
+async def test_layer_reports_tokens_saved():
+    """Savings are reported in ChatResponse.usage"""
+    inner = AsyncMock()
+    inner.chat.return_value = ChatResponse(
+        message=ChatMessage(role="assistant", content="ok"), model_id="m", usage={}
+    )
+    layer = HistoryCompactionLayer(inner, _manager())
+
+    response = await layer.chat(ChatRequest(messages=_conversation(6)))
+
+    sent = inner.chat.await_args[0][0]
+    assert len(sent.messages) < 12
+    assert response.usage["history"]["tokens_saved"] > 0
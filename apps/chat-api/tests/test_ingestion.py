@@ -0,0 +1,96 @@
+"""
+Tests for the incremental document ingestion pipeline
+"""
+from src.ingestion.documents import chunk_pages, iter_pages, path_metadata
+from src.ingestion.pipeline import run_ingestion
+from src.retrieval.retriever import load_retriever
+
+
+def _write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+def _corpus(root):
+    _write(root / "AAPL" / "2023" / "10-K.txt",
+           "Apple services revenue reached a record.\f" + "iPhone sales were strong in every region. " * 60)
+    _write(root / "MSFT_10-Q_2024.txt", "Azure cloud revenue grew thirty percent. " * 40)
+    _write(root / "NVDA_annual_report_2023.htm",
+           "<html><style>p {}</style><body><p>Data center revenue surged.</p></body></html>")
+
+
+def test_path_metadata():
+    """Ticker, year and document type come from the path"""
+    assert path_metadata("filings/AAPL/2023/10-K.pdf") == {"ticker": "AAPL", "year": 2023, "doc_type": "10-K"}
+    assert path_metadata("MSFT_10q_2024.txt") == {"ticker": "MSFT", "year": 2024, "doc_type": "10-Q"}
+    assert path_metadata("notes.txt") == {"ticker": None, "year": None, "doc_type": None}
+
+
+def test_chunks_overlap_and_track_pages(tmp_path):
+    """Chunks respect the size, overlap the previous one and keep their page"""
+    _write(tmp_path / "doc.txt", "alpha " * 50 + "\f" + "beta " * 50)
+    pages = list(iter_pages(str(tmp_path / "doc.txt")))
+    chunks = list(chunk_pages(iter(pages), chunk_chars=120, overlap_chars=30))
+
+    assert len(pages) == 2
+    assert all(len(text) <= 130 for text, _ in chunks)
+    assert chunks[0][0].split()[-4:] == chunks[1][0].split()[:4]
+    assert chunks[-1][1] == 2
+    assert "beta" in chunks[-1][0]
+
+
+def test_rerun_only_processes_changed_documents(tmp_path):
+    """Unchanged files are skipped; edits and deletions are picked up"""
+    docs, index = tmp_path / "docs", str(tmp_path / "index")
+    _corpus(docs)
+
+    first = run_ingestion(str(docs), index, workers=2, dim=64, chunk_chars=300, overlap_chars=50)
+    assert first["processed"] == 3
+    assert first["pages_processed"] >= 4
+    assert first["pages_per_sec_per_core"] > 0
+
+    second = run_ingestion(str(docs), index, workers=2, dim=64, chunk_chars=300, overlap_chars=50)
+    assert second["processed"] == 0
+    assert second["skipped"] == 3
+    assert not second["index_rebuilt"]
+
+    _write(docs / "MSFT_10-Q_2024.txt", "Azure revenue slowed this quarter.")
+    (docs / "NVDA_annual_report_2023.htm").unlink()
+    third = run_ingestion(str(docs), index, workers=2, dim=64, chunk_chars=300, overlap_chars=50)
+    assert third["processed"] == 1
+    assert third["documents"] == 2
+
+    retriever = load_retriever(index)
+    hits = retriever.search("Azure revenue", top_k=5, tickers=["MSFT"])
+    assert [h["text"] for h in hits] == ["Azure revenue slowed this quarter."]
+    assert hits[0]["year"] == 2024 and hits[0]["doc_type"] == "10-Q"
+    assert retriever.search("data center", top_k=5, tickers=["NVDA"]) == []
+
+
+def test_cache_cleanup_only_removes_stale_shards(tmp_path):
+    """A user-chosen cache dir keeps unrelated files and subdirectories"""
+    docs, cache = tmp_path / "docs", tmp_path / "mydata"
+    _corpus(docs)
+    cache.mkdir()
+    (cache / "notes.txt").write_text("keep me")
+    (cache / "reports").mkdir()
+
+    run_ingestion(str(docs), str(tmp_path / "index"), cache_dir=str(cache), workers=1, dim=64)
+    (docs / "NVDA_annual_report_2023.htm").unlink()
+    run_ingestion(str(docs), str(tmp_path / "index"), cache_dir=str(cache), workers=1, dim=64)
+
+    assert (cache / "notes.txt").read_text() == "keep me"
+    assert (cache / "reports").is_dir()
+    assert len(list(cache.glob("*.jsonl"))) == 2
+
+
+def test_failed_documents_are_reported(tmp_path):
+    """A broken document does not stop the rest of the batch"""
+    docs = tmp_path / "docs"
+    _corpus(docs)
+    _write(docs / "broken.pdf", "not a pdf")
+
+    report = run_ingestion(str(docs), str(tmp_path / "index"), workers=1, dim=64)
+
+    assert "broken.pdf" in report["failed"]
+    assert report["processed"] == 3
@@ -0,0 +1,122 @@
+"""
+Tests for the Prometheus metrics and the /metrics endpoint
+"""
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from botocore.exceptions import ClientError
+from fastapi.testclient import TestClient
+
+from src.core import tracing
+from src.core.metrics import MetricsRegistry, bedrock_errors, stage, stage_latency, tokens
+from src.main import app
+from src.models.llm import LLMRequest
+from src.services.bedrock_service import BedrockService
+
+
+def test_render_prometheus_text_format():
+    """Counters, gauges and cumulative histogram buckets in exposition format"""
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests", ("route",))
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    registry.callback_gauge("queue_depth", "Queue", lambda: {("a",): 3}, ("pool",))
+
+    requests.labels('/x"y').inc()
+    requests.labels('/x"y').inc(2)
+    for value in (0.05, 0.1, 0.5, 7):
+        latency.observe(value)
+
+    lines = registry.render().splitlines()
+
+    assert "# TYPE requests_total counter" in lines
+    assert 'requests_total{route="/x\\"y"} 3' in lines
+    assert 'latency_seconds_bucket{le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{le="1"} 3' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in lines
+    assert "latency_seconds_count 4" in lines
+    assert 'queue_depth{pool="a"} 3' in lines
+
+
+def test_metrics_endpoint_labels_by_route_template():
+    """Requests are labelled by route template and show their stages and tokens"""
+    client = TestClient(app)
+    with patch('src.api.routes.settings.llm_mode', 'dummy'):
+        assert client.post("/api/v1/generate", json={"prompt": "What is the P/E of AAPL?"}).status_code == 200
+    client.get("/api/v1/sessions/abc123")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert 'chat_api_http_requests_total{route="/api/v1/generate",method="POST",status="200"}' in body
+    assert 'route="/api/v1/sessions/{session_id}"' in body
+    assert "abc123" not in body
+    assert 'chat_api_stage_duration_seconds_count{stage="admission"}' in body
+    assert 'chat_api_stage_duration_seconds_count{stage="serialize"}' in body
+    assert 'chat_api_llm_tokens_total{model="' in body
+    assert 'chat_api_admission_requests{state="queued"}' in body
+
+
+def test_request_span_is_named_by_route_template():
+    """The span name uses the route template, not the raw path with the session id"""
+    spans = []
+
+    def start_as_current_span(name):
+        context = MagicMock()
+        context.__enter__.return_value = span = MagicMock()
+        spans.append(span)
+        return context
+
+    with patch("src.core.metrics.tracer", MagicMock(start_as_current_span=start_as_current_span)):
+        TestClient(app).get("/api/v1/sessions/abc123")
+
+    span = spans[0]
+    span.update_name.assert_called_once_with("GET /api/v1/sessions/{session_id}")
+    span.set_attribute.assert_any_call("http.route", "/api/v1/sessions/{session_id}")
+
+
+def test_unknown_tracing_exporter_disables_tracing():
+    """A typo in TRACING_EXPORTER logs a warning instead of failing the import"""
+    with patch.object(tracing.settings, "tracing_exporter", "jaeger"):
+        assert tracing._build_tracer() is None
+
+
+@pytest.mark.asyncio
+async def test_bedrock_calls_record_stages_tokens_and_errors(mock_bedrock_client, mock_bedrock_response,
+                                                             mock_bedrock_stream_response):
+    """Successful calls add tokens per model; failures are counted by error code"""
+    model = "metrics-test-model"
+    error = ClientError({"Error": {"Code": "ValidationException", "Message": "bad"}}, "InvokeModel")
+    errors_before = bedrock_errors.labels("ValidationException").value
+    bedrock_before = stage_latency.labels("bedrock").counts[:]
+
+    with patch('src.services.bedrock_service.BedrockExecutor.run', new_callable=AsyncMock) as mock_run:
+        mock_run.return_value = mock_bedrock_stream_response(mock_bedrock_response)
+        service = BedrockService()
+        await service.generate_text(LLMRequest(prompt="Test", model_id=model))
+
+        mock_run.side_effect = error
+        with pytest.raises(Exception, match="ValidationException"):
+            await service.generate_text(LLMRequest(prompt="Test", model_id=model))
+
+    assert tokens.labels(model, "input").value == 10
+    assert tokens.labels(model, "output").value == 5
+    assert bedrock_errors.labels("ValidationException").value == errors_before + 1
+    assert sum(stage_latency.labels("bedrock").counts) == sum(bedrock_before) + 2
+
+
+def test_stage_records_observation_and_span():
+    """A stage adds one latency observation and, with tracing, opens a span with its name"""
+    before = sum(stage_latency.labels("stage_test").counts)
+    tracer = MagicMock()
+
+    with patch("src.core.metrics.tracer", tracer):
+        with stage("stage_test"):
+            pass
+
+    assert sum(stage_latency.labels("stage_test").counts) == before + 1
+    tracer.start_as_current_span.assert_called_once_with("stage_test")
+    span_context = tracer.start_as_current_span.return_value
+    span_context.__enter__.assert_called_once()
+    span_context.__exit__.assert_called_once()
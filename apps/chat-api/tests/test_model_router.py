@@ -0,0 +1,129 @@
+"""
+Tests for latency- and cost-aware model routing
+"""
+import pytest
+from unittest.mock import AsyncMock
+
+from src.models.llm import LLMRequest, LLMResponse, ChatRequest, ChatMessage
+from src.services.model_router import ModelRouter, ModelRouterLayer, estimate_cost
+
+HAIKU = "anthropic.claude-3-haiku-20240307-v1:0"
+SONNET = "anthropic.claude-3-sonnet-20240229-v1:0"
+
+
+def _router(**overrides):
+    options = dict(long_prompt_chars=500, deep_conversation_turns=4)
+    options.update(overrides)
+    return ModelRouter(HAIKU, SONNET, **options)
+
+
+def _echo_service():
+    service = AsyncMock()
+    service.generate_text.side_effect = lambda request: LLMResponse(
+        text="ok", model_id=request.model_id, usage={"input_tokens": 1000, "output_tokens": 200}
+    )
+    return service
+
+
+@pytest.mark.parametrize("prompt,tier,reason", [
+    ("What's the price of AAPL today?", "fast", "quick_lookup"),
+    ("Analyze Apple's income statement and cash flow", "strong", "analysis"),
+    ("How did MSFT revenue change between 2019 and 2023?", "strong", "analysis"),
+    ("x" * 600, "strong", "long_prompt"),
+    ("Tell me something about investing", "fast", "default"),
+])
+def test_classify_generate(prompt, tier, reason):
+    """Prompts are classified by length and question type"""
+    assert _router().classify(LLMRequest(prompt=prompt)) == (tier, reason)
+
+
+def test_deep_conversation_goes_to_strong_model():
+    """Long chat histories are routed to the strong model"""
+    messages = [ChatMessage(role="user" if i % 2 == 0 else "assistant", content="hi") for i in range(5)]
+    assert _router().classify(ChatRequest(messages=messages)) == ("strong", "deep_conversation")
+
+
+def test_unhealthy_model_is_avoided():
+    """A high error EWMA on the preferred model switches to the alternative"""
+    router = _router()
+    for _ in range(5):
+        router.record(HAIKU, 0.5, ok=False)
+
+    decision = router.choose(LLMRequest(prompt="AAPL quote"))
+
+    assert decision["model_id"] == SONNET
+    assert decision["adjustment"] == "preferred_unhealthy"
+
+
+def test_slow_strong_model_falls_back_to_fast():
+    """The strong model is skipped while it exceeds its latency budget"""
+    router = _router(strong_latency_budget=2.0)
+    router.record(SONNET, 5.0, ok=True)
+
+    decision = router.choose(LLMRequest(prompt="Compare NVDA and AMD margins"))
+
+    assert decision["model_id"] == HAIKU
+    assert decision["adjustment"] == "strong_over_latency_budget"
+
+
+@pytest.mark.asyncio
+async def test_layer_sets_model_and_reports_routing():
+    """The chosen model is sent upstream and the decision appears in usage"""
+    service = _echo_service()
+    router = _router()
+    layer = ModelRouterLayer(service, router)
+
+    response = await layer.generate_text(LLMRequest(prompt="Analyze the balance sheet of AAPL"))
+
+    assert service.generate_text.await_args[0][0].model_id == SONNET
+    routing = response.usage["routing"]
+    assert routing["model_id"] == SONNET
+    assert routing["tier"] == "strong"
+    assert routing["estimated_cost_usd"] == estimate_cost(SONNET, {"input_tokens": 1000, "output_tokens": 200})
+    assert router.stats()["models"][SONNET]["requests"] == 1
+
+
+@pytest.mark.asyncio
+async def test_client_selected_model_is_respected():
+    """An explicit model_id bypasses classification"""
+    service = _echo_service()
+    layer = ModelRouterLayer(service, _router())
+
+    response = await layer.generate_text(LLMRequest(prompt="Analyze everything", model_id=HAIKU))
+
+    assert response.usage["routing"]["reason"] == "client_selected"
+    assert service.generate_text.await_args[0][0].model_id == HAIKU
+
+
+@pytest.mark.asyncio
+async def test_failures_feed_error_ewma():
+    """Upstream errors are recorded against the routed model"""
+    service = AsyncMock()
+    service.generate_text.side_effect = Exception("Bedrock API error [ThrottlingException]")
+    router = _router()
+    layer = ModelRouterLayer(service, router)
+
+    with pytest.raises(Exception):
+        await layer.generate_text(LLMRequest(prompt="AAPL quote"))
+
+    assert router.stats()["models"][HAIKU]["error_rate_ewma"] > 0
+
+
+@pytest.mark.parametrize("record,prompt,preferred", [
+    (lambda router: [router.record(HAIKU, 0.5, ok=False) for _ in range(3)], "AAPL quote", HAIKU),
+    (lambda router: router.record(SONNET, 5.0, ok=True), "Compare NVDA and AMD margins", SONNET),
+])
+def test_diverted_model_recovers_through_probes(record, prompt, preferred):
+    """A fraction of diverted traffic still probes the preferred model, so it recovers once healthy"""
+    router = _router(strong_latency_budget=2.0, probe_every=10)
+    record(router)
+
+    chosen = []
+    for _ in range(100):
+        decision = router.choose(LLMRequest(prompt=prompt))
+        chosen.append(decision["model_id"])
+        router.record(decision["model_id"], 0.5, ok=True)
+
+    assert chosen[0] != preferred
+    assert chosen[-10:] == [preferred] * 10
+    assert any(key.endswith(":probe") for key in router.stats()["decisions"])
@@ -0,0 +1,87 @@
+"""
+Tests for the token-budgeted prompt packer
+"""
+import json
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from src.models.llm import LLMRequest
+from src.services.bedrock_service import BedrockService
+from src.services.context_builder import ContextBuilder
+from src.services.financial_ratios import FinancialAnalysis, StatementStore
+from src.services.prompt_packer import ContextPiece, PromptPacker, count_tokens
+
+
+FILLER = "Revenue grew on strong demand for accelerators while gross margin expanded and operating costs held flat. "
+
+
+def test_count_tokens_is_approximate_and_cached():
+    """Short words are one token, long words and numbers are split; repeats hit the cache"""
+    assert count_tokens("What is AAPL's P/E?") == 9
+    assert count_tokens("internationalization 1234567") == 3 + 3
+
+    before = count_tokens.cache_info().hits
+    count_tokens(FILLER)
+    count_tokens(FILLER)
+    assert count_tokens.cache_info().hits > before
+
+
+def test_pack_prefers_high_scores_within_budget():
+    """Pieces are chosen by score under the budget and keep their input order"""
+    pieces = [
+        ContextPiece("[A] " + FILLER * 3, 0.2, "chunk"),
+        ContextPiece("[B] " + "Cash flow " * 30, 0.9, "chunk"),
+        ContextPiece("[C] " + "Debt load " * 30, 0.5, "chunk"),
+    ]
+    base = PromptPacker().pack("q", [])[1]["prompt_tokens"]
+    # Caben B y C pero no A
+    packer = PromptPacker(max_input_tokens=base + sum(count_tokens(p.text) + 2 for p in pieces[1:]) + 10)
+
+    selected, report = packer.pack("q", pieces)
+
+    assert [p.text[:3] for p in selected] == ["[B]", "[C]"]
+    assert report["dropped"] == 1
+    assert report["context_tokens"] <= report["budget_tokens"]
+
+
+def test_pack_drops_overlapping_chunks():
+    """A chunk that mostly repeats an already chosen one is skipped"""
+    packer = PromptPacker(max_input_tokens=10000)
+    first = FILLER * 4
+    overlapping = FILLER * 3 + "Guidance was raised for the next quarter."
+
+    selected, report = packer.pack("q", [ContextPiece(first, 0.9, "chunk"), ContextPiece(overlapping, 0.8, "chunk")])
+
+    assert len(selected) == 1
+    assert report["duplicates"] == 1
+
+
+def test_max_tokens_is_derived_unless_requested():
+    """max_tokens grows with the context used, up to a cap; an explicit value wins"""
+    packer = PromptPacker(min_output_tokens=300, max_output_tokens=400, output_tokens_per_piece=50)
+
+    assert packer.max_tokens_for(0) == 300
+    assert packer.max_tokens_for(1) == 350
+    assert packer.max_tokens_for(5) == 400
+    assert packer.max_tokens_for(5, requested=2000) == 2000
+
+
+@pytest.mark.asyncio
+async def test_bedrock_body_uses_packed_context(mock_bedrock_client, mock_bedrock_response,
+                                                mock_bedrock_stream_response):
+    """The generate call carries the derived max_tokens and usage reports the budget"""
+    analysis = FinancialAnalysis(StatementStore.from_rows([{"symbol": "NVDA", "period": "2024", "revenue": "60e9"}]))
+    with patch('src.services.bedrock_service.BedrockExecutor.run', new_callable=AsyncMock) as mock_run:
+        mock_run.return_value = mock_bedrock_stream_response(mock_bedrock_response)
+
+        service = BedrockService()
+        service.context_builder = ContextBuilder(financials=analysis, packer=PromptPacker(min_output_tokens=256))
+        response = await service.generate_text(LLMRequest(prompt="NVDA revenue?"))
+
+    body = json.loads(mock_run.await_args[1]["body"])
+    retrieval = response.usage["retrieval"]
+    assert body["max_tokens"] == 256 + 64
+    assert "NVDA 2024: revenue $60.0B" in body["messages"][0]["content"]
+    assert retrieval["pieces"] == 1
+    assert 0 < retrieval["context_tokens"] <= retrieval["budget_tokens"]
@@ -0,0 +1,109 @@
+"""
+Tests for the in-memory quote snapshot and its background refresh
+"""
+import asyncio
+import pytest
+
+from src.models.llm import LLMRequest
+from src.services.context_builder import ContextBuilder
+from src.services.quote_snapshot import CsvQuoteProvider, QuoteStore, format_quote
+
+
+CSV = """symbol,last_price,change,change_pct,volume,market_cap,pe_ratio,high_52w,low_52w
+AAPL,175.0,3.43,2.0,52000000,2.7e12,25.4,199.6,164.1
+MSFT,410.5,-1.2,-0.29,21000000,3.05e12,35.1,,
+NVDA,880.0,12.0,1.38,40000000,2.2e12,,974.0,
+"""
+
+
+@pytest.fixture
+def quotes_csv(tmp_path):
+    path = tmp_path / "quotes.csv"
+    path.write_text(CSV)
+    return path
+
+
+@pytest.mark.asyncio
+async def test_csv_snapshot_is_columnar(quotes_csv):
+    """Rows become NumPy columns; empty cells are missing values"""
+    store = QuoteStore(CsvQuoteProvider(str(quotes_csv)))
+    snapshot = await store.refresh()
+
+    assert len(snapshot) == 3
+    assert snapshot.columns["last_price"].tolist() == [175.0, 410.5, 880.0]
+    assert snapshot.get("MSFT")["high_52w"] is None
+    assert [q["symbol"] for q in store.quotes_for(["NVDA", "AAPL", "ZZZZ"])] == ["AAPL", "NVDA"]
+    assert format_quote(snapshot.get("AAPL")) == (
+        "AAPL: $175.00 (+2.00%), P/E 25.4, market cap $2,700.0B, 52w range $164.10-$199.60"
+    )
+
+
+@pytest.mark.asyncio
+async def test_refresh_publishes_copy_on_write(quotes_csv):
+    """Readers keep a consistent snapshot while a new one is published"""
+    store = QuoteStore(CsvQuoteProvider(str(quotes_csv)))
+    old = await store.refresh()
+
+    quotes_csv.write_text(CSV.replace("175.0,", "180.0,"))
+    new = await store.refresh()
+
+    assert old.get("AAPL")["last_price"] == 175.0
+    assert new.get("AAPL")["last_price"] == 180.0
+    assert store.snapshot is new
+
+
+@pytest.mark.asyncio
+async def test_failed_refresh_keeps_last_snapshot(quotes_csv):
+    """Provider errors are counted and the previous data keeps being served"""
+    store = QuoteStore(CsvQuoteProvider(str(quotes_csv)))
+    await store.refresh()
+    quotes_csv.unlink()
+
+    with pytest.raises(FileNotFoundError):
+        await store.refresh()
+
+    assert store.snapshot.get("AAPL") is not None
+    assert store.stats()["refresh_errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_background_refresh_and_staleness(quotes_csv):
+    """The background task refreshes periodically and reports staleness"""
+    store = QuoteStore(CsvQuoteProvider(str(quotes_csv)), refresh_interval=0.01, max_staleness=3600)
+    store.start()
+    await asyncio.sleep(0.05)
+    stats = store.stats()
+    await store.stop()
+
+    assert stats["running"]
+    assert stats["refreshes"] >= 2
+    assert stats["staleness_seconds"] >= 0
+    assert not stats["stale"]
+    assert not store.stats()["running"]
+
+
+@pytest.mark.asyncio
+async def test_metric_values_report_snapshot_age(quotes_csv):
+    """The /metrics gauge gets the data age and the time since the last publish"""
+    store = QuoteStore(CsvQuoteProvider(str(quotes_csv)))
+    assert store.metric_values() == {}
+
+    await store.refresh()
+    values = store.metric_values()
+
+    assert set(values) == {("data",), ("refresh",)}
+    assert values[("data",)] >= values[("refresh",)] >= 0
+
+
+@pytest.mark.asyncio
+async def test_context_includes_only_mentioned_tickers(quotes_csv):
+    """generate_text context carries quotes for the tickers in the prompt"""
+    store = QuoteStore(CsvQuoteProvider(str(quotes_csv)))
+    await store.refresh()
+    builder = ContextBuilder(quotes=store)
+
+    context, report = await builder.build(LLMRequest(prompt="Is AAPL expensive?"))
+
+    assert "AAPL: $175.00" in context
+    assert "MSFT" not in context
+    assert report["quotes"] == 1
@@ -0,0 +1,123 @@
+"""
+Tests for the exact-match response cache
+"""
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from src.models.llm import LLMRequest, LLMResponse, ChatRequest, ChatResponse, ChatMessage
+from src.services.response_cache import (
+    MemoryCacheBackend, ResponseCache, ResponseCacheLayer, request_cache_key
+)
+
+
+def _service():
+    service = AsyncMock()
+    service.generate_text.side_effect = lambda request: LLMResponse(
+        text=f"answer to {request.prompt}", model_id="m", usage={"output_tokens": 3}
+    )
+    service.chat.side_effect = lambda request: ChatResponse(
+        message=ChatMessage(role="assistant", content="hi"), model_id="m", usage={}
+    )
+    return service
+
+
+def _layer(service, max_entries=16, ttl=60.0, max_temperature=0.2):
+    cache = ResponseCache(MemoryCacheBackend(max_entries), ttl, max_temperature)
+    return ResponseCacheLayer(service, cache, "default-model", 0.7), cache
+
+
+def test_cache_key_normalizes_prompt():
+    """Whitespace and case differences share a key; parameters do not"""
+    a = LLMRequest(prompt="What is  AAPL P/E?", temperature=0.0)
+    b = LLMRequest(prompt=" what is aapl p/e? ", temperature=0.0)
+    c = LLMRequest(prompt="What is AAPL P/E?", temperature=0.0, max_tokens=50)
+    d = LLMRequest(prompt="What is AAPL P/E?", temperature=0.0, model_id="default-model")
+
+    assert request_cache_key(a, "default-model", 0.7) == request_cache_key(b, "default-model", 0.7)
+    assert request_cache_key(a, "default-model", 0.7) != request_cache_key(c, "default-model", 0.7)
+    assert request_cache_key(a, "default-model", 0.7) == request_cache_key(d, "default-model", 0.7)
+
+
+@pytest.mark.asyncio
+async def test_generate_hit_after_miss():
+    """The second identical deterministic request is served from cache"""
+    service = _service()
+    layer, cache = _layer(service)
+
+    first = await layer.generate_text(LLMRequest(prompt="Quote NVDA", temperature=0.0))
+    second = await layer.generate_text(LLMRequest(prompt="quote   nvda", temperature=0.0))
+
+    assert first.usage["cache"] == "miss"
+    assert second.usage["cache"] == "hit"
+    assert second.text == first.text
+    assert service.generate_text.await_count == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_chat_cached_on_message_list():
+    """Chat requests are keyed on the whole normalized message list"""
+    service = _service()
+    layer, _ = _layer(service)
+    messages = [ChatMessage(role="user", content="Hello")]
+
+    await layer.chat(ChatRequest(messages=messages, temperature=0.1))
+    response = await layer.chat(ChatRequest(messages=messages, temperature=0.1))
+    other = await layer.chat(ChatRequest(messages=messages + [ChatMessage(role="user", content="More")], temperature=0.1))
+
+    assert response.usage["cache"] == "hit"
+    assert other.usage["cache"] == "miss"
+    assert service.chat.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_high_temperature_and_bypass_skip_cache():
+    """Non-deterministic temperatures and the bypass flag never use the cache"""
+    service = _service()
+    layer, cache = _layer(service)
+
+    await layer.generate_text(LLMRequest(prompt="Q", temperature=0.7))
+    hot = await layer.generate_text(LLMRequest(prompt="Q", temperature=0.7))
+    await layer.generate_text(LLMRequest(prompt="Q", temperature=0.0))
+    bypass = await layer.generate_text(LLMRequest(prompt="Q", temperature=0.0, bypass_cache=True))
+
+    assert hot.usage["cache"] == "bypass"
+    assert bypass.usage["cache"] == "bypass"
+    assert service.generate_text.await_count == 4
+    assert cache.stats()["bypassed"] == 3
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_lru_eviction_and_ttl():
+    """Entries are evicted by size in LRU order and expire by TTL"""
+    backend = MemoryCacheBackend(max_entries=2)
+    await backend.set("a", "1", ttl=60)
+    await backend.set("b", "2", ttl=60)
+    await backend.get("a")
+    await backend.set("c", "3", ttl=60)
+
+    assert await backend.get("b") is None
+    assert await backend.get("a") == "1"
+    assert backend.evictions == 1
+
+    with patch("src.services.response_cache.time.monotonic", return_value=1e12):
+        assert await backend.get("a") is None
+    assert backend.expirations == 1
+
+
+@pytest.mark.asyncio
+async def test_backend_failure_falls_through():
+    """A failing backend counts an error and still serves the request"""
+    service = _service()
+    backend = AsyncMock()
+    backend.get.side_effect = ConnectionError("redis down")
+    backend.set.side_effect = ConnectionError("redis down")
+    backend.stats = lambda: {"backend": "broken"}
+    cache = ResponseCache(backend, 60, 0.2)
+    layer = ResponseCacheLayer(service, cache, "default-model", 0.7)
+
+    response = await layer.generate_text(LLMRequest(prompt="Q", temperature=0.0))
+
+    assert response.text == "answer to Q"
+    assert cache.stats()["errors"] == 2
@@ -0,0 +1,133 @@
+"""
+Tests for the embedded vector index and prompt context retrieval
+"""
+import numpy as np
+import pytest
+from unittest.mock import patch, AsyncMock
+
+from src.models.llm import LLMRequest
+from src.retrieval.index import FlatIndex, IVFIndex
+from src.retrieval.retriever import load_retriever
+from src.retrieval.store import IndexWriter
+from src.services.bedrock_service import BedrockService
+from src.services.context_builder import ContextBuilder, NO_CONTEXT
+from src.services.embeddings import HashingEmbedder
+
+
+CHUNKS = [
+    {"id": "aapl-2023-1", "text": "Apple iPhone revenue grew in fiscal 2023 driven by services.",
+     "ticker": "AAPL", "year": 2023, "doc_type": "10-K"},
+    {"id": "aapl-2022-1", "text": "Apple iPhone revenue in fiscal 2022 was affected by supply constraints.",
+     "ticker": "AAPL", "year": 2022, "doc_type": "10-K"},
+    {"id": "msft-2023-1", "text": "Microsoft cloud revenue from Azure grew strongly in 2023.",
+     "ticker": "MSFT", "year": 2023, "doc_type": "10-K"},
+    {"id": "nvda-2023-q", "text": "NVIDIA data center revenue surged on demand for AI accelerators.",
+     "ticker": "NVDA", "year": 2023, "doc_type": "10-Q"},
+]
+
+
+@pytest.fixture
+def index_dir(tmp_path):
+    embedder = HashingEmbedder(128)
+    writer = IndexWriter(str(tmp_path / "index"), dim=128)
+    writer.add(embedder.embed_batch([c["text"] for c in CHUNKS[:2]]), CHUNKS[:2])
+    writer.add(embedder.embed_batch([c["text"] for c in CHUNKS[2:]]), CHUNKS[2:])
+    return writer.close()
+
+
+def _clustered(n=4000, dim=32, clusters=40, seed=3):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    vectors = centers[rng.integers(0, clusters, n)] + 0.3 * rng.normal(size=(n, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def test_metadata_filters(index_dir):
+    """Ticker, year and document type filters restrict the results"""
+    retriever = load_retriever(index_dir)
+
+    hits = retriever.search("iPhone revenue", top_k=5, tickers=["AAPL"], years=[2022])
+    assert [h["id"] for h in hits] == ["aapl-2022-1"]
+
+    hits = retriever.search("revenue", top_k=5, doc_type="10-Q")
+    assert [h["id"] for h in hits] == ["nvda-2023-q"]
+
+    assert retriever.search("revenue", top_k=5, tickers=["AAPL"], years=[1999]) == []
+
+
+def test_prompt_filters_are_inferred_and_relaxed(index_dir):
+    """Tickers and years in the prompt become filters, relaxed if empty"""
+    retriever = load_retriever(index_dir)
+
+    result = retriever.search_prompt("How did AAPL iPhone revenue do in 2023?", top_k=3)
+    assert result["filters"] == {"tickers": ["AAPL"], "years": [2023]}
+    assert result["hits"][0]["id"] == "aapl-2023-1"
+
+    result = retriever.search_prompt("MSFT cloud in 2019", top_k=3)
+    assert result["filters"] == {"tickers": ["MSFT"], "years": []}
+
+
+def test_ivf_matches_exact_search():
+    """Probing every list gives exact results; few probes keep high recall"""
+    vectors = _clustered()
+    flat = FlatIndex(vectors)
+    ivf = IVFIndex.build(vectors, nlist=32, seed=1)
+    queries = vectors[:50] + 0.05
+
+    recall = []
+    for query in queries:
+        exact, _ = flat.search(query, 10)
+        everything, _ = ivf.search(query, 10, nprobe=ivf.nlist)
+        assert set(everything) == set(exact)
+        approx, _ = ivf.search(query, 10, nprobe=4)
+        recall.append(len(set(approx) & set(exact)) / 10)
+
+    assert np.mean(recall) >= 0.8
+
+
+def test_float16_memmap_index(tmp_path):
+    """Indexes large enough for IVF are stored as float16 and memory-mapped"""
+    vectors = _clustered(n=2000)
+    writer = IndexWriter(str(tmp_path / "big"), dim=32)
+    writer.add(vectors, [{"id": str(i), "text": f"chunk {i}"} for i in range(len(vectors))])
+    writer.close(ivf_nlist=16)
+
+    retriever = load_retriever(str(tmp_path / "big"))
+
+    assert retriever.index.kind == "ivf"
+    assert isinstance(retriever.index.vectors, np.memmap)
+    assert retriever.index.vectors.dtype == np.float16
+    ids, _ = retriever.index.search(vectors[7], 1, nprobe=16)
+    assert ids[0] == 7
+
+
+@pytest.mark.asyncio
+async def test_context_builder_honors_top_k(index_dir):
+    """top_k from the request bounds the number of chunks in the context"""
+    builder = ContextBuilder(load_retriever(index_dir), default_top_k=4)
+
+    context, report = await builder.build(LLMRequest(prompt="revenue growth", top_k=2))
+
+    assert report["chunks"] == 2
+    assert report["top_k"] == 2
+    assert context.count("[") == 2
+
+    context, report = await ContextBuilder().build(LLMRequest(prompt="anything"))
+    assert context == NO_CONTEXT
+
+
+@pytest.mark.asyncio
+async def test_bedrock_prompt_uses_retrieved_context(index_dir, mock_bedrock_client, mock_bedrock_response,
+                                                     mock_bedrock_stream_response):
+    """The generate prompt carries retrieved chunks instead of a fixed string"""
+    with patch('src.services.bedrock_service.BedrockExecutor.run', new_callable=AsyncMock) as mock_run:
+        mock_run.return_value = mock_bedrock_stream_response(mock_bedrock_response)
+
+        service = BedrockService()
+        service.context_builder = ContextBuilder(load_retriever(index_dir))
+        response = await service.generate_text(LLMRequest(prompt="NVDA data center revenue", top_k=1))
+
+        body = mock_run.await_args[1]["body"]
+        assert "[NVDA 10-Q 2023]" in body
+        assert "Shares of apple" not in body
+        assert response.usage["retrieval"]["chunks"] == 1
@@ -0,0 +1,156 @@
+"""
+Tests for the semantic answer cache
+"""
+import numpy as np
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from src.models.llm import LLMRequest, LLMResponse
+from src.services.embeddings import HashingEmbedder
+from src.services.semantic_cache import SemanticCache, SemanticCacheLayer, extract_tickers
+
+
+def _cache(**overrides):
+    options = dict(capacity=8, threshold=0.85, ttl_seconds=600, ticker_ttl_seconds=30)
+    options.update(overrides)
+    return SemanticCache(HashingEmbedder(256), **options)
+
+
+def _layer(cache):
+    service = AsyncMock()
+    service.generate_text.side_effect = lambda request: LLMResponse(
+        text=f"answer to {request.prompt}", model_id="m", usage={}
+    )
+    return SemanticCacheLayer(service, cache, "default-model"), service
+
+
+def test_embedder_is_deterministic_and_normalized():
+    """Same text gives the same unit vector across instances"""
+    a = HashingEmbedder(128).embed("What's AAPL's P/E?")
+    b = HashingEmbedder(128).embed("What's AAPL's P/E?")
+
+    assert a.dtype == np.float32
+    assert np.array_equal(a, b)
+    assert abs(float(np.linalg.norm(a)) - 1.0) < 1e-5
+
+
+def test_extract_tickers_skips_common_acronyms():
+    """Uppercase acronyms that are not symbols are ignored"""
+    assert extract_tickers("Is $NVDA or AAPL a better buy? I like the CEO and EPS") == {"NVDA", "AAPL"}
+
+
+@pytest.mark.asyncio
+async def test_paraphrase_served_from_cache():
+    """A paraphrased question reuses the stored answer"""
+    layer, service = _layer(_cache())
+
+    first = await layer.generate_text(LLMRequest(prompt="what's AAPL's P/E"))
+    second = await layer.generate_text(LLMRequest(prompt="What is the P/E of AAPL?"))
+
+    assert second.text == first.text
+    assert second.usage["cache"] == "semantic_hit"
+    assert second.usage["semantic_similarity"] >= 0.85
+    assert service.generate_text.await_count == 1
+
+
+@pytest.mark.parametrize("first, second", [
+    ("Summarize the revenue of AAPL for fiscal year 2022 from the annual 10-K filing",
+     "Summarize the revenue of AAPL for fiscal year 2023 from the annual 10-K filing"),
+    ("Summarize how AAPL revenue and margins grew over the last five years",
+     "Summarize how AAPL revenue and margins grew over the last two years"),
+    ("Given its valuation and recent earnings, is AAPL a good buy for a long term investor?",
+     "Given its valuation and recent earnings, is AAPL a good sell for a long term investor?"),
+    ("Summarize the revenue and margins of AAPL reported in Q3 2024 earnings",
+     "Summarize the revenue and margins of AAPL reported in Q4 2024 earnings"),
+])
+@pytest.mark.asyncio
+async def test_near_duplicates_with_different_qualifiers_never_match(first, second):
+    """Years, quarters, counts and buy/sell split the scope even when the embeddings are close"""
+    cache = _cache()
+    layer, service = _layer(cache)
+    embed = lambda text: cache.embedder.embed(cache.embedding_text(text))
+    assert float(embed(first) @ embed(second)) >= cache.threshold
+
+    await layer.generate_text(LLMRequest(prompt=first))
+    other = await layer.generate_text(LLMRequest(prompt=second))
+
+    assert "cache" not in other.usage
+    assert service.generate_text.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_temperature_and_top_k_are_part_of_the_scope():
+    """Same prompt with another temperature or top_k is not served from the cache"""
+    layer, service = _layer(_cache())
+
+    await layer.generate_text(LLMRequest(prompt="What is the P/E of AAPL?", temperature=0.0))
+    await layer.generate_text(LLMRequest(prompt="What is the P/E of AAPL?", temperature=0.9))
+    await layer.generate_text(LLMRequest(prompt="What is the P/E of AAPL?", temperature=0.0, top_k=20))
+    again = await layer.generate_text(LLMRequest(prompt="what's AAPL's P/E", temperature=0.0))
+
+    assert again.usage["cache"] == "semantic_hit"
+    assert service.generate_text.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_different_ticker_never_matches():
+    """Answers are scoped by the tickers in the prompt"""
+    layer, service = _layer(_cache())
+
+    await layer.generate_text(LLMRequest(prompt="What is the P/E of AAPL?"))
+    other = await layer.generate_text(LLMRequest(prompt="What is the P/E of MSFT?"))
+
+    assert "cache" not in other.usage
+    assert service.generate_text.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_unrelated_question_and_bypass_call_service():
+    """Dissimilar prompts and bypass_cache go to the service"""
+    layer, service = _layer(_cache())
+
+    await layer.generate_text(LLMRequest(prompt="How is the NASDAQ market today?"))
+    await layer.generate_text(LLMRequest(prompt="Explain dividend yield"))
+    await layer.generate_text(LLMRequest(prompt="How is the NASDAQ market today?", bypass_cache=True))
+
+    assert service.generate_text.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_ticker_entries_expire_faster():
+    """Entries mentioning a ticker use the short TTL"""
+    cache = _cache(ticker_ttl_seconds=30, ttl_seconds=600)
+    cache.store("AAPL price", "m", 100, "{}")
+    cache.store("explain index funds", "m", 100, "{}")
+
+    with patch("src.services.semantic_cache.time.monotonic", return_value=cache._expires.max() - 100):
+        assert cache.lookup("AAPL price", "m", 100) is None
+        assert cache.lookup("explain index funds", "m", 100) is not None
+
+
+def test_invalidate_ticker_and_ring_buffer():
+    """Ticker invalidation drops entries and the buffer overwrites the oldest"""
+    cache = _cache(capacity=2)
+    cache.store("AAPL price", "m", 100, "{}")
+    cache.store("MSFT price", "m", 100, "{}")
+
+    assert cache.invalidate_ticker("AAPL") == 1
+    assert cache.lookup("AAPL price", "m", 100) is None
+
+    cache.store("NVDA price", "m", 100, "{}")
+    cache.store("TSLA price", "m", 100, "{}")
+    assert cache.lookup("MSFT price", "m", 100) is None
+    assert cache.lookup("TSLA price", "m", 100) is not None
+
+
+@pytest.mark.asyncio
+async def test_company_name_and_ticker_paraphrases_share_an_entry():
+    """"Apple price to earnings ratio?" is answered from "what's AAPL's P/E" (and not for MSFT)"""
+    layer, service = _layer(_cache())
+
+    await layer.generate_text(LLMRequest(prompt="what's AAPL's P/E"))
+    response = await layer.generate_text(LLMRequest(prompt="Apple price to earnings ratio?"))
+    await layer.generate_text(LLMRequest(prompt="Microsoft price to earnings ratio?"))
+
+    assert response.usage["cache"] == "semantic_hit"
+    assert service.generate_text.await_count == 2
@@ -0,0 +1,49 @@
+"""
+Tests for the orjson response path
+"""
+import io
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+
+from src.api.routes import _format_event
+from src.main import app
+from src.models.llm import LLMResponse
+from src.services.bedrock_service import BedrockService
+
+
+def test_bedrock_bytes_are_parsed_directly(mock_bedrock_client):
+    """The body is parsed from bytes; a non-string text is rejected"""
+    service = BedrockService()
+    body = service._process_response({"body": io.BytesIO(b'{"content":[{"text":"hola \\u00e9"}],"usage":{}}')})
+    assert service._extract_text_safely(body) == "hola é"
+
+    with pytest.raises(Exception, match="Invalid response format"):
+        service._extract_text_safely({"content": [{"text": None}]})
+
+
+def test_events_are_encoded_as_bytes():
+    """SSE and NDJSON lines are bytes and accept numpy values"""
+    event = {"event": "usage", "data": {"usage": {"output_tokens": np.int64(5), "score": np.float32(0.5)}}}
+
+    assert _format_event(event, ndjson=True) == b'{"event":"usage","usage":{"output_tokens":5,"score":0.5}}\n'
+    assert _format_event(event, ndjson=False) == (
+        b'event: usage\ndata: {"usage":{"output_tokens":5,"score":0.5}}\n\n'
+    )
+
+
+def test_generate_returns_the_service_response_unchanged():
+    """The constructed response is sent as-is, without response_model re-validation"""
+    response = LLMResponse.model_construct(text="ok", model_id="m", usage={"output_tokens": np.int64(3)})
+
+    class Service:
+        async def generate_text(self, request):
+            return response
+
+    with patch("src.api.routes.get_llm_service", return_value=Service()):
+        result = TestClient(app).post("/api/v1/generate", json={"prompt": "hi"})
+
+    assert result.status_code == 200
+    assert result.json() == {"text": "ok", "model_id": "m", "usage": {"output_tokens": 3}}
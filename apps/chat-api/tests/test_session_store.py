@@ -0,0 +1,131 @@
+"""
+Tests for the server-side chat session store
+"""
+import pytest
+from unittest.mock import AsyncMock, patch
+from fastapi.testclient import TestClient
+
+from src.main import app
+from src.core.config import settings
+from src.models.llm import ChatRequest, ChatResponse, ChatMessage
+from src.services.session_store import SessionLayer, SessionStore, SqlSessionBackend
+
+
+client = TestClient(app)
+
+
+def _msg(role, content):
+    return ChatMessage(role=role, content=content)
+
+
+@pytest.mark.asyncio
+async def test_hot_tier_is_lru_and_bounded():
+    """The hot tier keeps the most recent sessions and messages"""
+    store = SessionStore(max_hot_sessions=2, max_messages=3)
+    await store.append("a", [_msg("user", "1"), _msg("assistant", "2")])
+    await store.append("a", [_msg("user", "3"), _msg("assistant", "4")])
+    await store.append("b", [_msg("user", "x")])
+    await store.append("c", [_msg("user", "y")])
+
+    assert [m.content for m in await store.load("a")] == []
+    assert [m.content for m in await store.load("c")] == ["y"]
+    assert store.stats()["hot_sessions"] == 2
+
+    store = SessionStore(max_messages=3)
+    await store.append("a", [_msg("user", str(i)) for i in range(5)])
+    assert [m.content for m in await store.load("a")] == ["2", "3", "4"]
+
+
+@pytest.mark.asyncio
+async def test_cold_tier_restores_evicted_sessions(tmp_path):
+    """Sessions evicted from memory are reloaded from SQL"""
+    cold = SqlSessionBackend(f"sqlite:///{tmp_path / 'sessions.db'}")
+    store = SessionStore(cold, max_hot_sessions=1)
+    await store.append("a", [_msg("user", "Hi"), _msg("assistant", "Hello")])
+    await store.append("b", [_msg("user", "Other")])
+
+    history = await store.load("a")
+
+    assert [(m.role, m.content) for m in history] == [("user", "Hi"), ("assistant", "Hello")]
+    assert store.stats()["cold_hits"] == 1
+
+    await store.delete("a")
+    assert await store.load("a") == []
+
+
+@pytest.mark.asyncio
+async def test_cold_tier_failures_do_not_break_chat():
+    """Database errors are counted and the hot tier keeps working"""
+    cold = SqlSessionBackend("sqlite:////nonexistent/dir/sessions.db")
+    store = SessionStore(cold)
+
+    await store.append("a", [_msg("user", "Hi")])
+
+    assert [m.content for m in await store.load("a")] == ["Hi"]
+    assert store.stats()["cold_errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_layer_rebuilds_history_from_session():
+    """Clients send only the new turn; the model sees the whole conversation"""
+    inner = AsyncMock()
+    inner.chat.side_effect = lambda request: ChatResponse(
+        message=_msg("assistant", f"reply {len(request.messages)}"), model_id="m", usage={}
+    )
+    store = SessionStore()
+    layer = SessionLayer(inner, store)
+
+    await layer.chat(ChatRequest(messages=[_msg("user", "first")], session_id="s1"))
+    response = await layer.chat(ChatRequest(messages=[_msg("user", "second")], session_id="s1"))
+
+    sent = inner.chat.await_args[0][0]
+    assert [m.content for m in sent.messages] == ["first", "reply 1", "second"]
+    assert response.usage["session"]["history_messages"] == 2
+    assert len(await store.load("s1")) == 4
+
+
+def test_chat_endpoint_with_session_id():
+    """The /chat endpoint stores turns and exposes the session"""
+    session_id = client.post("/api/v1/sessions").json()["session_id"]
+    with patch.object(settings, "llm_mode", "dummy"):
+        for text in ["Hello there", "Tell me about NASDAQ"]:
+            response = client.post("/api/v1/chat", json={
+                "messages": [{"role": "user", "content": text}],
+                "session_id": session_id,
+                "bypass_cache": True
+            })
+            assert response.status_code == 200
+
+        session = client.get(f"/api/v1/sessions/{session_id}").json()
+        assert [m["role"] for m in session["messages"]] == ["user", "assistant", "user", "assistant"]
+
+        assert client.delete(f"/api/v1/sessions/{session_id}").status_code == 200
+        assert client.get(f"/api/v1/sessions/{session_id}").json()["messages"] == []
+
+
+def test_client_chosen_session_ids_are_rejected():
+    """Only server-issued ids open a session; guessed or tampered ids get 404"""
+    session_id = client.post("/api/v1/sessions").json()["session_id"]
+    tampered = session_id[:-1] + ("0" if session_id[-1] != "0" else "1")
+
+    for guess in ("load-0", tampered):
+        assert client.get(f"/api/v1/sessions/{guess}").status_code == 404
+        assert client.delete(f"/api/v1/sessions/{guess}").status_code == 404
+        response = client.post("/api/v1/chat", json={"messages": [{"role": "user", "content": "hi"}], "session_id": guess})
+        assert response.status_code == 404
+    assert client.get(f"/api/v1/sessions/{session_id}").status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_without_hot_tier_workers_see_each_others_turns(tmp_path):
+    """With max_hot_sessions=0 every load reads SQL, so no worker serves a stale history"""
+    url = f"sqlite:///{tmp_path / 'sessions.db'}"
+    first = SessionStore(SqlSessionBackend(url), max_hot_sessions=0)
+    second = SessionStore(SqlSessionBackend(url), max_hot_sessions=0)
+
+    await first.append("a", [_msg("user", "Hi")])
+    await second.load("a")
+    await first.append("a", [_msg("assistant", "Hello")])
+
+    assert [m.content for m in await second.load("a")] == ["Hi", "Hello"]
+    assert second.stats()["hot_sessions"] == 0
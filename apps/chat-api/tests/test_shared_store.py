@@ -0,0 +1,61 @@
+"""
+Tests for the cross-worker shared-memory array store
+"""
+import numpy as np
+import pytest
+
+from src.services.quote_snapshot import CsvQuoteProvider, QuoteStore
+from src.services.shared_store import SharedArrayStore
+
+
+CSV = """symbol,last_price,change_pct
+AAPL,175.0,2.0
+NVDA,880.0,1.38
+"""
+
+
+class FailingProvider:
+    async def fetch(self):
+        raise AssertionError("followers must not call the provider")
+
+
+def test_publish_and_load_memory_mapped(tmp_path):
+    """Each publish is a new generation, loaded read-only via mmap; old ones are pruned"""
+    store = SharedArrayStore(str(tmp_path), keep_generations=2)
+    assert store.load("prices") is None
+
+    for value in (1.0, 2.0, 3.0):
+        generation = store.publish("prices", {"close": np.full(4, value)}, {"as_of": value})
+
+    loaded_generation, arrays, meta = store.load("prices")
+    assert generation == loaded_generation == 3
+    assert isinstance(arrays["close"], np.memmap) and not arrays["close"].flags.writeable
+    assert arrays["close"].tolist() == [3.0] * 4 and meta == {"as_of": 3.0}
+    assert sorted(p.name for p in (tmp_path / "prices").glob("gen-*")) == ["gen-2", "gen-3"]
+
+
+def test_only_one_leader_per_name(tmp_path):
+    """The leader lock is exclusive across store instances (i.e. workers)"""
+    first, second = SharedArrayStore(str(tmp_path)), SharedArrayStore(str(tmp_path))
+
+    assert first.try_lead("quotes")
+    assert first.try_lead("quotes")
+    assert not second.try_lead("quotes")
+    assert second.try_lead("tickers")
+
+
+@pytest.mark.asyncio
+async def test_followers_adopt_the_leaders_snapshot(tmp_path):
+    """Only the leader fetches quotes; other workers map its published snapshot"""
+    path = tmp_path / "quotes.csv"
+    path.write_text(CSV)
+    leader = QuoteStore(CsvQuoteProvider(str(path)), shared=SharedArrayStore(str(tmp_path / "shm")))
+    follower = QuoteStore(FailingProvider(), shared=SharedArrayStore(str(tmp_path / "shm")))
+
+    await leader.refresh()
+    snapshot = await follower.refresh()
+
+    assert follower.generation == leader.generation == 1
+    assert snapshot.get("NVDA")["last_price"] == 880.0
+    assert snapshot.as_of == leader.snapshot.as_of
+    assert await follower.refresh() is snapshot  # sin generacion nueva no se recarga
@@ -0,0 +1,180 @@
+"""
+Tests for single-flight coalescing of identical in-flight requests
+"""
+import asyncio
+import pytest
+from unittest.mock import AsyncMock
+
+from src.models.llm import LLMRequest, LLMResponse
+from src.services.single_flight import SingleFlight, SingleFlightLayer
+
+
+def _slow_service(delay=0.05):
+    service = AsyncMock()
+
+    async def generate_text(request):
+        await asyncio.sleep(delay)
+        return LLMResponse(text=f"answer to {request.prompt}", model_id="m", usage={"output_tokens": 4})
+
+    async def generate_text_stream(request):
+        for word in ["one", " two", " three"]:
+            await asyncio.sleep(delay / 3)
+            yield {"event": "delta", "data": {"text": word}}
+        yield {"event": "usage", "data": {"model_id": "m", "usage": {"output_tokens": 3}}}
+
+    service.generate_text.side_effect = generate_text
+    service.generate_text_stream = generate_text_stream
+    return service
+
+
+@pytest.mark.asyncio
+async def test_identical_requests_share_one_call():
+    """Concurrent identical payloads produce a single upstream call"""
+    service = _slow_service()
+    group = SingleFlight()
+    layer = SingleFlightLayer(service, group, "default-model", 0.7)
+
+    responses = await asyncio.gather(*(layer.generate_text(LLMRequest(prompt="AAPL news?")) for _ in range(5)))
+
+    assert service.generate_text.await_count == 1
+    assert {r.text for r in responses} == {"answer to AAPL news?"}
+    assert sum(1 for r in responses if r.usage.get("coalesced")) == 4
+    assert group.stats()["leaders"] == 1
+    assert group.stats()["coalesced"] == 4
+    assert group.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_followers_get_independent_copies():
+    """Mutating one caller's usage does not leak into another's"""
+    layer = SingleFlightLayer(_slow_service(), SingleFlight(), "default-model", 0.7)
+
+    a, b = await asyncio.gather(
+        layer.generate_text(LLMRequest(prompt="Q")),
+        layer.generate_text(LLMRequest(prompt="Q"))
+    )
+    a.usage["cache"] = "miss"
+
+    assert "cache" not in b.usage
+
+
+@pytest.mark.asyncio
+async def test_leader_disconnect_does_not_cancel_followers():
+    """Cancelling the first caller keeps the shared call alive for the rest"""
+    service = _slow_service(delay=0.1)
+    group = SingleFlight()
+    layer = SingleFlightLayer(service, group, "default-model", 0.7)
+
+    leader = asyncio.create_task(layer.generate_text(LLMRequest(prompt="Q")))
+    await asyncio.sleep(0.01)
+    follower = asyncio.create_task(layer.generate_text(LLMRequest(prompt="Q")))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+
+    response = await follower
+    assert response.text == "answer to Q"
+    assert group.stats()["cancelled_upstream"] == 0
+
+
+@pytest.mark.asyncio
+async def test_upstream_cancelled_when_everyone_leaves():
+    """The shared call is cancelled once no caller is waiting"""
+    group = SingleFlight()
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def call():
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    waiter = asyncio.create_task(group.do("k", call))
+    await started.wait()
+    waiter.cancel()
+    await asyncio.sleep(0.01)
+
+    assert cancelled.is_set()
+    assert group.stats()["cancelled_upstream"] == 1
+    assert group.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_caller_arriving_after_last_waiter_leaves_starts_a_new_call():
+    """A cancelled shared call is never joined: the next caller gets a fresh one"""
+    group = SingleFlight()
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(10 if len(calls) == 1 else 0)
+        return len(calls)
+
+    waiter = asyncio.create_task(group.do("k", call))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    await asyncio.sleep(0)  # el waiter ya cancelo la tarea, que aun no ha terminado
+
+    assert await group.do("k", call) == 2
+    assert group.stats()["leaders"] == 2
+
+
+@pytest.mark.asyncio
+async def test_subscriber_arriving_after_last_one_leaves_opens_a_new_stream():
+    """Same for streams: a new subscriber never replays a cancelled stream"""
+    group = SingleFlight()
+    opened = []
+
+    async def open_stream():
+        opened.append(1)
+        if len(opened) == 1:
+            await asyncio.sleep(10)
+        yield {"event": "delta", "data": {"text": "fresh"}}
+
+    async def consume():
+        return [event async for event in group.stream("k", open_stream)]
+
+    subscriber = asyncio.create_task(consume())
+    await asyncio.sleep(0)
+    subscriber.cancel()
+    await asyncio.sleep(0)
+
+    assert await consume() == [{"event": "delta", "data": {"text": "fresh"}}]
+    assert group.stats()["stream_leaders"] == 2
+
+
+@pytest.mark.asyncio
+async def test_errors_propagate_to_all_waiters():
+    """A failing shared call raises in every caller"""
+    group = SingleFlight()
+
+    async def call():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("Bedrock API error [ThrottlingException]")
+
+    results = await asyncio.gather(group.do("k", call), group.do("k", call), return_exceptions=True)
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_streams_are_shared_and_replayed():
+    """A late subscriber replays earlier tokens from the shared stream"""
+    service = _slow_service(delay=0.06)
+    group = SingleFlight()
+    layer = SingleFlightLayer(service, group, "default-model", 0.7)
+
+    async def collect(delay):
+        await asyncio.sleep(delay)
+        return [event async for event in layer.generate_text_stream(LLMRequest(prompt="Q"))]
+
+    first, second = await asyncio.gather(collect(0), collect(0.03))
+
+    text = lambda events: "".join(e["data"]["text"] for e in events if e["event"] == "delta")
+    assert text(first) == text(second) == "one two three"
+    assert "coalesced" not in first[-1]["data"]["usage"]
+    assert second[-1]["data"]["usage"]["coalesced"] is True
+    assert group.stats()["stream_leaders"] == 1
+    assert group.stats()["stream_coalesced"] == 1
@@ -0,0 +1,46 @@
+"""
+Tests for lazy service construction and the Bedrock warm-up
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+from botocore.exceptions import ClientError
+
+from src.services.bedrock_service import BedrockService
+
+
+@pytest.mark.parametrize("embedding_backend", ["local", "bedrock"])
+def test_dummy_mode_does_not_load_boto3(embedding_backend):
+    """Importing the app in dummy mode never imports boto3/botocore, even with Bedrock embeddings"""
+    code = "import sys, src.main; print('boto3' in sys.modules, 'botocore' in sys.modules)"
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env={**os.environ, "LLM_MODE": "dummy", "EMBEDDING_BACKEND": embedding_backend},
+        capture_output=True, text=True, check=True
+    )
+    assert result.stdout.split() == ["False", "False"]
+
+
+@pytest.mark.asyncio
+async def test_warm_up_opens_connections(mock_bedrock_client):
+    """Each warm-up ping reaches Bedrock; a ValidationException still counts as a live connection"""
+    mock_bedrock_client.invoke_model.side_effect = ClientError(
+        {"Error": {"Code": "ValidationException", "Message": "Malformed input request"}}, "InvokeModel"
+    )
+    service = BedrockService()
+
+    assert await service.warm_up(3) == 3
+    assert mock_bedrock_client.invoke_model.call_count == 3
+    assert mock_bedrock_client.invoke_model.call_args[1]["body"] == b"{}"
+
+
+@pytest.mark.asyncio
+async def test_warm_up_failure_is_not_fatal(mock_bedrock_client):
+    """Connection errors during warm-up are logged, not raised"""
+    mock_bedrock_client.invoke_model.side_effect = ConnectionError("no route to host")
+    service = BedrockService()
+
+    assert await service.warm_up(2) == 0
@@ -0,0 +1,128 @@
+"""
+Tests for token streaming endpoints and services
+"""
+import json
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+
+from src.main import app
+from src.core.config import settings
+from src.services.bedrock_service import BedrockService
+from src.services.dummy_llm_service import DummyLLMService
+from src.models.llm import LLMRequest, ChatRequest, ChatMessage
+
+
+client = TestClient(app)
+
+
+def _chunk(payload):
+    return {"chunk": {"bytes": json.dumps(payload).encode("utf-8")}}
+
+
+def _bedrock_stream_events(text_parts):
+    events = [_chunk({"type": "message_start", "message": {"usage": {"input_tokens": 12}}})]
+    for part in text_parts:
+        events.append(_chunk({"type": "content_block_delta", "delta": {"type": "text_delta", "text": part}}))
+    events.append(_chunk({"type": "message_delta", "delta": {"stop_reason": "end_turn"}, "usage": {"output_tokens": 7}}))
+    events.append(_chunk({"type": "message_stop"}))
+    return events
+
+
+def _parse_sse(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = block.split("\n")
+        events.append((lines[0][len("event: "):], json.loads(lines[1][len("data: "):])))
+    return events
+
+
+@pytest.mark.asyncio
+async def test_bedrock_generate_text_stream(mock_bedrock_client):
+    """Deltas are forwarded in order and usage arrives as the trailer event"""
+    mock_bedrock_client.invoke_model_with_response_stream.return_value = {
+        "body": _bedrock_stream_events(["Apple ", "is ", "up."])
+    }
+
+    service = BedrockService()
+    events = [event async for event in service.generate_text_stream(LLMRequest(prompt="Test"))]
+
+    assert [e["data"]["text"] for e in events if e["event"] == "delta"] == ["Apple ", "is ", "up."]
+    assert events[-1]["event"] == "usage"
+    usage = events[-1]["data"]["usage"]
+    assert usage["input_tokens"] == 12
+    assert usage["output_tokens"] == 7
+    assert usage["total_tokens"] == 19
+    assert usage["stop_reason"] == "end_turn"
+    assert usage["time_to_first_token_ms"] is not None
+
+
+@pytest.mark.asyncio
+async def test_bedrock_chat_stream_reports_turns(mock_bedrock_client):
+    """Chat stream trailer includes the conversation depth"""
+    mock_bedrock_client.invoke_model_with_response_stream.return_value = {
+        "body": _bedrock_stream_events(["Hi!"])
+    }
+
+    service = BedrockService()
+    request = ChatRequest(messages=[ChatMessage(role="user", content="Hello")])
+    events = [event async for event in service.chat_stream(request)]
+
+    assert events[-1]["data"]["usage"]["conversation_turns"] == 1
+
+
+@pytest.mark.asyncio
+async def test_bedrock_stream_in_band_error(mock_bedrock_client):
+    """Errors delivered inside the EventStream are raised"""
+    events = _bedrock_stream_events(["partial"])[:2]
+    events.append({"throttlingException": {"message": "Too many requests"}})
+    mock_bedrock_client.invoke_model_with_response_stream.return_value = {"body": events}
+
+    service = BedrockService()
+    received = []
+    with pytest.raises(Exception, match="throttlingException"):
+        async for event in service.generate_text_stream(LLMRequest(prompt="Test")):
+            received.append(event)
+
+    assert received[0]["data"]["text"] == "partial"
+
+
+@pytest.mark.asyncio
+async def test_dummy_stream_rebuilds_full_answer():
+    """Dummy deltas concatenate to a complete answer"""
+    service = DummyLLMService()
+    request = ChatRequest(messages=[ChatMessage(role="user", content="hello there")])
+    events = [event async for event in service.chat_stream(request)]
+
+    text = "".join(e["data"]["text"] for e in events if e["event"] == "delta")
+    assert text == "Hello! I'm your financial AI assistant. How can I help you today?"
+    assert events[-1]["data"]["usage"]["output_tokens"] == len(text.split())
+
+
+def test_generate_stream_endpoint_sse():
+    """The /generate/stream endpoint emits SSE deltas followed by usage"""
+    with patch.object(settings, "llm_mode", "dummy"):
+        response = client.post("/api/v1/generate/stream", json={"prompt": "How is NASDAQ?"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _parse_sse(response.text)
+    assert events[0][0] == "delta"
+    assert events[-1][0] == "usage"
+    assert "time_to_first_token_ms" in events[-1][1]["usage"]
+
+
+def test_chat_stream_endpoint_ndjson():
+    """The /chat/stream endpoint switches to NDJSON on request"""
+    payload = {"messages": [{"role": "user", "content": "thanks!"}]}
+    with patch.object(settings, "llm_mode", "dummy"):
+        response = client.post(
+            "/api/v1/chat/stream",
+            json=payload,
+            headers={"Accept": "application/x-ndjson"}
+        )
+
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[-1]["event"] == "usage"
+    assert "".join(line["text"] for line in lines if line["event"] == "delta").startswith("You're welcome!")
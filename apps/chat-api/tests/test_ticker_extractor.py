@@ -0,0 +1,73 @@
+"""
+Tests for the Aho-Corasick ticker extractor
+"""
+import os
+
+import pytest
+
+from src.services.ticker_extractor import KIND_NAME, TickerExtractor, company_name, read_symbols
+
+
+SYMBOLS = """symbol,name,aliases
+AAPL,Apple Inc. - Common Stock,
+GOOG,Alphabet Inc. - Class C Capital Stock,
+GOOGL,Alphabet Inc. - Class A Common Stock,
+META,"Meta Platforms, Inc. - Class A Common Stock",
+IT,"Gartner, Inc. - Common Stock",
+A,"Agilent Technologies, Inc. - Common Stock",
+TGT,Target Corporation - Common Stock,
+BRK.B,Berkshire Hathaway Inc. - Class B,Berkshire|BRK B
+"""
+
+
+@pytest.fixture
+def symbols_csv(tmp_path):
+    path = tmp_path / "symbols.csv"
+    path.write_text(SYMBOLS)
+    return str(path)
+
+
+@pytest.fixture
+def extractor(symbols_csv):
+    return TickerExtractor.build(read_symbols(symbols_csv))
+
+
+def test_company_name_drops_corporate_suffixes():
+    """Listing names are reduced to the name people actually type"""
+    assert company_name("Alphabet Inc. - Class C Capital Stock") == "Alphabet"
+    assert company_name("Meta Platforms, Inc.") == "Meta Platforms"
+    assert company_name("The Walt Disney Company") == "Walt Disney"
+
+
+def test_symbols_names_and_aliases(extractor):
+    """Symbols, listing names and aliases all resolve to the symbol"""
+    assert extractor.extract("Is Google a better buy than AAPL?") == {"GOOGL", "AAPL"}
+    assert extractor.extract("compare alphabet and Meta Platforms") == {"GOOGL", "META"}
+    assert extractor.extract("BRK.B vs Berkshire Hathaway") == {"BRK.B"}
+
+
+def test_case_and_word_boundaries(extractor):
+    """Common words only count as tickers when written unambiguously"""
+    assert extractor.extract("IT spending got an A rating, target price raised") == frozenset()
+    assert extractor.extract("Buy $it and $a before Target reports") == {"IT", "A", "TGT"}
+    assert extractor.extract("aapl, AAPLX and a meta-analysis") == frozenset()
+    assert extractor.extract("AAPL's margins and META.") == {"AAPL", "META"}
+
+
+def test_matches_report_positions(extractor):
+    """Each match carries its span so callers can highlight or strip it"""
+    matches = extractor.find("Is Google cheap?")
+
+    assert [(m.symbol, m.start, m.end, m.kind) for m in matches] == [("GOOGL", 3, 9, KIND_NAME)]
+
+
+def test_automaton_round_trips_through_disk(extractor, tmp_path):
+    """A saved automaton loads memory-mapped and matches the same way"""
+    directory = str(tmp_path / "tickers")
+    extractor.save(directory)
+    loaded = TickerExtractor.load(directory)
+
+    assert os.path.exists(os.path.join(directory, "delta.npy"))
+    assert loaded.stats() == extractor.stats()
+    text = "Google, $A, BRK B and Target vs Walmart"
+    assert loaded.find(text) == extractor.find(text)